@@ -0,0 +1,82 @@
+"""
+Command line maintenance tasks.
+
+Usage (from the backend directory):
+    python -m app.cli rebuild-analytics [--user-id ID]
+    python -m app.cli reembed [--chunk-size N] [--restart]
+    python -m app.cli recompute-schedules [--user-id ID] [--chunk-size N]
+"""
+
+import argparse
+import logging
+from app.db import SessionLocal, init_db
+from app.services.analytics import AnalyticsRollup
+from app.services.batch_scheduler import ScheduleReplay
+from app.services.reembedding import run_reembedding_cli
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_analytics(args: argparse.Namespace) -> None:
+    """Backfill or rebuild the analytics rollup tables from full history"""
+    db = SessionLocal()
+    try:
+        if args.user_id is not None:
+            AnalyticsRollup.rebuild_user(db, args.user_id)
+            db.commit()
+            logger.info(f"Rebuilt analytics for user {args.user_id}")
+        else:
+            count = AnalyticsRollup.rebuild_all(db)
+            logger.info(f"Rebuilt analytics for {count} users")
+    finally:
+        db.close()
+
+
+def reembed(args: argparse.Namespace) -> None:
+    """Re-embed cards whose embedding came from a different model (resumable)"""
+    run_reembedding_cli(chunk_size=args.chunk_size, restart=args.restart)
+
+
+def recompute_schedules(args: argparse.Namespace) -> None:
+    """Recompute card schedules from quiz history (e.g. after an SM-2 change)"""
+    db = SessionLocal()
+    try:
+        count = ScheduleReplay.recompute_all(db, user_id=args.user_id, chunk_size=args.chunk_size)
+        logger.info(f"Recomputed schedules for {count} cards")
+    finally:
+        db.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one subcommand per task"""
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-analytics", help="Rebuild analytics rollup tables")
+    rebuild.add_argument("--user-id", type=int, default=None, help="Only rebuild this user")
+    rebuild.set_defaults(func=rebuild_analytics)
+
+    reembed_parser = subparsers.add_parser("reembed", help="Re-embed cards with the configured provider")
+    reembed_parser.add_argument("--chunk-size", type=int, default=500, help="Cards embedded per batch")
+    reembed_parser.add_argument("--restart", action="store_true", help="Discard progress and start over")
+    reembed_parser.set_defaults(func=reembed)
+
+    recompute = subparsers.add_parser("recompute-schedules", help="Replay quiz history through SM-2")
+    recompute.add_argument("--user-id", type=int, default=None, help="Only recompute this user's cards")
+    recompute.add_argument("--chunk-size", type=int, default=50000, help="Cards replayed per batch")
+    recompute.set_defaults(func=recompute_schedules)
+
+    return parser
+
+
+def main(argv=None) -> None:
+    """CLI entry point"""
+    logging.basicConfig(level=logging.INFO)
+    args = build_parser().parse_args(argv)
+
+    init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
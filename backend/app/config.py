@@ -6,12 +6,85 @@ class Settings(BaseSettings):
     """Application settings"""
     
     DATABASE_URL: str = "sqlite:///./flashcards.db"
+    ASYNC_DATABASE_URL: str = ""  # Defaults to DATABASE_URL with its asyncio driver (aiosqlite, asyncpg)
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL_SECONDS: int = 300  # Decoded tokens and known user ids; 0 disables caching
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    BCRYPT_ROUNDS: int = 12  # Work factor for new hashes; older ones are rehashed on login
+    PASSWORD_HASH_WORKERS: int = 2  # Threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # Waiting hashes before register/login answer 503
+    # Login attempts (token buckets): sustained rate per minute and burst size
+    LOGIN_IP_RATE_PER_MINUTE: int = 60  # Per client address (generous for shared campus NATs)
+    LOGIN_IP_BURST: int = 30
+    LOGIN_EMAIL_RATE_PER_MINUTE: int = 6  # Per account
+    LOGIN_EMAIL_BURST: int = 5
     
     OLLAMA_API_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "mistral"
+    OLLAMA_TIMEOUT: float = 120.0  # Seconds per generation request
+    OLLAMA_MAX_CONCURRENCY: int = 2  # Generations in flight against the Ollama host
+    OLLAMA_MAX_QUEUE: int = 32  # Waiting generations before new ones are rejected
+    OLLAMA_QUEUE_TIMEOUT: float = 60.0  # Seconds a generation may wait for a slot
+    OLLAMA_POOL_MAX_CONNECTIONS: int = 10
+    OLLAMA_POOL_MAX_KEEPALIVE: int = 5
+    OLLAMA_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    GENERATION_CACHE_ENABLED: bool = True  # Reuse results for identical generation requests
+    GENERATION_CACHE_PATH: str = "./generation_cache.db"
+    GENERATION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    GENERATION_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Background generation jobs
+    GENERATION_JOB_WORKERS: int = 2  # Worker tasks per app process
+    GENERATION_JOB_MAX_ATTEMPTS: int = 3
+    GENERATION_JOB_RETRY_SECONDS: int = 15  # First retry delay, doubled per attempt
+    GENERATION_JOB_LEASE_SECONDS: int = 1800  # Running jobs are reclaimed after this
+    GENERATION_JOB_POLL_SECONDS: float = 2.0
+    
+    # Long-document generation (map-reduce over chunks)
+    DOCUMENT_CHUNK_TOKENS: int = 1500  # Source text per generation prompt
+    DOCUMENT_CHUNK_OVERLAP_TOKENS: int = 150
+    DOCUMENT_CHUNK_CONCURRENCY: int = 4  # Chunks generated at once per document
+    DOCUMENT_MAX_CARDS: int = 200
+    
+    # Embeddings and semantic search
+    EMBEDDING_PROVIDER: str = "hash"  # "hash", "ollama" or "sklearn"
+    EMBEDDING_DIMENSION: int = 384  # Must match the provider's output (e.g. 768 for nomic-embed-text)
+    OLLAMA_EMBEDDING_MODEL: str = "nomic-embed-text"
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache.db"
+    EMBEDDING_STORAGE: str = "float32"  # "float32" or "int8" (quantized, 4x smaller)
+    VECTOR_INDEX_MODE: str = "exact"  # "exact" or "ivf" (approximate)
+    VECTOR_INDEX_IVF_MIN_CARDS: int = 5000  # Decks smaller than this are always searched exactly
+    VECTOR_INDEX_NPROBE: int = 8  # IVF clusters scanned per query
+    VECTOR_INDEX_MAX_USERS: int = 1000  # Per-user indexes kept in memory (LRU)
+    
+    FLASHCARD_PAGE_SIZE: int = 50  # Default page size for GET /api/flashcards/
+    FLASHCARD_MAX_PAGE_SIZE: int = 500
+    
+    QUIZ_BATCH_MAX_ATTEMPTS: int = 500  # Per POST /api/study/quiz/answers
+    NEW_CARDS_PER_DAY: int = 20  # Never-reviewed cards introduced per user per day (UTC)
+    SESSION_MAX_CANDIDATES: int = 5000  # Due cards scored per session build, most overdue first (0 = all)
+    SESSION_MAX_TARGET_COUNT: int = 200  # Cards queued at session start (and per refill)
+    SESSION_QUEUE_LOW_WATER: int = 5  # Refill a session's queue in the background below this
+    
+    # Offline study sync
+    SYNC_HORIZON_DAYS: int = 3  # Snapshots include cards due this far ahead
+    SYNC_SNAPSHOT_MAX_CARDS: int = 2000
+    SYNC_MAX_ATTEMPTS: int = 5000  # Per upload
+    
+    # Bulk import/export
+    IMPORT_BATCH_SIZE: int = 500  # Cards embedded, inserted and committed together
+    IMPORT_MAX_ROWS: int = 100000  # Per upload
+    EXPORT_CHUNK_SIZE: int = 1000  # Rows fetched per cursor round trip
+    
+    # Near-duplicate cards: "flag" (keep, mark duplicate_of), "skip", "merge"
+    # (return the existing card instead) or "off"
+    DEDUP_MODE: str = "flag"
+    DEDUP_THRESHOLD: float = 0.8  # Jaccard similarity of question shingles (estimated) and words (exact)
+    
+    ADMIN_API_KEY: str = ""  # Enables /api/admin routes when set
     
     FRONTEND_URL: str = "http://localhost:3000"
     ENVIRONMENT: str = "development"
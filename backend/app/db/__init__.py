@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Enum as SQLEnum
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index, LargeBinary, Text, BigInteger, Enum as SQLEnum
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from datetime import datetime
 import enum
 from app.config import settings
@@ -14,6 +15,27 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async drivers for the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio one"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+
+# Async engine for routes that must not block the event loop; objects stay
+# usable after commit since lazy loads are not possible in async code
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL))
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 class UserDB(Base):
     """User database model"""
@@ -43,13 +65,61 @@ class FlashcardDB(Base):
     difficulty = Column(String, default="medium")
     review_count = Column(Integer, default=0)
     difficulty_score = Column(Float, default=0.5)  # 0-1, higher = harder
-    embedding = Column(String, nullable=True)  # JSON string of vector
+    # Packed vector (see app.services.embedding_codec); deferred so list
+    # queries never load it
+    embedding = deferred(Column("embedding_packed", LargeBinary, nullable=True))
+    embedding_model = Column(String, nullable=True, index=True)  # Provider model id that produced it
+    minhash = deferred(Column(LargeBinary, nullable=True))  # Question signature (app.services.dedup)
+    duplicate_of = Column(Integer, ForeignKey("flashcards.id"), nullable=True, index=True)  # Flagged near-duplicate
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Offline sync watermark
     last_reviewed = Column(DateTime, nullable=True, index=True)
     
+    # Spaced repetition (SM-2) state
+    next_review = Column(DateTime, nullable=True)  # NULL = new card, never reviewed
+    easiness = Column(Float, default=2.5)
+    interval = Column(Integer, default=0)  # Days
+    
     # Relationships
     owner = relationship("UserDB", back_populates="flashcards")
     quiz_attempts = relationship("QuizAttemptDB", back_populates="flashcard")
+    
+    __table_args__ = (
+        # Due-queue lookups: WHERE user_id = ? ORDER BY next_review LIMIT n
+        Index("ix_flashcards_user_next_review", "user_id", "next_review"),
+        # Keyset pagination: WHERE user_id = ? AND (created_at, id) > cursor
+        Index("ix_flashcards_user_created_id", "user_id", "created_at", "id"),
+        # Offline sync deltas: WHERE user_id = ? AND updated_at >= watermark
+        Index("ix_flashcards_user_updated", "user_id", "updated_at"),
+    )
+
+
+class FlashcardTombstoneDB(Base):
+    """Deleted flashcard ids, so offline sync deltas can report deletions"""
+    __tablename__ = "flashcard_tombstones"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    flashcard_id = Column(Integer)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_flashcard_tombstones_user_deleted", "user_id", "deleted_at"),
+    )
+
+
+class FlashcardLSHBucketDB(Base):
+    """MinHash LSH band buckets for near-duplicate question lookup"""
+    __tablename__ = "flashcard_lsh_buckets"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    bucket = Column(BigInteger)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), index=True)
+    
+    __table_args__ = (
+        Index("ix_flashcard_lsh_buckets_user_bucket", "user_id", "bucket"),
+    )
 
 
 class StudySessionDB(Base):
@@ -65,10 +135,27 @@ class StudySessionDB(Base):
     duration_minutes = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     completed_at = Column(DateTime, nullable=True)
+    target_count = Column(Integer, default=10)  # Cards queued at start and per refill
+    preferred_difficulty = Column(String, nullable=True)
+    queue_length = Column(Integer, default=0)  # Cards ever queued (next free position)
+    queue_cursor = Column(Integer, default=0)  # Position of the next card to hand out
     
     # Relationships
     user = relationship("UserDB", back_populates="study_sessions")
     quiz_attempts = relationship("QuizAttemptDB", back_populates="study_session")
+    
+    @property
+    def queue_remaining(self) -> int:
+        return max((self.queue_length or 0) - (self.queue_cursor or 0), 0)
+
+
+class StudySessionQueueDB(Base):
+    """Cards planned for a study session, in study order"""
+    __tablename__ = "study_session_queue"
+    
+    session_id = Column(Integer, ForeignKey("study_sessions.id"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id", ondelete="CASCADE"))
 
 
 class QuizAttemptDB(Base):
@@ -77,14 +164,107 @@ class QuizAttemptDB(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     study_session_id = Column(Integer, ForeignKey("study_sessions.id"))
-    flashcard_id = Column(Integer, ForeignKey("flashcards.id"))
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), index=True)
     is_correct = Column(Boolean)
     response_time_seconds = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # When answered (client time for synced attempts)
+    client_attempt_id = Column(String(36), nullable=True)  # Client UUID; makes sync uploads idempotent
     
     # Relationships
     study_session = relationship("StudySessionDB", back_populates="quiz_attempts")
     flashcard = relationship("FlashcardDB", back_populates="quiz_attempts")
+    
+    __table_args__ = (
+        Index("ux_quiz_attempts_client_attempt_id", "client_attempt_id", unique=True),
+    )
+
+
+class UserAnalyticsDB(Base):
+    """Per-user analytics rollup, maintained incrementally"""
+    __tablename__ = "user_analytics"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_cards = Column(Integer, default=0)
+    total_sessions = Column(Integer, default=0)  # Completed sessions
+    total_study_minutes = Column(Float, default=0.0)
+    total_attempts = Column(Integer, default=0)
+    correct_attempts = Column(Integer, default=0)
+    
+    # Streak state
+    longest_streak = Column(Integer, default=0)
+    streak_days = Column(Integer, default=0)  # Consecutive study days ending on last_study_date
+    streak_sessions = Column(Integer, default=0)  # Sessions completed during that run
+    last_study_date = Column(Date, nullable=True)
+    
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UserDailyAnalyticsDB(Base):
+    """Per-user, per-day analytics rollup"""
+    __tablename__ = "user_daily_analytics"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    sessions = Column(Integer, default=0)  # Sessions completed that day
+    study_minutes = Column(Float, default=0.0)  # Minutes of sessions started that day
+    attempts = Column(Integer, default=0)
+    correct_attempts = Column(Integer, default=0)
+    new_cards = Column(Integer, default=0)  # Cards reviewed for the first time that day
+
+
+class UserTopicAnalyticsDB(Base):
+    """Per-user, per-topic analytics rollup"""
+    __tablename__ = "user_topic_analytics"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    topic = Column(String, primary_key=True)
+    cards = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    correct_attempts = Column(Integer, default=0)
+
+
+class EmbeddingJobDB(Base):
+    """Resumable re-embedding job progress"""
+    __tablename__ = "embedding_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    model_id = Column(String, index=True)  # Target embedding model
+    status = Column(String, default="pending")  # pending, running, paused, completed, failed
+    chunk_size = Column(Integer, default=500)
+    last_flashcard_id = Column(Integer, default=0)  # Keyset cursor
+    processed = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    run_started_at = Column(DateTime, nullable=True)  # Start of the current run
+    run_processed = Column(Integer, default=0)  # Cards processed in the current run
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class GenerationJobDB(Base):
+    """Queued LLM generation request, processed by the background worker pool"""
+    __tablename__ = "generation_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    kind = Column(String, default="text")  # text or document
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed
+    text = Column(Text)
+    topic = Column(String, default="General")
+    num_cards = Column(Integer, default=5)
+    difficulty = Column(String, default="medium")
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # Retry backoff
+    lease_expires_at = Column(DateTime, nullable=True)  # Running jobs past this are reclaimed
+    created_count = Column(Integer, default=0)
+    card_ids = Column(Text, nullable=True)  # JSON list of created flashcard ids
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
 
 
 def get_db():
@@ -96,6 +276,14 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database"""
-    Base.metadata.create_all(bind=engine)
+    from app.db.migrations import upgrade_schema
+    
+    upgrade_schema(engine)
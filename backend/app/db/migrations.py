@@ -0,0 +1,203 @@
+"""
+Lightweight schema upgrades for existing databases.
+
+Missing tables are created, and columns and indexes added to existing
+models are applied, here on startup; data fixes for both run once, in the
+same transaction.
+"""
+
+import json
+from typing import Callable, Dict, Optional, Set, Tuple
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Connection, Engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _backfill_next_review(conn: Connection) -> None:
+    """Cards reviewed before SM-2 state was persisted are due immediately"""
+    conn.execute(text(
+        "UPDATE flashcards SET next_review = last_reviewed "
+        "WHERE next_review IS NULL AND last_reviewed IS NOT NULL"
+    ))
+
+
+def _convert_json_embeddings(conn: Connection, chunk_size: int = 1000) -> None:
+    """Convert legacy JSON-text embeddings to the packed binary column"""
+    from app.services.embedding_codec import encode_embedding
+
+    columns = {c["name"] for c in inspect(conn).get_columns("flashcards")}
+    if "embedding" not in columns:
+        return
+
+    last_id = 0
+    converted = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, embedding FROM flashcards "
+            "WHERE id > :last_id AND embedding IS NOT NULL "
+            "ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": chunk_size}).all()
+        if not rows:
+            break
+
+        conn.execute(
+            text("UPDATE flashcards SET embedding_packed = :packed WHERE id = :id"),
+            [{"id": row_id, "packed": encode_embedding(json.loads(value))} for row_id, value in rows]
+        )
+        last_id = rows[-1][0]
+        converted += len(rows)
+
+    logger.info(f"Converted {converted} JSON embeddings to packed binary")
+
+    # Reclaim the space; older SQLite versions cannot drop columns
+    try:
+        with conn.begin_nested():
+            conn.execute(text("ALTER TABLE flashcards DROP COLUMN embedding"))
+    except Exception as e:
+        logger.warning(f"Could not drop legacy embedding column ({e}); clearing it instead")
+        conn.execute(text("UPDATE flashcards SET embedding = NULL"))
+
+
+def _backfill_embedding_model(conn: Connection) -> None:
+    """Embeddings stored before models were tracked came from the hash provider"""
+    from app.services.embeddings import HashEmbeddingProvider
+
+    conn.execute(
+        text("UPDATE flashcards SET embedding_model = :model_id WHERE embedding_packed IS NOT NULL"),
+        {"model_id": HashEmbeddingProvider(384).model_id}
+    )
+
+
+def _backfill_minhash(conn: Connection, chunk_size: int = 1000) -> None:
+    """Index existing cards for near-duplicate detection (existing duplicates are not flagged)"""
+    from app.services.dedup import DuplicateIndex, signature
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, user_id, question FROM flashcards "
+            "WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": chunk_size}).all()
+        if not rows:
+            break
+
+        signatures = [(row_id, user_id, signature(question or "")) for row_id, user_id, question in rows]
+        conn.execute(
+            text("UPDATE flashcards SET minhash = :minhash WHERE id = :id"),
+            [{"id": row_id, "minhash": sig.tobytes()} for row_id, _, sig in signatures]
+        )
+        conn.execute(
+            text(
+                "INSERT INTO flashcard_lsh_buckets (user_id, bucket, flashcard_id) "
+                "VALUES (:user_id, :bucket, :flashcard_id)"
+            ),
+            [
+                row
+                for row_id, user_id, sig in signatures
+                for row in DuplicateIndex.bucket_rows(user_id, row_id, sig)
+            ]
+        )
+        last_id = rows[-1][0]
+
+
+def _backfill_updated_at(conn: Connection) -> None:
+    """Cards last changed when created or last reviewed"""
+    conn.execute(text(
+        "UPDATE flashcards SET updated_at = COALESCE(last_reviewed, created_at) WHERE updated_at IS NULL"
+    ))
+
+
+def _backfill_new_cards(conn: Connection) -> None:
+    """Count each card's first attempt towards the day it was made"""
+    conn.execute(text(
+        "UPDATE user_daily_analytics SET new_cards = ("
+        "SELECT COUNT(*) FROM ("
+        "SELECT s.user_id AS user_id, date(MIN(a.created_at)) AS day "
+        "FROM quiz_attempts a JOIN study_sessions s ON s.id = a.study_session_id "
+        "GROUP BY a.flashcard_id, s.user_id"
+        ") first_reviews "
+        "WHERE first_reviews.user_id = user_daily_analytics.user_id "
+        "AND first_reviews.day = user_daily_analytics.date)"
+    ))
+
+
+def _backfill_analytics_rollup(conn: Connection) -> None:
+    """Build the analytics rollup from the history of users who predate it"""
+    from sqlalchemy.orm import Session
+    from app.services.analytics import AnalyticsRollup
+
+    user_ids = conn.execute(text(
+        "SELECT id FROM users WHERE id NOT IN (SELECT user_id FROM user_analytics) ORDER BY id"
+    )).scalars().all()
+
+    # Joins the upgrade's transaction instead of committing on its own
+    with Session(bind=conn) as db:
+        for user_id in user_ids:
+            AnalyticsRollup.rebuild_user(db, user_id)
+
+    logger.info(f"Built the analytics rollup for {len(user_ids)} users")
+
+
+# Data fixes to run once, right after the (table, column) pair is added;
+# a column of None means the whole table was just created
+BACKFILLS: Dict[Tuple[str, Optional[str]], Callable[[Connection], None]] = {
+    ("flashcards", "next_review"): _backfill_next_review,
+    ("flashcards", "embedding_packed"): _convert_json_embeddings,
+    ("flashcards", "embedding_model"): _backfill_embedding_model,
+    ("flashcards", "minhash"): _backfill_minhash,
+    ("flashcards", "updated_at"): _backfill_updated_at,
+    ("user_daily_analytics", "new_cards"): _backfill_new_cards,
+    ("user_analytics", None): _backfill_analytics_rollup,
+}
+
+
+def _add_column(conn: Connection, table, column) -> None:
+    """Issue ALTER TABLE ... ADD COLUMN for a column missing from the database"""
+    preparer = conn.dialect.identifier_preparer
+    ddl = "ALTER TABLE {} ADD COLUMN {} {}".format(
+        preparer.quote(table.name),
+        preparer.quote(column.name),
+        column.type.compile(dialect=conn.dialect)
+    )
+
+    # Give existing rows the model default so NOT NULL-ish columns are populated
+    default = column.default
+    if default is not None and default.is_scalar:
+        rendered = literal(default.arg).compile(
+            dialect=conn.dialect,
+            compile_kwargs={"literal_binds": True}
+        )
+        ddl += f" DEFAULT {rendered}"
+
+    conn.execute(text(ddl))
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """Create missing tables and add missing columns and indexes to existing ones"""
+    from app.db import Base
+
+    inspector = inspect(engine)
+    added: Set[Tuple[str, Optional[str]]] = set()
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                table.create(conn)
+                added.add((table.name, None))
+                continue
+
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    logger.info(f"Adding column {table.name}.{column.name}")
+                    _add_column(conn, table, column)
+                    added.add((table.name, column.name))
+
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+        for key, backfill in BACKFILLS.items():
+            if key in added:
+                backfill(conn)
@@ -4,7 +4,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.config import settings
 from app.db import init_db
-from app.routes import auth, flashcards, study, analytics
+from app.db.auth import password_hasher
+from app.services.llm_service import get_ollama_service
+from app.services.generation_jobs import generation_jobs
+from app.routes import auth, flashcards, study, analytics, admin
 import logging
 
 # Configure logging
@@ -38,6 +41,7 @@ app.include_router(auth.router)
 app.include_router(flashcards.router)
 app.include_router(study.router)
 app.include_router(analytics.router)
+app.include_router(admin.router)
 
 
 @app.on_event("startup")
@@ -46,6 +50,14 @@ async def startup_event():
     logger.info("Initializing database...")
     init_db()
     logger.info("Database initialized")
+    await generation_jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and close pooled connections to Ollama"""
+    await generation_jobs.stop()
+    await get_ollama_service().close()
 
 
 @app.get("/")
@@ -71,7 +83,11 @@ async def api_status():
     return {
         "status": "running",
         "environment": settings.ENVIRONMENT,
-        "database": "connected" if settings.DATABASE_URL else "not configured"
+        "database": "connected" if settings.DATABASE_URL else "not configured",
+        "ollama_queue": get_ollama_service().limiter.stats(),
+        "generation_cache": get_ollama_service().cache.stats() if get_ollama_service().cache else None,
+        "generation_jobs": await generation_jobs.stats(),
+        "password_hashing": password_hasher.stats()
     }
 
 
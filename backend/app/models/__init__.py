@@ -1,13 +1,19 @@
 from .user import User, UserCreate, UserLogin, UserResponse
-from .flashcard import Flashcard, FlashcardCreate, FlashcardUpdate, FlashcardResponse
+from .flashcard import Flashcard, FlashcardCreate, FlashcardUpdate, FlashcardResponse, FlashcardPage, FlashcardImportResponse, DocumentGenerateRequest
 from .study_session import StudySession, StudySessionResponse
-from .quiz_attempt import QuizAttempt, QuizAttemptResponse
-from .analytics import UserAnalytics, AnalyticsResponse
+from .quiz_attempt import (
+    QuizAttempt, QuizAttemptCreate, QuizAttemptResponse, QuizAnswerBatch, QuizAttemptResult, QuizAnswerBatchResponse
+)
+from .analytics import UserAnalytics, AnalyticsResponse, ReviewForecastDay, ReviewForecastResponse
+from .generation_job import GenerationJobCreate, GenerationJobResponse
+from .sync import SyncAttempt, SyncUpload, SyncCard, SyncSnapshotResponse, SyncUploadResponse
 
 __all__ = [
     "User", "UserCreate", "UserLogin", "UserResponse",
-    "Flashcard", "FlashcardCreate", "FlashcardUpdate", "FlashcardResponse",
+    "Flashcard", "FlashcardCreate", "FlashcardUpdate", "FlashcardResponse", "FlashcardPage", "FlashcardImportResponse", "DocumentGenerateRequest",
     "StudySession", "StudySessionResponse",
-    "QuizAttempt", "QuizAttemptResponse",
-    "UserAnalytics", "AnalyticsResponse"
+    "QuizAttempt", "QuizAttemptCreate", "QuizAttemptResponse", "QuizAnswerBatch", "QuizAttemptResult", "QuizAnswerBatchResponse",
+    "UserAnalytics", "AnalyticsResponse", "ReviewForecastDay", "ReviewForecastResponse",
+    "GenerationJobCreate", "GenerationJobResponse",
+    "SyncAttempt", "SyncUpload", "SyncCard", "SyncSnapshotResponse", "SyncUploadResponse"
 ]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, Dict, List
-from datetime import datetime
+from datetime import date, datetime
 
 
 class UserAnalytics(BaseModel):
@@ -32,3 +32,18 @@ class AnalyticsResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class ReviewForecastDay(BaseModel):
+    """Reviews scheduled on one day"""
+    date: date
+    reviews: int
+
+
+class ReviewForecastResponse(BaseModel):
+    """Upcoming review workload, per day"""
+    days: int
+    overdue: int  # Already due before today
+    new_cards: int  # Never reviewed, not scheduled yet
+    total_reviews: int  # Overdue plus everything in the window
+    forecast: List[ReviewForecastDay]
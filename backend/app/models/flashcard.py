@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -27,6 +27,14 @@ class FlashcardUpdate(BaseModel):
     difficulty: Optional[DifficultyLevel] = None
 
 
+class DocumentGenerateRequest(BaseModel):
+    """Long-document generation request (text is sent in the body, not the URL)"""
+    text: str
+    topic: str = "General"
+    num_cards: int = 20
+    difficulty: DifficultyLevel = DifficultyLevel.MEDIUM
+
+
 class FlashcardResponse(BaseModel):
     """Flashcard response schema"""
     id: int
@@ -36,13 +44,32 @@ class FlashcardResponse(BaseModel):
     difficulty: DifficultyLevel
     created_at: datetime
     last_reviewed: Optional[datetime] = None
+    next_review: Optional[datetime] = None
     review_count: int = 0
     difficulty_score: float = 0.5  # Between 0 and 1, where 1 is hardest
+    duplicate_of: Optional[int] = None  # Existing card this one nearly duplicates
     
     class Config:
         from_attributes = True
 
 
+class FlashcardPage(BaseModel):
+    """One keyset-paginated page of flashcards (items hold the requested fields)"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+class FlashcardImportResponse(BaseModel):
+    """Summary of a bulk import"""
+    imported: int
+    flagged: int
+    merged: int
+    skipped: int
+    failed: int
+    errors: List[Dict[str, Any]]
+    truncated: bool = False
+
+
 class Flashcard(BaseModel):
     """Flashcard model for database"""
     id: Optional[int] = None
@@ -55,7 +82,10 @@ class Flashcard(BaseModel):
     last_reviewed: Optional[datetime] = None
     review_count: int = 0
     difficulty_score: float = 0.5
-    embedding: Optional[str] = None  # Vector embedding for semantic search
+    next_review: Optional[datetime] = None
+    easiness: float = 2.5
+    interval: int = 0
+    embedding: Optional[bytes] = None  # Packed vector embedding for semantic search
     
     class Config:
         from_attributes = True
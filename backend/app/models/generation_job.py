@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+from app.models.flashcard import DifficultyLevel, FlashcardResponse
+
+
+class GenerationJobCreate(BaseModel):
+    """Background generation job submission schema"""
+    text: str
+    topic: str = "General"
+    num_cards: int = 5
+    difficulty: DifficultyLevel = DifficultyLevel.MEDIUM
+    document: bool = False  # Chunk long text and generate the chunks in parallel
+
+
+class GenerationJobResponse(BaseModel):
+    """Background generation job status schema"""
+    id: int
+    kind: str
+    status: str  # queued, running, completed, failed
+    topic: str
+    num_cards: int
+    difficulty: DifficultyLevel
+    attempts: int
+    max_attempts: int
+    created_count: int = 0
+    error: Optional[str] = None
+    queue_position: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    cards: List[FlashcardResponse] = []
+    
+    class Config:
+        from_attributes = True
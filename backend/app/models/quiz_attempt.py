@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -22,6 +22,28 @@ class QuizAttemptResponse(BaseModel):
         from_attributes = True
 
 
+class QuizAnswerBatch(BaseModel):
+    """Several quiz answers for one session, applied in order"""
+    attempts: List[QuizAttemptCreate]
+
+
+class QuizAttemptResult(QuizAttemptResponse):
+    """Recorded attempt plus the card's updated schedule"""
+    review_count: int
+    next_review: datetime
+    easiness: float
+    interval: int
+    difficulty_score: float
+
+
+class QuizAnswerBatchResponse(BaseModel):
+    """Batch answer outcome and the session's running totals"""
+    session_id: int
+    cards_studied: int
+    cards_correct: int
+    results: List[QuizAttemptResult]
+
+
 class QuizAttempt(BaseModel):
     """Quiz attempt model for database"""
     id: Optional[int] = None
@@ -29,6 +29,8 @@ class StudySessionResponse(BaseModel):
     duration_minutes: float
     created_at: datetime
     completed_at: Optional[datetime] = None
+    target_count: Optional[int] = None
+    queue_remaining: int = 0  # Queued cards not handed out yet
     
     class Config:
         from_attributes = True
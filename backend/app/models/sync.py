@@ -0,0 +1,53 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from uuid import UUID
+from app.models.quiz_attempt import QuizAttemptCreate
+
+
+class SyncAttempt(QuizAttemptCreate):
+    """Quiz attempt recorded offline"""
+    client_attempt_id: UUID  # Generated by the client; retried uploads are ignored
+    answered_at: datetime
+
+
+class SyncUpload(BaseModel):
+    """Offline attempt log; session_id attaches it to an existing session"""
+    attempts: List[SyncAttempt]
+    session_id: Optional[int] = None
+
+
+class SyncCard(BaseModel):
+    """Compact card with its SM-2 schedule, for offline study"""
+    id: int
+    question: str
+    answer: str
+    topic: Optional[str] = None
+    difficulty: Optional[str] = None
+    next_review: Optional[datetime] = None
+    easiness: float
+    interval: int
+    review_count: int
+    difficulty_score: float
+
+
+class SyncSnapshotResponse(BaseModel):
+    """Due-deck snapshot (full) or changes since a watermark (delta)"""
+    watermark: str
+    full: bool
+    cards: List[SyncCard]
+    deleted_ids: List[int]
+
+
+class SyncRejectedAttempt(BaseModel):
+    client_attempt_id: str
+    error: str
+
+
+class SyncUploadResponse(BaseModel):
+    """Outcome of merging an attempt log, with the touched cards' new schedules"""
+    session_id: Optional[int] = None
+    applied: int
+    duplicates: int
+    rejected: List[SyncRejectedAttempt]
+    cards: List[SyncCard]
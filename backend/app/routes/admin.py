@@ -0,0 +1,65 @@
+"""Admin maintenance routes"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.db import get_db, EmbeddingJobDB
+from app.config import settings
+from app.services.reembedding import ReembeddingJob, reembedding_runner
+import secrets
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def verify_admin_key(api_key: str = None):
+    """Check the admin API key (admin routes are disabled when none is configured)"""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+    
+    if not api_key or not secrets.compare_digest(api_key, settings.ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin API key"
+        )
+
+
+@router.post("/reembed", dependencies=[Depends(verify_admin_key)])
+def start_reembedding(chunk_size: int = 500, restart: bool = False):
+    """Start or resume re-embedding stale flashcards in the background"""
+    try:
+        job_id = reembedding_runner.start(chunk_size=chunk_size, restart=restart)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    return {"job_id": job_id, "status": "started"}
+
+
+@router.post("/reembed/stop", dependencies=[Depends(verify_admin_key)])
+def stop_reembedding():
+    """Pause the running re-embedding job after its current chunk"""
+    reembedding_runner.stop()
+    return {"status": "stopping" if reembedding_runner.running else "idle"}
+
+
+@router.get("/reembed", dependencies=[Depends(verify_admin_key)])
+def get_reembedding_progress(job_id: int = None, db: Session = Depends(get_db)):
+    """Progress and throughput of a re-embedding job (latest by default)"""
+    query = db.query(EmbeddingJobDB)
+    if job_id is not None:
+        query = query.filter(EmbeddingJobDB.id == job_id)
+    
+    job = query.order_by(EmbeddingJobDB.id.desc()).first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No re-embedding job found"
+        )
+    
+    progress = ReembeddingJob.progress(job)
+    progress["worker_running"] = reembedding_runner.running
+    return progress
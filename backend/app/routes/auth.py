@@ -1,21 +1,39 @@
 """Authentication routes"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from app.db import SessionLocal, get_db, UserDB, hash_password, verify_password, create_access_token
+from app.db import get_async_db, UserDB
+from app.db.auth import create_access_token, password_hasher, PasswordHasherBusyError
+from app.routes.dependencies import CurrentUser, get_current_user
 from app.models import UserCreate, UserLogin, UserResponse
+from app.services.rate_limit import RateLimiter
 from app.config import settings
+import math
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+# Separate buckets per client address and per account, so neither one
+# client nor a distributed guess at one account can flood the hash pool
+ip_login_limiter = RateLimiter(settings.LOGIN_IP_RATE_PER_MINUTE, settings.LOGIN_IP_BURST)
+email_login_limiter = RateLimiter(settings.LOGIN_EMAIL_RATE_PER_MINUTE, settings.LOGIN_EMAIL_BURST)
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, try again shortly",
+        headers={"Retry-After": "2"}
+    )
+
 
 @router.post("/register", response_model=UserResponse)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if user exists
-    existing_user = db.query(UserDB).filter(
+    existing_user = await db.scalar(select(UserDB.id).where(
         (UserDB.email == user_data.email) | (UserDB.username == user_data.username)
-    ).first()
+    ).limit(1))
     
     if existing_user:
         raise HTTPException(
@@ -23,8 +41,12 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Email or username already registered"
         )
     
-    # Create new user
-    hashed_password = hash_password(user_data.password)
+    # Create new user (bcrypt runs on its own bounded pool)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusyError:
+        raise _busy()
+    
     new_user = UserDB(
         email=user_data.email,
         username=user_data.username,
@@ -32,23 +54,53 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     return UserResponse.from_orm(new_user)
 
 
 @router.post("/login")
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
-    """Login user and return JWT token"""
-    user = db.query(UserDB).filter(UserDB.email == credentials.email).first()
+async def login(credentials: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Login user and return JWT token.
+    
+    Attempts are rate limited per client address and per email (429), and
+    answered with 503 when the password hashing pool is saturated. A
+    password hash made with an outdated work factor is replaced on success.
+    """
+    client = request.client.host if request.client else "unknown"
+    wait = max(
+        ip_login_limiter.acquire(client),
+        email_login_limiter.acquire(credentials.email.lower())
+    )
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, slow down",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+    
+    user = await db.scalar(select(UserDB).where(UserDB.email == credentials.email))
+    
+    verified = False
+    if user:
+        try:
+            verified, new_hash = await password_hasher.verify_and_update(
+                credentials.password, user.hashed_password
+            )
+        except PasswordHasherBusyError:
+            raise _busy()
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)},
@@ -63,30 +115,14 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user(token: str = None, db: Session = Depends(get_db)):
+async def read_current_user(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get current user from token"""
-    from app.db.auth import decode_token
-    
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No token provided"
-        )
-    
-    payload = decode_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = int(payload.get("sub"))
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+    current = await db.get(UserDB, user.id)
     
-    if not user:
+    if not current:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return UserResponse.from_orm(user)
+    return UserResponse.from_orm(current)
@@ -0,0 +1,154 @@
+"""
+Shared route dependencies.
+
+`get_current_user` authenticates a request from an `Authorization: Bearer`
+header or the legacy `?token=` query parameter. Routes only need the
+caller's id, which the signed `sub` claim already provides, so the user row
+is not loaded: decoded tokens and confirmed user ids are kept in small TTL
+caches and the database is only asked whether the user exists on a cache
+miss. It runs on the event loop with an async session, so authenticating
+never takes a threadpool slot; `get_current_user_sync` does the same check
+for routes on a sync session, with the route's own session, so a request
+never holds two connections.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import get_async_db, get_db, UserDB
+from app.db.auth import decode_token
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """The authenticated caller"""
+    id: int
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire, bounded by LRU eviction"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl_seconds: Optional[float] = None) -> None:
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# token -> user id, and user ids known to exist
+_token_cache = TTLCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
+_user_cache = TTLCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
+
+
+def forget_user(user_id: int) -> None:
+    """Stop vouching for a user (call when an account is removed)"""
+    _user_cache.discard(user_id)
+
+
+def _user_id_from_token(token: str) -> int:
+    user_id = _token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    payload = decode_token(token)
+    try:
+        user_id = int(payload["sub"])
+    except (TypeError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    # Never cache a token past its own expiry
+    expires_in = payload.get("exp", time.time()) - time.time()
+    _token_cache.put(token, user_id, ttl_seconds=expires_in)
+    return user_id
+
+
+def _request_token(token: Optional[str], credentials: Optional[HTTPAuthorizationCredentials]) -> str:
+    token = credentials.credentials if credentials else token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No token provided",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return token
+
+
+def _confirm_user(user_id: int, exists: Optional[int]) -> None:
+    if exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    _user_cache.put(user_id, True)
+
+
+async def get_current_user(
+    token: Optional[str] = Query(None, description="Access token (alternative to the Authorization header)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    """Authenticate the request from its bearer header or `token` query parameter"""
+    user_id = _user_id_from_token(_request_token(token, credentials))
+
+    if _user_cache.get(user_id) is None:
+        _confirm_user(user_id, await db.scalar(select(UserDB.id).where(UserDB.id == user_id)))
+
+    return CurrentUser(id=user_id)
+
+
+def get_current_user_sync(
+    token: Optional[str] = Query(None, description="Access token (alternative to the Authorization header)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: Session = Depends(get_db)
+) -> CurrentUser:
+    """get_current_user for routes that use a sync session (shares the route's session)"""
+    user_id = _user_id_from_token(_request_token(token, credentials))
+
+    if _user_cache.get(user_id) is None:
+        _confirm_user(user_id, db.scalar(select(UserDB.id).where(UserDB.id == user_id)))
+
+    return CurrentUser(id=user_id)
@@ -1,77 +1,307 @@
 """Flashcard routes"""
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.db import get_db, UserDB, FlashcardDB, decode_token
-from app.models import FlashcardCreate, FlashcardUpdate, FlashcardResponse
-from app.services.llm_service import OllamaService, VectorEmbeddingService
+from typing import List, Optional, Tuple
+from app.db import get_db, get_async_db, AsyncSessionLocal, FlashcardDB, FlashcardTombstoneDB, GenerationJobDB
+from app.routes.dependencies import CurrentUser, get_current_user, get_current_user_sync
+from app.models import (
+    FlashcardCreate, FlashcardUpdate, FlashcardResponse, FlashcardPage, FlashcardImportResponse,
+    DocumentGenerateRequest, GenerationJobCreate, GenerationJobResponse
+)
+from app.models.flashcard import DifficultyLevel
+from app.services.llm_service import OllamaBusyError, OllamaStreamError, get_ollama_service
+from app.services.embeddings import EmbeddingProviderError, card_text, get_embedding_provider
+from app.services.analytics import AnalyticsRollup
+from app.services.vector_index import vector_index
+from app.services.embedding_codec import encode_embedding
+from app.services.document_ingest import DocumentIngestor
+from app.services.card_store import save_generated_cards
+from app.services.dedup import DEDUP_MODES, DuplicateIndex, resolve_mode
+from app.services.generation_jobs import GenerationJobQueue, generation_jobs
+from app.services.card_io import (
+    FORMATS, MEDIA_TYPES, CardImporter, ImportFormatError, export_cards, read_rows, resolve_format
+)
+from app.config import settings
 from datetime import datetime
+import base64
+import io
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/flashcards", tags=["flashcards"])
 
+DEDUP_MODE_PATTERN = f"^({'|'.join(DEDUP_MODES)})$"
+FORMAT_PATTERN = f"^({'|'.join(FORMATS)})$"
+
+
+def _encode_cursor(created_at: datetime, card_id: int) -> str:
+    """Opaque cursor for the (created_at, id) keyset position after a card"""
+    raw = json.dumps([created_at.isoformat(), card_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of _encode_cursor; raises 400 on malformed input"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, card_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(card_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
 
-def get_current_user(token: str, db: Session = Depends(get_db)) -> UserDB:
-    """Get current user from token"""
-    if not token:
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    """Requested response fields (all FlashcardResponse fields by default)"""
+    allowed = list(FlashcardResponse.model_fields)
+    if not fields:
+        return allowed
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No token provided"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)} (choose from {', '.join(allowed)})"
         )
     
-    payload = decode_token(token)
-    if not payload:
+    # The id is always returned so clients can address the card
+    return ["id"] + [field for field in requested if field != "id"]
+
+
+@router.get("/", response_model=FlashcardPage)
+async def get_flashcards(
+    user: CurrentUser = Depends(get_current_user),
+    topic: Optional[str] = Query(None),
+    difficulty: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(settings.FLASHCARD_PAGE_SIZE, ge=1, le=settings.FLASHCARD_MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get user's flashcards with optional filtering, oldest first.
+    
+    Pages are keyset-paginated on (created_at, id): pass the returned
+    `next_cursor` to get the following page. Only the requested `fields`
+    are selected from the database.
+    """
+    output_fields = _parse_fields(fields)
+    
+    # created_at is needed for the cursor even when not requested
+    selected = list(dict.fromkeys(output_fields + ["created_at"]))
+    query = select(*[getattr(FlashcardDB, field) for field in selected]).where(
+        FlashcardDB.user_id == user.id
+    )
+    
+    if topic:
+        query = query.where(FlashcardDB.topic == topic)
+    
+    if difficulty:
+        query = query.where(FlashcardDB.difficulty == difficulty)
+    
+    if cursor:
+        after_created_at, after_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            FlashcardDB.created_at > after_created_at,
+            and_(FlashcardDB.created_at == after_created_at, FlashcardDB.id > after_id)
+        ))
+    
+    # One extra row tells us whether another page exists
+    rows = (await db.execute(query.order_by(FlashcardDB.created_at, FlashcardDB.id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    next_cursor = None
+    if has_more:
+        last = rows[-1]._mapping
+        next_cursor = _encode_cursor(last["created_at"], last["id"])
+    
+    return {
+        "items": [{field: row._mapping[field] for field in output_fields} for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/search")
+def search_flashcards(
+    user: CurrentUser = Depends(get_current_user_sync),
+    q: str = Query(..., min_length=1),
+    k: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Semantic search over the user's flashcards"""
+    query_vector = get_embedding_provider().embed(q)
+    matches = vector_index.search(db, user.id, query_vector, k=k)
+    
+    if not matches:
+        return {"results": []}
+    
+    cards = db.query(FlashcardDB).filter(
+        FlashcardDB.user_id == user.id,
+        FlashcardDB.id.in_([card_id for card_id, _ in matches])
+    ).all()
+    cards_by_id = {card.id: card for card in cards}
+    
+    return {
+        "results": [
+            {"score": score, "card": FlashcardResponse.from_orm(cards_by_id[card_id])}
+            for card_id, score in matches
+            if card_id in cards_by_id
+        ]
+    }
+
+
+async def _job_response(db: AsyncSession, job: GenerationJobDB) -> GenerationJobResponse:
+    """Job status with its queue position and, once completed, its cards"""
+    response = GenerationJobResponse.from_orm(job)
+    response.queue_position = await GenerationJobQueue.queue_position(db, job)
+    
+    card_ids = GenerationJobQueue.card_ids(job)
+    if card_ids:
+        cards = await db.scalars(select(FlashcardDB).where(
+            FlashcardDB.user_id == job.user_id,
+            FlashcardDB.id.in_(card_ids)
+        ).order_by(FlashcardDB.id))
+        response.cards = [FlashcardResponse.from_orm(card) for card in cards]
+    
+    return response
+
+
+@router.post("/jobs", response_model=GenerationJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_generation_job(
+    job_data: GenerationJobCreate,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue flashcard generation in the background; poll the job for results"""
+    if not job_data.text.strip():
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Text is empty"
         )
     
-    user_id = int(payload.get("sub"))
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
+    job = await generation_jobs.submit(
+        db,
+        user_id=user.id,
+        text=job_data.text,
+        topic=job_data.topic,
+        num_cards=min(job_data.num_cards, settings.DOCUMENT_MAX_CARDS),
+        difficulty=job_data.difficulty.value,
+        kind="document" if job_data.document else "text"
+    )
+    generation_jobs.notify()
     
-    if not user:
+    return await _job_response(db, job)
+
+
+@router.get("/jobs", response_model=List[GenerationJobResponse])
+async def list_generation_jobs(
+    user: CurrentUser = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Most recent generation jobs for current user"""
+    jobs = await db.scalars(select(GenerationJobDB).where(
+        GenerationJobDB.user_id == user.id
+    ).order_by(GenerationJobDB.id.desc()).limit(limit))
+    
+    return [await _job_response(db, job) for job in jobs.all()]
+
+
+@router.get("/jobs/{job_id}", response_model=GenerationJobResponse)
+async def get_generation_job(
+    job_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Status, progress and results of a generation job"""
+    job = await db.scalar(select(GenerationJobDB).where(
+        GenerationJobDB.id == job_id,
+        GenerationJobDB.user_id == user.id
+    ))
+    
+    if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            detail="Generation job not found"
         )
     
-    return user
+    return await _job_response(db, job)
 
 
-@router.get("/", response_model=List[FlashcardResponse])
-def get_flashcards(
-    token: str,
-    topic: Optional[str] = Query(None),
-    difficulty: Optional[str] = Query(None),
+@router.post("/import", response_model=FlashcardImportResponse)
+def import_flashcards(
+    user: CurrentUser = Depends(get_current_user_sync),
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format", pattern=FORMAT_PATTERN),
+    topic: str = Query("Imported", description="Topic for rows without one"),
+    difficulty: DifficultyLevel = Query(DifficultyLevel.MEDIUM, description="Difficulty for rows without one"),
+    on_duplicate: Optional[str] = Query(None, pattern=DEDUP_MODE_PATTERN),
     db: Session = Depends(get_db)
 ):
-    """Get user's flashcards with optional filtering"""
-    user = get_current_user(token, db)
-    
-    query = db.query(FlashcardDB).filter(FlashcardDB.user_id == user.id)
+    """
+    Bulk-import flashcards from a CSV, JSON Lines or Anki TSV upload.
     
-    if topic:
-        query = query.filter(FlashcardDB.topic == topic)
+    The format defaults to the file extension. The upload is parsed as a
+    stream and stored in committed batches; invalid rows are reported
+    (line numbers) without stopping the import, and near-duplicates are
+    handled per `on_duplicate` or DEDUP_MODE.
+    """
+    try:
+        file_format = resolve_format(file_format, file.filename)
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        rows = read_rows(stream, file_format)
+        result = CardImporter().run(
+            db, user.id, rows,
+            topic=topic,
+            difficulty=difficulty.value,
+            on_duplicate=on_duplicate
+        )
+    except ImportFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    if difficulty:
-        query = query.filter(FlashcardDB.difficulty == difficulty)
+    return FlashcardImportResponse(**result.__dict__)
+
+
+@router.get("/export")
+def export_flashcards(
+    user: CurrentUser = Depends(get_current_user),
+    file_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN),
+    topic: Optional[str] = Query(None)
+):
+    """Download the user's flashcards (optionally one topic) as CSV, JSON Lines or Anki TSV"""
+    extension = "txt" if file_format == "tsv" else file_format
     
-    flashcards = query.all()
-    return [FlashcardResponse.from_orm(card) for card in flashcards]
+    return StreamingResponse(
+        export_cards(user.id, file_format, topic),
+        media_type=MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="flashcards.{extension}"'}
+    )
 
 
 @router.get("/{flashcard_id}", response_model=FlashcardResponse)
-def get_flashcard(
+async def get_flashcard(
     flashcard_id: int,
-    token: str,
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific flashcard"""
-    user = get_current_user(token, db)
-    flashcard = db.query(FlashcardDB).filter(
+    flashcard = await db.scalar(select(FlashcardDB).where(
         FlashcardDB.id == flashcard_id,
         FlashcardDB.user_id == user.id
-    ).first()
+    ))
     
     if not flashcard:
         raise HTTPException(
@@ -85,15 +315,34 @@ def get_flashcard(
 @router.post("/", response_model=FlashcardResponse)
 def create_flashcard(
     card_data: FlashcardCreate,
-    token: str,
+    user: CurrentUser = Depends(get_current_user_sync),
+    on_duplicate: Optional[str] = Query(None, pattern=DEDUP_MODE_PATTERN),
     db: Session = Depends(get_db)
 ):
-    """Create a new flashcard"""
-    user = get_current_user(token, db)
+    """
+    Create a new flashcard.
+    
+    A near-duplicate of an existing question is flagged (duplicate_of),
+    rejected with 409 (skip) or answered with the existing card (merge),
+    per `on_duplicate` or DEDUP_MODE.
+    """
+    mode = resolve_mode(on_duplicate)
+    
+    [(signature, duplicate_id, _)] = DuplicateIndex.classify(db, user.id, [card_data.question])
+    
+    if duplicate_id is not None and mode == "skip":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Near-duplicate of flashcard {duplicate_id}"
+        )
+    
+    if duplicate_id is not None and mode == "merge":
+        existing = db.query(FlashcardDB).filter(FlashcardDB.id == duplicate_id).first()
+        return FlashcardResponse.from_orm(existing)
     
     # Generate embedding
-    embedding_vector = VectorEmbeddingService.simple_embedding(
-        card_data.question + " " + card_data.answer
+    embedding_vector = get_embedding_provider().embed(
+        card_text(card_data.question, card_data.answer)
     )
     
     new_card = FlashcardDB(
@@ -102,13 +351,20 @@ def create_flashcard(
         answer=card_data.answer,
         topic=card_data.topic,
         difficulty=card_data.difficulty,
-        embedding=json.dumps(embedding_vector)
+        embedding=encode_embedding(embedding_vector),
+        embedding_model=get_embedding_provider().model_id,
+        duplicate_of=duplicate_id if mode == "flag" else None
     )
     
     db.add(new_card)
+    db.flush()
+    DuplicateIndex.add(db, new_card, signature)
+    AnalyticsRollup.record_cards_created(db, user.id, card_data.topic)
     db.commit()
     db.refresh(new_card)
     
+    vector_index.upsert(user.id, new_card.id, embedding_vector)
+    
     return FlashcardResponse.from_orm(new_card)
 
 
@@ -116,11 +372,10 @@ def create_flashcard(
 def update_flashcard(
     flashcard_id: int,
     update_data: FlashcardUpdate,
-    token: str,
+    user: CurrentUser = Depends(get_current_user_sync),
     db: Session = Depends(get_db)
 ):
     """Update a flashcard"""
-    user = get_current_user(token, db)
     flashcard = db.query(FlashcardDB).filter(
         FlashcardDB.id == flashcard_id,
         FlashcardDB.user_id == user.id
@@ -132,6 +387,8 @@ def update_flashcard(
             detail="Flashcard not found"
         )
     
+    old_topic = flashcard.topic
+    
     # Update fields
     if update_data.question:
         flashcard.question = update_data.question
@@ -144,25 +401,32 @@ def update_flashcard(
     
     # Regenerate embedding if question or answer changed
     if update_data.question or update_data.answer:
-        embedding_vector = VectorEmbeddingService.simple_embedding(
-            flashcard.question + " " + flashcard.answer
+        embedding_vector = get_embedding_provider().embed(
+            card_text(flashcard.question, flashcard.answer)
         )
-        flashcard.embedding = json.dumps(embedding_vector)
+        flashcard.embedding = encode_embedding(embedding_vector)
+        flashcard.embedding_model = get_embedding_provider().model_id
     
+    if update_data.question:
+        DuplicateIndex.reindex(db, flashcard)
+    
+    AnalyticsRollup.record_card_topic_changed(db, flashcard, old_topic)
     db.commit()
     db.refresh(flashcard)
     
+    if update_data.question or update_data.answer:
+        vector_index.upsert(user.id, flashcard.id, embedding_vector)
+    
     return FlashcardResponse.from_orm(flashcard)
 
 
 @router.delete("/{flashcard_id}")
 def delete_flashcard(
     flashcard_id: int,
-    token: str,
+    user: CurrentUser = Depends(get_current_user_sync),
     db: Session = Depends(get_db)
 ):
     """Delete a flashcard"""
-    user = get_current_user(token, db)
     flashcard = db.query(FlashcardDB).filter(
         FlashcardDB.id == flashcard_id,
         FlashcardDB.user_id == user.id
@@ -174,31 +438,41 @@ def delete_flashcard(
             detail="Flashcard not found"
         )
     
+    AnalyticsRollup.record_card_deleted(db, flashcard)
+    DuplicateIndex.remove(db, flashcard_id)
+    db.add(FlashcardTombstoneDB(user_id=user.id, flashcard_id=flashcard_id))
     db.delete(flashcard)
     db.commit()
     
+    vector_index.remove(user.id, flashcard_id)
+    
     return {"message": "Flashcard deleted successfully"}
 
 
 @router.post("/generate-from-text")
 async def generate_flashcards_from_text(
     text: str,
-    token: str,
+    user: CurrentUser = Depends(get_current_user),
     topic: str = "General",
     num_cards: int = 5,
     difficulty: str = "medium",
-    db: Session = Depends(get_db)
+    on_duplicate: Optional[str] = Query(None, pattern=DEDUP_MODE_PATTERN),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate flashcards from text using Ollama"""
-    user = get_current_user(token, db)
-    
     # Generate flashcards using LLM
-    ollama_service = OllamaService()
-    generated_cards = await ollama_service.generate_flashcards(
-        text=text,
-        num_cards=num_cards,
-        difficulty=difficulty
-    )
+    try:
+        generated_cards = await get_ollama_service().generate_flashcards(
+            text=text,
+            num_cards=num_cards,
+            difficulty=difficulty
+        )
+    except OllamaBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Flashcard generation is busy, try again shortly ({e})",
+            headers={"Retry-After": "30"}
+        )
     
     if not generated_cards:
         raise HTTPException(
@@ -206,40 +480,134 @@ async def generate_flashcards_from_text(
             detail="Failed to generate flashcards. Is Ollama running?"
         )
     
-    # Save to database
-    created_cards = []
-    for card_data in generated_cards:
-        embedding_vector = VectorEmbeddingService.simple_embedding(
-            card_data["question"] + " " + card_data["answer"]
+    saved = await save_generated_cards(db, user.id, generated_cards, topic, difficulty, on_duplicate)
+    
+    return {
+        "created": len(saved.created),
+        "merged": len(saved.merged),
+        "skipped": saved.skipped,
+        "cards": [FlashcardResponse.from_orm(card) for card in saved.cards]
+    }
+
+
+@router.post("/generate-from-document")
+async def generate_flashcards_from_document(
+    request: DocumentGenerateRequest,
+    user: CurrentUser = Depends(get_current_user),
+    on_duplicate: Optional[str] = Query(None, pattern=DEDUP_MODE_PATTERN),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Generate a deck from a long document (chunked and generated in parallel)"""
+    if not request.text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Document text is empty"
         )
-        
-        new_card = FlashcardDB(
-            user_id=user.id,
-            question=card_data["question"],
-            answer=card_data["answer"],
-            topic=topic,
-            difficulty=difficulty,
-            embedding=json.dumps(embedding_vector)
+    
+    result = await DocumentIngestor().generate(
+        text=request.text,
+        num_cards=min(request.num_cards, settings.DOCUMENT_MAX_CARDS),
+        difficulty=request.difficulty.value
+    )
+    
+    if not result["cards"]:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate flashcards. Is Ollama running?"
         )
-        
-        db.add(new_card)
-        created_cards.append(new_card)
     
-    db.commit()
+    saved = await save_generated_cards(
+        db, user.id, result["cards"], request.topic, request.difficulty.value, on_duplicate
+    )
     
     return {
-        "created": len(created_cards),
-        "cards": [FlashcardResponse.from_orm(card) for card in created_cards]
+        "created": len(saved.created),
+        "merged": len(saved.merged),
+        "skipped": saved.skipped,
+        "chunks": result["chunks"],
+        "failed_chunks": result["failed_chunks"],
+        "duplicates_removed": result["duplicates_removed"],
+        "cards": [FlashcardResponse.from_orm(card) for card in saved.cards]
     }
 
 
+@router.post("/generate-from-text/stream")
+async def stream_flashcards_from_text(
+    text: str,
+    user: CurrentUser = Depends(get_current_user),
+    topic: str = "General",
+    num_cards: int = 5,
+    difficulty: str = "medium",
+    on_duplicate: Optional[str] = Query(None, pattern=DEDUP_MODE_PATTERN)
+):
+    """
+    Generate flashcards from text, saving and streaming each card as soon as
+    Ollama finishes it.
+    
+    The response is newline-delimited JSON: one {"type": "card", "card": ...}
+    line per saved (or, when merging, matched existing) card, a
+    {"type": "skipped"} line per skipped duplicate, then
+    {"type": "done", "created": n}. If generation cannot start or breaks
+    off, or a card cannot be saved, the last line is
+    {"type": "error", "detail": ..., "created": n} instead; cards streamed
+    before it stay saved.
+    """
+    user_id = user.id
+    ollama_service = get_ollama_service()
+    
+    if ollama_service.limiter.saturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Flashcard generation is busy, try again shortly",
+            headers={"Retry-After": "30"}
+        )
+    
+    async def card_events():
+        created = 0
+        # The stream outlives the request's dependencies, so it uses its own session
+        stream_db = AsyncSessionLocal()
+        # Closed explicitly, so an early return frees the generation slot at once
+        generated = ollama_service.stream_flashcards(text=text, num_cards=num_cards, difficulty=difficulty)
+        try:
+            async for card_data in generated:
+                try:
+                    saved = await save_generated_cards(
+                        stream_db, user_id, [card_data], topic, difficulty, on_duplicate
+                    )
+                except (EmbeddingProviderError, SQLAlchemyError) as e:
+                    logger.error(f"Saving a streamed card failed after {created} cards: {e}")
+                    await stream_db.rollback()
+                    yield json.dumps({
+                        "type": "error", "detail": "Generated cards could not be saved", "created": created
+                    }) + "\n"
+                    return
+                created += len(saved.created)
+                
+                if not saved.cards:
+                    yield json.dumps({"type": "skipped", "question": card_data["question"]}) + "\n"
+                    continue
+                
+                card = FlashcardResponse.from_orm(saved.cards[0]).model_dump(mode="json")
+                yield json.dumps({"type": "card", "card": card, "merged": not saved.created}) + "\n"
+        
+        except (OllamaBusyError, OllamaStreamError) as e:
+            yield json.dumps({"type": "error", "detail": str(e), "created": created}) + "\n"
+            return
+        
+        finally:
+            await generated.aclose()
+            await stream_db.close()
+        
+        yield json.dumps({"type": "done", "created": created}) + "\n"
+    
+    return StreamingResponse(card_events(), media_type="application/x-ndjson")
+
+
 @router.get("/topics/list")
-def get_topics(token: str, db: Session = Depends(get_db)):
+async def get_topics(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get all topics for current user"""
-    user = get_current_user(token, db)
-    
-    topics = db.query(FlashcardDB.topic).filter(
+    topics = await db.scalars(select(FlashcardDB.topic).where(
         FlashcardDB.user_id == user.id
-    ).distinct().all()
+    ).distinct())
     
-    return {"topics": [t[0] for t in topics if t[0]]}
+    return {"topics": [topic for topic in topics if topic]}
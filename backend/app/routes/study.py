@@ -1,154 +1,128 @@
 """Study session and quiz routes"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Optional
-from app.db import get_db, UserDB, FlashcardDB, StudySessionDB, QuizAttemptDB, decode_token
-from app.models import StudySessionResponse, QuizAttemptCreate, QuizAttemptResponse
+from app.db import get_async_db, FlashcardDB, StudySessionDB, QuizAttemptDB
+from app.routes.dependencies import CurrentUser, get_current_user
+from app.models import (
+    StudySessionResponse, QuizAttemptCreate, QuizAttemptResponse,
+    QuizAnswerBatch, QuizAttemptResult, QuizAnswerBatchResponse,
+    SyncUpload, SyncSnapshotResponse, SyncUploadResponse, ReviewForecastResponse
+)
 from app.services.spaced_repetition import SpacedRepetitionScheduler
+from app.services.batch_scheduler import BatchScheduler, ScheduleState
+from app.services.analytics import AnalyticsEngine, AnalyticsRollup
+from app.services.session_queue import SessionQueue
+from app.services.study_sync import InvalidWatermarkError, StudySync
+from app.config import settings
 from datetime import datetime, timedelta
 import json
+import numpy as np
 
 router = APIRouter(prefix="/api/study", tags=["study"])
 
 
-def get_current_user(token: str, db: Session = Depends(get_db)) -> UserDB:
-    """Get current user from token"""
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="No token provided"
-        )
-    
-    payload = decode_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    
-    user_id = int(payload.get("sub"))
-    user = db.query(UserDB).filter(UserDB.id == user_id).first()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    return user
-
-
 @router.post("/session/start", response_model=StudySessionResponse)
-def start_study_session(
+async def start_study_session(
     topic: Optional[str] = None,
-    target_count: int = 10,
-    token: str = None,
-    db: Session = Depends(get_db)
+    target_count: int = Query(10, ge=1, le=settings.SESSION_MAX_TARGET_COUNT),
+    difficulty: Optional[str] = None,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Start a new study session"""
-    user = get_current_user(token, db)
+    """
+    Start a new study session.
     
+    The first `target_count` cards are chosen now and queued server-side;
+    cards-for-session hands them out in order.
+    """
     session = StudySessionDB(
         user_id=user.id,
         topic=topic,
-        status="active"
+        status="active",
+        target_count=target_count,
+        preferred_difficulty=difficulty
     )
     
     db.add(session)
-    db.commit()
-    db.refresh(session)
+    await db.flush()
+    await SessionQueue.fill(db, session, target_count)
+    await db.commit()
     
     return StudySessionResponse.from_orm(session)
 
 
 @router.get("/session/{session_id}", response_model=StudySessionResponse)
-def get_session(
+async def get_session(
     session_id: int,
-    token: str,
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get study session details"""
-    user = get_current_user(token, db)
-    
-    session = db.query(StudySessionDB).filter(
-        StudySessionDB.id == session_id,
-        StudySessionDB.user_id == user.id
-    ).first()
-    
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = await _get_user_session(db, user.id, session_id)
     
     return StudySessionResponse.from_orm(session)
 
 
 @router.post("/session/{session_id}/complete")
-def complete_session(
+async def complete_session(
     session_id: int,
-    token: str,
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Complete a study session"""
-    user = get_current_user(token, db)
-    
-    session = db.query(StudySessionDB).filter(
-        StudySessionDB.id == session_id,
-        StudySessionDB.user_id == user.id
-    ).first()
-    
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
+    session = await _get_user_session(db, user.id, session_id)
     
+    newly_completed = session.status != "completed"
     session.status = "completed"
     session.completed_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(session)
+    if newly_completed:
+        await db.run_sync(AnalyticsRollup.record_session_completed, session)
+    
+    await SessionQueue.clear(db, session)
+    await db.commit()
     
     return StudySessionResponse.from_orm(session)
 
 
 @router.get("/cards-for-session/{session_id}")
-def get_cards_for_session(
+async def get_cards_for_session(
     session_id: int,
-    token: str,
+    background_tasks: BackgroundTasks,
+    user: CurrentUser = Depends(get_current_user),
     difficulty: Optional[str] = None,
-    limit: int = 10,
-    db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=settings.SESSION_MAX_TARGET_COUNT),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get cards to study for current session using spaced repetition"""
-    user = get_current_user(token, db)
+    """
+    Get the next cards of the session's queue.
     
-    session = db.query(StudySessionDB).filter(
-        StudySessionDB.id == session_id,
-        StudySessionDB.user_id == user.id
-    ).first()
+    Each call continues where the previous one stopped, so calls never
+    return the same card twice. The queue is topped up in the background
+    when it runs low. A `difficulty` preference applies to cards queued
+    from now on.
+    """
+    session = await _get_user_session(db, user.id, session_id)
     
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
-        )
-    
-    # Get user's flashcards
-    query = db.query(FlashcardDB).filter(FlashcardDB.user_id == user.id)
+    if difficulty and difficulty != session.preferred_difficulty:
+        session.preferred_difficulty = difficulty
     
-    if session.topic:
-        query = query.filter(FlashcardDB.topic == session.topic)
+    if session.status != "completed" and not session.queue_remaining:
+        # Sessions from before queues existed, or a refill that fell behind
+        try:
+            await SessionQueue.fill(db, session, max(limit, session.target_count or 0))
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            await db.refresh(session)
     
-    cards = query.all()
+    selected_cards = await SessionQueue.pop(db, session, limit)
     
-    # Use spaced repetition algorithm to select cards
-    selected_cards = SpacedRepetitionScheduler.select_next_cards(
-        cards,
-        limit=limit,
-        preferred_difficulty=difficulty
-    )
+    if SessionQueue.runs_low(session):
+        background_tasks.add_task(SessionQueue.refill, session.id)
     
     return {
         "cards": [
@@ -159,24 +133,17 @@ def get_cards_for_session(
                 "difficulty": card.difficulty
             }
             for card in selected_cards
-        ]
+        ],
+        "remaining": session.queue_remaining
     }
 
 
-@router.post("/quiz/answer", response_model=QuizAttemptResponse)
-def submit_quiz_answer(
-    attempt_data: QuizAttemptCreate,
-    session_id: int,
-    token: str,
-    db: Session = Depends(get_db)
-):
-    """Submit quiz answer and update spaced repetition"""
-    user = get_current_user(token, db)
-    
-    session = db.query(StudySessionDB).filter(
+async def _get_user_session(db: AsyncSession, user_id: int, session_id: int) -> StudySessionDB:
+    """The user's study session, or 404"""
+    session = await db.scalar(select(StudySessionDB).where(
         StudySessionDB.id == session_id,
-        StudySessionDB.user_id == user.id
-    ).first()
+        StudySessionDB.user_id == user_id
+    ))
     
     if not session:
         raise HTTPException(
@@ -184,20 +151,17 @@ def submit_quiz_answer(
             detail="Session not found"
         )
     
-    flashcard = db.query(FlashcardDB).filter(
-        FlashcardDB.id == attempt_data.flashcard_id,
-        FlashcardDB.user_id == user.id
-    ).first()
-    
-    if not flashcard:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Flashcard not found"
-        )
-    
-    # Record quiz attempt
+    return session
+
+
+def _record_quiz_attempt(
+    db: AsyncSession,
+    session: StudySessionDB,
+    attempt_data: QuizAttemptCreate
+) -> QuizAttemptDB:
+    """Add the attempt and bump session stats (the card is rescheduled separately)"""
     quiz_attempt = QuizAttemptDB(
-        study_session_id=session_id,
+        study_session_id=session.id,
         flashcard_id=attempt_data.flashcard_id,
         is_correct=attempt_data.is_correct,
         response_time_seconds=attempt_data.response_time_seconds
@@ -205,67 +169,253 @@ def submit_quiz_answer(
     
     db.add(quiz_attempt)
     
-    # Update flashcard based on answer quality
-    quality = 5 if attempt_data.is_correct else 1  # 0-5 scale
+    # Update session stats
+    session.cards_studied += 1
+    if attempt_data.is_correct:
+        session.cards_correct += 1
     
-    next_review, easiness, interval = SpacedRepetitionScheduler.calculate_next_review(
-        quality=quality,
-        review_count=flashcard.review_count,
-        easiness_factor=max(1.3, min(2.5, flashcard.review_count + 1.3))
+    return quiz_attempt
+
+
+def _apply_quiz_attempt(
+    db: AsyncSession,
+    session: StudySessionDB,
+    flashcard: FlashcardDB,
+    attempt_data: QuizAttemptCreate
+) -> QuizAttemptDB:
+    """Record one answer: add the attempt, reschedule the card (SM-2) and bump session stats"""
+    quiz_attempt = _record_quiz_attempt(db, session, attempt_data)
+    
+    SpacedRepetitionScheduler.apply_review(
+        flashcard,
+        attempt_data.is_correct,
+        attempt_data.response_time_seconds
     )
     
-    flashcard.last_reviewed = datetime.utcnow()
-    flashcard.review_count += 1
+    return quiz_attempt
+
+
+@router.post("/quiz/answer", response_model=QuizAttemptResponse)
+async def submit_quiz_answer(
+    attempt_data: QuizAttemptCreate,
+    session_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Submit quiz answer and update spaced repetition"""
+    session = await _get_user_session(db, user.id, session_id)
     
-    # Update difficulty score based on performance
-    avg_response = attempt_data.response_time_seconds
-    flashcard.difficulty_score = SpacedRepetitionScheduler.update_difficulty_score(
-        flashcard.difficulty_score,
-        attempt_data.is_correct,
-        attempt_data.response_time_seconds,
-        avg_response
-    )
+    flashcard = await db.scalar(select(FlashcardDB).where(
+        FlashcardDB.id == attempt_data.flashcard_id,
+        FlashcardDB.user_id == user.id
+    ))
     
-    # Update session stats
-    session.cards_studied += 1
-    if attempt_data.is_correct:
-        session.cards_correct += 1
+    if not flashcard:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Flashcard not found"
+        )
+    
+    first_review = flashcard.review_count == 0
+    quiz_attempt = _apply_quiz_attempt(db, session, flashcard, attempt_data)
     
-    db.commit()
-    db.refresh(quiz_attempt)
+    await db.run_sync(AnalyticsRollup.record_attempt, user.id, flashcard.topic, attempt_data.is_correct)
+    if first_review:
+        await db.run_sync(AnalyticsRollup.record_new_cards_studied, user.id, [flashcard.last_reviewed])
+    await db.commit()
     
     return QuizAttemptResponse.from_orm(quiz_attempt)
 
 
-@router.get("/adaptive-difficulty/{session_id}")
-def get_adaptive_difficulty(
+@router.post("/quiz/answers", response_model=QuizAnswerBatchResponse)
+async def submit_quiz_answers(
+    batch: QuizAnswerBatch,
     session_id: int,
-    token: str,
-    db: Session = Depends(get_db)
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get recommended difficulty for adaptive quiz"""
-    user = get_current_user(token, db)
+    """
+    Submit several quiz answers at once (offline or rapid-fire study).
+    
+    Attempts are applied in order, so repeated answers to the same card
+    reschedule it step by step, and stored in a single transaction: if any
+    card is not found, none of the answers are recorded.
+    """
+    if not batch.attempts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No attempts provided"
+        )
     
-    session = db.query(StudySessionDB).filter(
-        StudySessionDB.id == session_id,
-        StudySessionDB.user_id == user.id
-    ).first()
+    if len(batch.attempts) > settings.QUIZ_BATCH_MAX_ATTEMPTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.QUIZ_BATCH_MAX_ATTEMPTS} attempts per batch"
+        )
     
-    if not session:
+    session = await _get_user_session(db, user.id, session_id)
+    
+    card_ids = {attempt.flashcard_id for attempt in batch.attempts}
+    flashcards = {
+        card.id: card
+        for card in await db.scalars(select(FlashcardDB).where(
+            FlashcardDB.id.in_(card_ids),
+            FlashcardDB.user_id == user.id
+        ))
+    }
+    
+    missing = sorted(card_ids - flashcards.keys())
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found"
+            detail=f"Flashcards not found: {', '.join(map(str, missing))}"
         )
     
+    quiz_attempts = [_record_quiz_attempt(db, session, attempt_data) for attempt_data in batch.attempts]
+    
+    # Reschedule all cards in one vectorized pass; `schedules` holds each
+    # card's state right after each answer, so a card answered twice
+    # reports both steps
+    cards = list(flashcards.values())
+    position = {card.id: index for index, card in enumerate(cards)}
+    new_cards = [card for card in cards if not card.review_count]
+    state = ScheduleState.from_cards(cards)
+    schedules = BatchScheduler.apply(
+        state,
+        [position[attempt_data.flashcard_id] for attempt_data in batch.attempts],
+        [attempt_data.is_correct for attempt_data in batch.attempts],
+        [attempt_data.response_time_seconds for attempt_data in batch.attempts],
+        np.full(len(batch.attempts), np.datetime64(datetime.utcnow(), "us"))
+    )
+    state.write_to(cards)
+    
+    await db.run_sync(AnalyticsRollup.record_attempts, user.id, [
+        (flashcards[attempt_data.flashcard_id].topic, attempt_data.is_correct, None)
+        for attempt_data in batch.attempts
+    ])
+    await db.run_sync(AnalyticsRollup.record_new_cards_studied, user.id, [card.last_reviewed for card in new_cards])
+    
+    # Flush assigns attempt ids and timestamps, so the response can be
+    # built without reloading every row after the commit
+    await db.flush()
+    results = [
+        QuizAttemptResult(
+            id=quiz_attempt.id,
+            flashcard_id=quiz_attempt.flashcard_id,
+            is_correct=quiz_attempt.is_correct,
+            response_time_seconds=quiz_attempt.response_time_seconds,
+            created_at=quiz_attempt.created_at,
+            **schedule
+        )
+        for quiz_attempt, schedule in zip(quiz_attempts, schedules.records())
+    ]
+    response = QuizAnswerBatchResponse(
+        session_id=session.id,
+        cards_studied=session.cards_studied,
+        cards_correct=session.cards_correct,
+        results=results
+    )
+    
+    await db.commit()
+    
+    return response
+
+
+@router.get("/forecast", response_model=ReviewForecastResponse)
+async def get_review_forecast(
+    user: CurrentUser = Depends(get_current_user),
+    days: int = Query(30, ge=1, le=365),
+    topic: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Reviews scheduled per day for the next `days` days (UTC), starting today.
+    
+    Index range reads on the next-review index, cheap enough to poll.
+    Overdue cards are reported separately rather than piled onto today.
+    """
+    return await db.run_sync(AnalyticsEngine.review_forecast, user.id, days, topic)
+
+
+@router.get("/sync/snapshot", response_model=SyncSnapshotResponse)
+async def get_sync_snapshot(
+    user: CurrentUser = Depends(get_current_user),
+    since: Optional[str] = Query(None, description="Watermark from the previous sync"),
+    topic: Optional[str] = Query(None),
+    horizon_days: int = Query(settings.SYNC_HORIZON_DAYS, ge=0, le=365),
+    limit: int = Query(settings.SYNC_SNAPSHOT_MAX_CARDS, ge=1, le=settings.SYNC_SNAPSHOT_MAX_CARDS),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Download cards for offline study.
+    
+    Without `since`, returns the due deck (cards due within `horizon_days`,
+    then new cards); with the watermark from a previous sync, returns only
+    cards changed since then and the ids of deleted cards.
+    """
+    try:
+        return await db.run_sync(StudySync.snapshot, user.id, since, topic, horizon_days, limit)
+    except InvalidWatermarkError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/sync/upload", response_model=SyncUploadResponse)
+async def upload_sync_log(
+    upload: SyncUpload,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Merge attempts recorded offline.
+    
+    Safe to retry: attempts are identified by their client_attempt_id and
+    applied once, in answered_at order. Attempts for deleted cards are
+    reported as rejected.
+    """
+    if len(upload.attempts) > settings.SYNC_MAX_ATTEMPTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.SYNC_MAX_ATTEMPTS} attempts per upload"
+        )
+    
+    session = await _get_user_session(db, user.id, upload.session_id) if upload.session_id else None
+    
+    result = await db.run_sync(StudySync.upload, user.id, upload.attempts, session)
+    
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The same attempts arrived concurrently in another upload
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Attempts are being synced by another request; retry the upload"
+        )
+    
+    return result
+
+
+@router.get("/adaptive-difficulty/{session_id}")
+async def get_adaptive_difficulty(
+    session_id: int,
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get recommended difficulty for adaptive quiz"""
+    await _get_user_session(db, user.id, session_id)
+    
     # Calculate accuracy
-    attempts = db.query(QuizAttemptDB).filter(
+    attempts = (await db.scalars(select(QuizAttemptDB.is_correct).where(
         QuizAttemptDB.study_session_id == session_id
-    ).all()
+    ))).all()
     
     if not attempts:
         return {"recommended_difficulty": "medium"}
     
-    accuracy = sum(1 for a in attempts if a.is_correct) / len(attempts)
+    accuracy = sum(1 for is_correct in attempts if is_correct) / len(attempts)
     
     # Adjust difficulty based on accuracy
     if accuracy > 0.8:
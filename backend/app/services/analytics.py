@@ -0,0 +1,630 @@
+"""
+Analytics aggregation over study history.
+
+AnalyticsEngine computes every statistic with SQL GROUP BY aggregates.
+AnalyticsRollup keeps those statistics materialized per user, per day and
+per topic, so the dashboard is a handful of primary-key reads; the engine
+is used to (re)build the rollup from full history.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.db import (
+    UserDB, FlashcardDB, StudySessionDB, QuizAttemptDB,
+    UserAnalyticsDB, UserDailyAnalyticsDB, UserTopicAnalyticsDB
+)
+
+
+def _as_date(value: Union[str, date, datetime, None]) -> Optional[date]:
+    """Normalize func.date() results (str on SQLite, date elsewhere)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class AnalyticsEngine:
+    """Computes dashboard statistics from SQL aggregates"""
+
+    DAILY_WINDOW_DAYS = 7
+
+    @staticmethod
+    def cards_by_topic(db: Session, user_id: int, now: Optional[datetime] = None) -> List[Tuple[Optional[str], int, int]]:
+        """(topic, cards, due cards) per topic (one query)"""
+        now = now or datetime.utcnow()
+        is_due = case(
+            (FlashcardDB.next_review.is_(None) | (FlashcardDB.next_review <= now), 1),
+            else_=0
+        )
+
+        rows = db.query(
+            FlashcardDB.topic,
+            func.count(FlashcardDB.id),
+            func.sum(is_due)
+        ).filter(
+            FlashcardDB.user_id == user_id
+        ).group_by(FlashcardDB.topic).order_by(FlashcardDB.topic).all()
+
+        return [(topic, count, due or 0) for topic, count, due in rows]
+
+    @staticmethod
+    def card_stats(db: Session, user_id: int, now: Optional[datetime] = None) -> Dict:
+        """Total cards, cards due for review and topic list (one query)"""
+        rows = AnalyticsEngine.cards_by_topic(db, user_id, now)
+
+        return {
+            "total_cards": sum(count for _, count, _ in rows),
+            "cards_due_for_review": sum(due for _, _, due in rows),
+            "topics": [topic for topic, _, _ in rows if topic]
+        }
+
+    @staticmethod
+    def cards_due(db: Session, user_id: int, now: Optional[datetime] = None) -> int:
+        """Count of new and due cards, served by the (user_id, next_review) index"""
+        now = now or datetime.utcnow()
+        return db.query(func.count(FlashcardDB.id)).filter(
+            FlashcardDB.user_id == user_id,
+            (FlashcardDB.next_review.is_(None) | (FlashcardDB.next_review <= now))
+        ).scalar() or 0
+
+    @staticmethod
+    def review_forecast(
+        db: Session,
+        user_id: int,
+        days: int = 30,
+        topic: Optional[str] = None,
+        today: Optional[date] = None
+    ) -> Dict:
+        """
+        Scheduled reviews per day for the next `days` days (two queries).
+
+        Never-reviewed cards are counted on their own so that the scheduled
+        ones are a range read of the (user_id, next_review) index, grouped in
+        SQL into at most `days` + 1 rows whatever the deck size.
+        """
+        today = today or datetime.utcnow().date()
+        start = datetime.combine(today, datetime.min.time())
+        end = start + timedelta(days=days)
+
+        def cards(*criteria):
+            query = db.query(*criteria).filter(FlashcardDB.user_id == user_id)
+            return query.filter(FlashcardDB.topic == topic) if topic else query
+
+        new_count = cards(func.count(FlashcardDB.id)).filter(FlashcardDB.next_review.is_(None)).scalar() or 0
+
+        # Overdue cards share one row; only future reviews get a day
+        overdue = FlashcardDB.next_review < start
+        day = case((overdue, None), else_=func.date(FlashcardDB.next_review))
+
+        by_day = {}
+        overdue_count = 0
+        scheduled = cards(overdue, day, func.count(FlashcardDB.id)).filter(FlashcardDB.next_review < end)
+        for is_overdue, d, count in scheduled.group_by(overdue, day).all():
+            if is_overdue:
+                overdue_count += count
+            else:
+                by_day[_as_date(d)] = count
+
+        forecast = [
+            {"date": today + timedelta(days=i), "reviews": by_day.get(today + timedelta(days=i), 0)}
+            for i in range(days)
+        ]
+
+        return {
+            "days": days,
+            "overdue": overdue_count,
+            "new_cards": new_count,
+            "total_reviews": overdue_count + sum(entry["reviews"] for entry in forecast),
+            "forecast": forecast
+        }
+
+    @staticmethod
+    def completed_session_days(db: Session, user_id: int) -> List[Tuple[Optional[date], int, float]]:
+        """(completion date, sessions, minutes) per day, oldest first (one query)"""
+        day = func.date(StudySessionDB.completed_at)
+        rows = db.query(
+            day,
+            func.count(StudySessionDB.id),
+            func.coalesce(func.sum(StudySessionDB.duration_minutes), 0.0)
+        ).filter(
+            StudySessionDB.user_id == user_id,
+            StudySessionDB.status == "completed"
+        ).group_by(day).order_by(day).all()
+
+        return [(_as_date(d), count, float(minutes)) for d, count, minutes in rows]
+
+    @staticmethod
+    def calculate_streaks(
+        session_days: List[Tuple[Optional[date], int, float]],
+        today: Optional[date] = None
+    ) -> Tuple[int, int]:
+        """
+        Compute (longest_streak, current_streak) from per-day session counts.
+
+        The longest streak counts sessions over a run of consecutive days;
+        the current streak counts consecutive days ending today.
+        """
+        today = today or datetime.utcnow().date()
+        days = [(d, count) for d, count, _ in session_days if d is not None]
+
+        longest = 0
+        run = 0
+        last_date = None
+        for session_date, count in days:
+            if last_date is None or (session_date - last_date).days == 1:
+                run += count
+            else:
+                longest = max(longest, run)
+                run = count
+            last_date = session_date
+        longest = max(longest, run)
+
+        current = 0
+        check_date = today
+        for session_date, _ in reversed(days):
+            if session_date == check_date:
+                current += 1
+                check_date -= timedelta(days=1)
+            elif session_date < check_date:
+                break
+
+        return longest, current
+
+    @staticmethod
+    def study_minutes_by_day(
+        db: Session,
+        user_id: int,
+        since: Optional[datetime] = None
+    ) -> Dict[date, float]:
+        """Minutes of sessions started per day, optionally since a cutoff (one query)"""
+        day = func.date(StudySessionDB.created_at)
+        query = db.query(
+            day,
+            func.coalesce(func.sum(StudySessionDB.duration_minutes), 0.0)
+        ).filter(StudySessionDB.user_id == user_id)
+
+        if since is not None:
+            query = query.filter(StudySessionDB.created_at >= since)
+
+        return {_as_date(d): float(minutes) for d, minutes in query.group_by(day).all()}
+
+    @staticmethod
+    def daily_study_minutes(
+        db: Session,
+        user_id: int,
+        days: int = DAILY_WINDOW_DAYS,
+        today: Optional[date] = None
+    ) -> Dict[str, float]:
+        """Study minutes per day for the last `days` days, newest first (one query)"""
+        today = today or datetime.utcnow().date()
+        window_start = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+
+        minutes_by_day = AnalyticsEngine.study_minutes_by_day(db, user_id, since=window_start)
+
+        daily = {}
+        for i in range(days):
+            d = today - timedelta(days=i)
+            daily[str(d)] = minutes_by_day.get(d, 0.0)
+
+        return daily
+
+    @staticmethod
+    def attempts_by_topic(db: Session, user_id: int) -> List[Tuple[Optional[str], int, int]]:
+        """
+        (topic, attempts, correct) per topic (one query).
+
+        Attempts on deleted cards are grouped under a None topic.
+        """
+        correct = case((QuizAttemptDB.is_correct, 1), else_=0)
+        rows = db.query(
+            FlashcardDB.topic,
+            func.count(QuizAttemptDB.id),
+            func.sum(correct)
+        ).select_from(QuizAttemptDB).join(
+            StudySessionDB, QuizAttemptDB.study_session_id == StudySessionDB.id
+        ).outerjoin(
+            FlashcardDB, QuizAttemptDB.flashcard_id == FlashcardDB.id
+        ).filter(
+            StudySessionDB.user_id == user_id
+        ).group_by(FlashcardDB.topic).all()
+
+        return [(topic, attempts, c or 0) for topic, attempts, c in rows]
+
+    @staticmethod
+    def attempts_by_day(db: Session, user_id: int) -> List[Tuple[Optional[date], int, int]]:
+        """(date, attempts, correct) per day (one query)"""
+        day = func.date(QuizAttemptDB.created_at)
+        correct = case((QuizAttemptDB.is_correct, 1), else_=0)
+        rows = db.query(
+            day,
+            func.count(QuizAttemptDB.id),
+            func.sum(correct)
+        ).join(
+            StudySessionDB, QuizAttemptDB.study_session_id == StudySessionDB.id
+        ).filter(
+            StudySessionDB.user_id == user_id
+        ).group_by(day).all()
+
+        return [(_as_date(d), attempts, c or 0) for d, attempts, c in rows]
+
+    @staticmethod
+    def new_cards_by_day(db: Session, user_id: int) -> List[Tuple[Optional[date], int]]:
+        """(date, cards first reviewed that day) per day, deleted cards included (one query)"""
+        first_reviews = db.query(
+            func.min(QuizAttemptDB.created_at).label("first_review")
+        ).join(
+            StudySessionDB, QuizAttemptDB.study_session_id == StudySessionDB.id
+        ).filter(
+            StudySessionDB.user_id == user_id
+        ).group_by(QuizAttemptDB.flashcard_id).subquery()
+
+        day = func.date(first_reviews.c.first_review)
+        rows = db.query(day, func.count()).select_from(first_reviews).group_by(day).all()
+
+        return [(_as_date(d), count) for d, count in rows]
+
+    @staticmethod
+    def accuracy_stats(db: Session, user_id: int) -> Dict:
+        """Overall accuracy and accuracy per topic (one query)"""
+        rows = AnalyticsEngine.attempts_by_topic(db, user_id)
+
+        total_attempts = sum(attempts for _, attempts, _ in rows)
+        total_correct = sum(c for _, _, c in rows)
+
+        return {
+            "average_accuracy": total_correct / total_attempts if total_attempts else 0.0,
+            "accuracy_by_topic": {
+                topic: c / attempts
+                for topic, attempts, c in rows
+                if topic and attempts
+            }
+        }
+
+    @staticmethod
+    def cards_by_difficulty(db: Session, user_id: int) -> Dict[str, int]:
+        """Card count per difficulty level (one query)"""
+        rows = db.query(
+            FlashcardDB.difficulty,
+            func.count(FlashcardDB.id)
+        ).filter(
+            FlashcardDB.user_id == user_id
+        ).group_by(FlashcardDB.difficulty).all()
+
+        counts = dict(rows)
+        return {difficulty: counts.get(difficulty, 0) for difficulty in ["easy", "medium", "hard"]}
+
+    @staticmethod
+    def dashboard(db: Session, user_id: int) -> Dict:
+        """All dashboard statistics from a fixed set of aggregate queries"""
+        session_days = AnalyticsEngine.completed_session_days(db, user_id)
+        longest_streak, current_streak = AnalyticsEngine.calculate_streaks(session_days)
+
+        stats = {
+            "total_sessions": sum(count for _, count, _ in session_days),
+            "total_study_minutes": sum(minutes for _, _, minutes in session_days),
+            "longest_streak": longest_streak,
+            "current_streak": current_streak,
+            "daily_study_minutes": AnalyticsEngine.daily_study_minutes(db, user_id)
+        }
+        stats.update(AnalyticsEngine.card_stats(db, user_id))
+        stats.update(AnalyticsEngine.accuracy_stats(db, user_id))
+
+        return stats
+
+
+def _topic_key(topic: Optional[str]) -> str:
+    """Topic rollup rows are keyed by topic; untitled cards share the empty key"""
+    return topic or ""
+
+
+class AnalyticsRollup:
+    """
+    Incrementally maintained analytics rollup.
+
+    Route handlers call the record_* hooks before committing, so the rollup
+    is updated in the same transaction as the change it reflects. Counters
+    are bumped with `col = col + delta` so concurrent requests never lose
+    updates. History from before the rollup existed is folded in once, by
+    the schema upgrade that creates its tables.
+    """
+
+    @staticmethod
+    def _create_row(db: Session, model, key: Dict) -> None:
+        """Insert an all-zero rollup row unless one exists (racing creators do not conflict)"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(model).values(**key).on_conflict_do_nothing())
+
+    @staticmethod
+    def _increment(db: Session, model, key: Dict, **deltas) -> None:
+        """Add deltas to a rollup row, creating it first if needed"""
+        if db.get(model, key) is None:
+            AnalyticsRollup._create_row(db, model, key)
+
+        values = {
+            getattr(model, column): getattr(model, column) + delta
+            for column, delta in deltas.items()
+        }
+        db.query(model).filter_by(**key).update(values, synchronize_session=False)
+
+    @staticmethod
+    def _card_attempts(db: Session, flashcard_id: int) -> Tuple[int, int]:
+        """(attempts, correct) recorded against a single card"""
+        attempts, correct = db.query(
+            func.count(QuizAttemptDB.id),
+            func.sum(case((QuizAttemptDB.is_correct, 1), else_=0))
+        ).filter(QuizAttemptDB.flashcard_id == flashcard_id).one()
+        return attempts, correct or 0
+
+    @staticmethod
+    def record_cards_created(db: Session, user_id: int, topic: Optional[str], count: int = 1) -> None:
+        """Account for newly created cards"""
+        if count <= 0:
+            return
+        AnalyticsRollup._increment(db, UserAnalyticsDB, {"user_id": user_id}, total_cards=count)
+        AnalyticsRollup._increment(
+            db, UserTopicAnalyticsDB,
+            {"user_id": user_id, "topic": _topic_key(topic)},
+            cards=count
+        )
+
+    @staticmethod
+    def record_card_deleted(db: Session, flashcard: FlashcardDB) -> None:
+        """Account for a deleted card and drop its attempts from its topic"""
+        attempts, correct = AnalyticsRollup._card_attempts(db, flashcard.id)
+
+        AnalyticsRollup._increment(db, UserAnalyticsDB, {"user_id": flashcard.user_id}, total_cards=-1)
+        AnalyticsRollup._increment(
+            db, UserTopicAnalyticsDB,
+            {"user_id": flashcard.user_id, "topic": _topic_key(flashcard.topic)},
+            cards=-1, attempts=-attempts, correct_attempts=-correct
+        )
+
+    @staticmethod
+    def record_card_topic_changed(db: Session, flashcard: FlashcardDB, old_topic: Optional[str]) -> None:
+        """Move a card (and its attempts) from one topic rollup to another"""
+        if _topic_key(old_topic) == _topic_key(flashcard.topic):
+            return
+
+        attempts, correct = AnalyticsRollup._card_attempts(db, flashcard.id)
+
+        AnalyticsRollup._increment(
+            db, UserTopicAnalyticsDB,
+            {"user_id": flashcard.user_id, "topic": _topic_key(old_topic)},
+            cards=-1, attempts=-attempts, correct_attempts=-correct
+        )
+        AnalyticsRollup._increment(
+            db, UserTopicAnalyticsDB,
+            {"user_id": flashcard.user_id, "topic": _topic_key(flashcard.topic)},
+            cards=1, attempts=attempts, correct_attempts=correct
+        )
+
+    @staticmethod
+    def record_attempt(
+        db: Session,
+        user_id: int,
+        topic: Optional[str],
+        is_correct: bool,
+        answered_at: Optional[datetime] = None
+    ) -> None:
+        """Account for a quiz attempt"""
+        AnalyticsRollup.record_attempts(db, user_id, [(topic, is_correct, answered_at)])
+
+    @staticmethod
+    def record_attempts(
+        db: Session,
+        user_id: int,
+        attempts: Iterable[Tuple[Optional[str], bool, Optional[datetime]]]
+    ) -> None:
+        """Account for (topic, is_correct, answered_at) attempts with one update per rollup row"""
+        now = datetime.utcnow()
+        totals: Counter = Counter()
+        daily: Dict = defaultdict(Counter)
+        topics: Dict = defaultdict(Counter)
+
+        for topic, is_correct, answered_at in attempts:
+            counts = {"attempts": 1, "correct_attempts": 1 if is_correct else 0}
+            totals.update(counts)
+            daily[(answered_at or now).date()].update(counts)
+            topics[_topic_key(topic)].update(counts)
+
+        if not totals:
+            return
+
+        AnalyticsRollup._increment(
+            db, UserAnalyticsDB, {"user_id": user_id},
+            total_attempts=totals["attempts"], correct_attempts=totals["correct_attempts"]
+        )
+        for day, counts in daily.items():
+            AnalyticsRollup._increment(
+                db, UserDailyAnalyticsDB, {"user_id": user_id, "date": day},
+                attempts=counts["attempts"], correct_attempts=counts["correct_attempts"]
+            )
+        for topic, counts in topics.items():
+            AnalyticsRollup._increment(
+                db, UserTopicAnalyticsDB, {"user_id": user_id, "topic": topic},
+                attempts=counts["attempts"], correct_attempts=counts["correct_attempts"]
+            )
+
+    @staticmethod
+    def record_new_cards_studied(db: Session, user_id: int, first_reviews: Iterable[Optional[datetime]]) -> None:
+        """Account for cards reviewed for the first time (at the given times); feeds the new-card quota"""
+        now = datetime.utcnow()
+        daily = Counter((reviewed_at or now).date() for reviewed_at in first_reviews)
+
+        for day, count in daily.items():
+            AnalyticsRollup._increment(
+                db, UserDailyAnalyticsDB, {"user_id": user_id, "date": day},
+                new_cards=count
+            )
+
+    @staticmethod
+    def record_session_completed(db: Session, session: StudySessionDB) -> None:
+        """Account for a session that has just been completed"""
+        minutes = session.duration_minutes or 0.0
+        completed_on = (session.completed_at or datetime.utcnow()).date()
+        started_on = (session.created_at or session.completed_at or datetime.utcnow()).date()
+
+        AnalyticsRollup._increment(
+            db, UserAnalyticsDB, {"user_id": session.user_id},
+            total_sessions=1, total_study_minutes=minutes
+        )
+        AnalyticsRollup._increment(
+            db, UserDailyAnalyticsDB, {"user_id": session.user_id, "date": completed_on},
+            sessions=1
+        )
+        AnalyticsRollup._increment(
+            db, UserDailyAnalyticsDB, {"user_id": session.user_id, "date": started_on},
+            study_minutes=minutes
+        )
+
+        # Streak state needs read-modify-write, so load the row fresh
+        row = db.get(UserAnalyticsDB, session.user_id, populate_existing=True)
+        last = row.last_study_date
+
+        if last is not None and completed_on <= last:
+            row.streak_sessions += 1
+        elif last is not None and (completed_on - last).days == 1:
+            row.streak_days += 1
+            row.streak_sessions += 1
+            row.last_study_date = completed_on
+        else:
+            row.streak_days = 1
+            row.streak_sessions = 1
+            row.last_study_date = completed_on
+
+        row.longest_streak = max(row.longest_streak, row.streak_sessions)
+
+    @staticmethod
+    def rebuild_user(db: Session, user_id: int) -> None:
+        """Recompute a user's rollup rows from full history (does not commit)"""
+        for model in (UserAnalyticsDB, UserDailyAnalyticsDB, UserTopicAnalyticsDB):
+            db.query(model).filter(model.user_id == user_id).delete(synchronize_session=False)
+
+        session_days = AnalyticsEngine.completed_session_days(db, user_id)
+        longest_streak, _ = AnalyticsEngine.calculate_streaks(session_days)
+
+        streak_days = 0
+        streak_sessions = 0
+        last_study_date = None
+        for session_date, count, _ in session_days:
+            if session_date is None:
+                continue
+            if last_study_date is not None and (session_date - last_study_date).days == 1:
+                streak_days += 1
+                streak_sessions += count
+            else:
+                streak_days = 1
+                streak_sessions = count
+            last_study_date = session_date
+
+        card_rows = AnalyticsEngine.cards_by_topic(db, user_id)
+        attempt_rows = AnalyticsEngine.attempts_by_topic(db, user_id)
+
+        db.add(UserAnalyticsDB(
+            user_id=user_id,
+            total_cards=sum(count for _, count, _ in card_rows),
+            total_sessions=sum(count for _, count, _ in session_days),
+            total_study_minutes=sum(minutes for _, _, minutes in session_days),
+            total_attempts=sum(attempts for _, attempts, _ in attempt_rows),
+            correct_attempts=sum(correct for _, _, correct in attempt_rows),
+            longest_streak=longest_streak,
+            streak_days=streak_days,
+            streak_sessions=streak_sessions,
+            last_study_date=last_study_date,
+            last_updated=datetime.utcnow()
+        ))
+
+        topics: Dict[str, Dict[str, int]] = {}
+        for topic, count, _ in card_rows:
+            topics.setdefault(_topic_key(topic), {})["cards"] = count
+        for topic, attempts, correct in attempt_rows:
+            if topic is None:
+                continue  # Attempts on deleted cards only count towards the totals
+            row = topics.setdefault(_topic_key(topic), {})
+            row["attempts"] = row.get("attempts", 0) + attempts
+            row["correct_attempts"] = row.get("correct_attempts", 0) + correct
+        for topic, values in topics.items():
+            db.add(UserTopicAnalyticsDB(user_id=user_id, topic=topic, **values))
+
+        days: Dict[date, Dict[str, float]] = {}
+        for session_date, count, _ in session_days:
+            if session_date is not None:
+                days.setdefault(session_date, {})["sessions"] = count
+        for study_date, minutes in AnalyticsEngine.study_minutes_by_day(db, user_id).items():
+            if study_date is not None:
+                days.setdefault(study_date, {})["study_minutes"] = minutes
+        for attempt_date, attempts, correct in AnalyticsEngine.attempts_by_day(db, user_id):
+            if attempt_date is not None:
+                days.setdefault(attempt_date, {}).update(attempts=attempts, correct_attempts=correct)
+        for review_date, count in AnalyticsEngine.new_cards_by_day(db, user_id):
+            if review_date is not None:
+                days.setdefault(review_date, {})["new_cards"] = count
+        for day, values in days.items():
+            db.add(UserDailyAnalyticsDB(user_id=user_id, date=day, **values))
+
+        db.flush()
+
+    @staticmethod
+    def rebuild_all(db: Session) -> int:
+        """Rebuild the rollup for every user, committing per user; returns users rebuilt"""
+        user_ids = [user_id for (user_id,) in db.query(UserDB.id).order_by(UserDB.id).all()]
+        for user_id in user_ids:
+            AnalyticsRollup.rebuild_user(db, user_id)
+            db.commit()
+        return len(user_ids)
+
+    @staticmethod
+    def dashboard(db: Session, user_id: int, today: Optional[date] = None) -> Dict:
+        """Dashboard statistics from the rollup (primary-key reads plus an indexed due count)"""
+        today = today or datetime.utcnow().date()
+
+        summary = db.get(UserAnalyticsDB, user_id)
+        if summary is None:
+            # Lazily backfill users whose history predates the rollup
+            AnalyticsRollup.rebuild_user(db, user_id)
+            db.commit()
+            summary = db.get(UserAnalyticsDB, user_id)
+
+        window = AnalyticsEngine.DAILY_WINDOW_DAYS
+        day_rows = db.query(UserDailyAnalyticsDB).filter(
+            UserDailyAnalyticsDB.user_id == user_id,
+            UserDailyAnalyticsDB.date > today - timedelta(days=window)
+        ).all()
+        minutes_by_day = {row.date: row.study_minutes or 0.0 for row in day_rows}
+
+        topic_rows = db.query(UserTopicAnalyticsDB).filter(
+            UserTopicAnalyticsDB.user_id == user_id
+        ).order_by(UserTopicAnalyticsDB.topic).all()
+
+        return {
+            "total_cards": summary.total_cards,
+            "total_sessions": summary.total_sessions,
+            "total_study_minutes": summary.total_study_minutes,
+            "average_accuracy": (
+                summary.correct_attempts / summary.total_attempts
+                if summary.total_attempts else 0.0
+            ),
+            "longest_streak": summary.longest_streak,
+            "current_streak": summary.streak_days if summary.last_study_date == today else 0,
+            "cards_due_for_review": AnalyticsEngine.cards_due(db, user_id),
+            "topics": [row.topic for row in topic_rows if row.topic and row.cards > 0],
+            "daily_study_minutes": {
+                str(today - timedelta(days=i)): minutes_by_day.get(today - timedelta(days=i), 0.0)
+                for i in range(window)
+            },
+            "accuracy_by_topic": {
+                row.topic: row.correct_attempts / row.attempts
+                for row in topic_rows
+                if row.topic and row.attempts > 0
+            }
+        }
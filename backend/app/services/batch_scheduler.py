@@ -0,0 +1,332 @@
+"""
+Vectorized SM-2 scheduling.
+
+Applies the same rules as SpacedRepetitionScheduler to whole columns of
+cards at once: schedule state lives in parallel NumPy arrays and dates in
+datetime64 arrays, so scheduling a million answers costs a handful of
+array operations instead of a million Python datetime objects. Answers to
+the same card still have to be applied in order, so a batch is processed
+in rounds: round k applies every card's k-th answer together.
+
+Used to ingest answer batches, to replay uploaded review history, and to
+recompute every card's schedule from its attempts after an algorithm
+change (`python -m app.cli recompute-schedules`).
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+from sqlalchemy import String, select, type_coerce, update
+from sqlalchemy.orm import Session
+from app.db import FlashcardDB, QuizAttemptDB
+from app.services.spaced_repetition import SpacedRepetitionScheduler
+
+logger = logging.getLogger(__name__)
+
+DATETIME = "datetime64[us]"
+
+
+@dataclass
+class ScheduleState:
+    """SM-2 state of a set of cards as parallel column arrays"""
+    review_count: np.ndarray
+    easiness: np.ndarray
+    interval: np.ndarray
+    difficulty_score: np.ndarray
+    next_review: np.ndarray  # NaT until first reviewed
+    last_reviewed: np.ndarray
+
+    @classmethod
+    def new(cls, size: int) -> "ScheduleState":
+        """State of `size` never-reviewed cards"""
+        return cls(
+            review_count=np.zeros(size, dtype=np.int64),
+            easiness=np.full(size, SpacedRepetitionScheduler.MAX_EASINESS),
+            interval=np.zeros(size, dtype=np.int64),
+            difficulty_score=np.full(size, 0.5),
+            next_review=np.full(size, np.datetime64("NaT"), dtype=DATETIME),
+            last_reviewed=np.full(size, np.datetime64("NaT"), dtype=DATETIME)
+        )
+
+    @classmethod
+    def from_cards(cls, cards: Sequence) -> "ScheduleState":
+        """Current state of flashcard objects (or rows with the same attributes)"""
+        return cls(
+            review_count=np.array([card.review_count or 0 for card in cards], dtype=np.int64),
+            easiness=np.array([card.easiness for card in cards], dtype=np.float64),
+            interval=np.array([card.interval or 0 for card in cards], dtype=np.int64),
+            difficulty_score=np.array([card.difficulty_score for card in cards], dtype=np.float64),
+            next_review=np.array([card.next_review for card in cards], dtype=DATETIME),
+            last_reviewed=np.array([card.last_reviewed for card in cards], dtype=DATETIME)
+        )
+
+    def __len__(self) -> int:
+        return len(self.review_count)
+
+    def columns(self) -> Dict[str, list]:
+        """Plain Python columns (ints, floats, datetimes or None)"""
+        return {field.name: getattr(self, field.name).tolist() for field in fields(self)}
+
+    def records(self) -> List[Dict]:
+        """One dict per card"""
+        columns = self.columns()
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    def write_to(self, cards: Sequence) -> None:
+        """Copy the state back onto the flashcard objects it was read from"""
+        for card, record in zip(cards, self.records()):
+            for name, value in record.items():
+                setattr(card, name, value)
+
+
+class BatchScheduler:
+    """SM-2 over arrays; mirrors SpacedRepetitionScheduler exactly"""
+
+    @staticmethod
+    def calculate_next_review(
+        quality: np.ndarray,
+        review_count: np.ndarray,
+        easiness_factor: np.ndarray,
+        interval: np.ndarray,
+        now: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorized SpacedRepetitionScheduler.calculate_next_review"""
+        new_easiness = np.clip(
+            easiness_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)),
+            SpacedRepetitionScheduler.MIN_EASINESS,
+            SpacedRepetitionScheduler.MAX_EASINESS
+        )
+
+        forgotten = quality < 3
+        new_easiness = np.where(forgotten, SpacedRepetitionScheduler.MIN_EASINESS, new_easiness)
+
+        new_interval = np.select(
+            [forgotten, review_count == 0, review_count == 1],
+            [1, SpacedRepetitionScheduler.INITIAL_INTERVAL, SpacedRepetitionScheduler.SECOND_INTERVAL],
+            default=np.maximum(1, np.floor(interval * new_easiness)).astype(np.int64)
+        )
+
+        randomized_interval = np.floor(new_interval * (0.9 + 0.2 * (quality / 5))).astype(np.int64)
+        next_review = now + randomized_interval.astype("timedelta64[D]")
+
+        return next_review, new_easiness, randomized_interval
+
+    @staticmethod
+    def update_difficulty_score(
+        current_score: np.ndarray,
+        is_correct: np.ndarray,
+        response_time_seconds: np.ndarray,
+        average_response_time: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized SpacedRepetitionScheduler.update_difficulty_score"""
+        base_adjustment = np.where(is_correct, 0.1, -0.15)
+
+        # A missing or zero average leaves the time adjustment at zero
+        time_ratio = np.divide(
+            response_time_seconds, average_response_time,
+            out=np.ones(len(current_score)), where=average_response_time > 0
+        )
+        time_adjustment = np.clip((1 - time_ratio) * 0.05, -0.1, 0.1)
+
+        return np.clip(current_score + base_adjustment + time_adjustment, 0.0, 1.0)
+
+    @staticmethod
+    def review(
+        state: ScheduleState,
+        index: np.ndarray,
+        is_correct: np.ndarray,
+        response_time_seconds: np.ndarray,
+        reviewed_at: np.ndarray
+    ) -> None:
+        """
+        Apply one answer to each card at `index` (no repeats), in place.
+
+        The vectorized SpacedRepetitionScheduler.apply_review.
+        """
+        quality = np.where(is_correct, 5, 1)
+
+        next_review, easiness, interval = BatchScheduler.calculate_next_review(
+            quality,
+            state.review_count[index],
+            state.easiness[index],
+            state.interval[index],
+            reviewed_at
+        )
+
+        state.last_reviewed[index] = reviewed_at
+        state.review_count[index] += 1
+        state.next_review[index] = next_review
+        state.easiness[index] = easiness
+        state.interval[index] = interval
+
+        # As in apply_review, a card's own response time is its average
+        state.difficulty_score[index] = BatchScheduler.update_difficulty_score(
+            state.difficulty_score[index],
+            is_correct,
+            response_time_seconds,
+            response_time_seconds
+        )
+
+    @staticmethod
+    def apply(
+        state: ScheduleState,
+        card_index: np.ndarray,
+        is_correct: np.ndarray,
+        response_time_seconds: np.ndarray,
+        reviewed_at: np.ndarray
+    ) -> ScheduleState:
+        """
+        Apply a log of answers to `state` in place.
+
+        Answer i is for card `card_index[i]`. Each card's answers are applied
+        oldest first (ties keep their order in the log). Returns the state
+        of the answered card right after each answer, in log order.
+        """
+        card_index = np.asarray(card_index, dtype=np.int64)
+        is_correct = np.asarray(is_correct, dtype=bool)
+        response_time_seconds = np.asarray(response_time_seconds, dtype=np.float64)
+        reviewed_at = np.asarray(reviewed_at, dtype=DATETIME)
+
+        count = len(card_index)
+        after = ScheduleState.new(count)
+        if not count:
+            return after
+
+        positions = np.arange(count)
+        order = np.lexsort((positions, reviewed_at, card_index))
+
+        # Rank of each answer among its card's answers: round k applies the
+        # k-th answer of every card at once
+        sorted_cards = card_index[order]
+        first = np.r_[True, sorted_cards[1:] != sorted_cards[:-1]]
+        rank = positions - np.maximum.accumulate(np.where(first, positions, 0))
+
+        by_round = order[np.argsort(rank, kind="stable")]
+        bounds = np.r_[0, np.cumsum(np.bincount(rank))]
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            answers = by_round[start:end]
+            cards = card_index[answers]
+            BatchScheduler.review(
+                state, cards, is_correct[answers], response_time_seconds[answers], reviewed_at[answers]
+            )
+            for field in fields(state):
+                getattr(after, field.name)[answers] = getattr(state, field.name)[cards]
+
+        return after
+
+
+class ScheduleReplay:
+    """Rebuild card schedules from their stored quiz attempts"""
+
+    @staticmethod
+    def replay(db: Session, card_ids: Sequence[int]) -> ScheduleState:
+        """
+        State of each card in `card_ids` after replaying all of its attempts
+        from scratch (cards without attempts come back as new).
+        """
+        card_ids = np.asarray(card_ids, dtype=np.int64)
+        state = ScheduleState.new(len(card_ids))
+        if not len(card_ids):
+            return state
+
+        rows = db.execute(
+            select(
+                QuizAttemptDB.flashcard_id,
+                QuizAttemptDB.is_correct,
+                QuizAttemptDB.response_time_seconds,
+                # The raw column value: NumPy parses the timestamps itself
+                # instead of one Python datetime per attempt
+                type_coerce(QuizAttemptDB.created_at, String)
+            ).where(
+                QuizAttemptDB.flashcard_id.in_(card_ids.tolist())
+            ).order_by(QuizAttemptDB.created_at, QuizAttemptDB.id)
+        ).all()
+
+        ScheduleReplay._apply_rows(state, card_ids, rows)
+        return state
+
+    @staticmethod
+    def _apply_rows(state: ScheduleState, card_ids: np.ndarray, rows: Sequence) -> np.ndarray:
+        """
+        Apply attempt rows (flashcard_id, is_correct, response time, answered
+        at); returns answered positions. Rows for cards not in `card_ids`
+        are ignored.
+        """
+        if not rows or not len(card_ids):
+            return np.zeros(0, dtype=np.int64)
+
+        flashcard_ids, is_correct, response_times, answered_at = zip(*rows)
+        flashcard_ids = np.array(flashcard_ids, dtype=np.int64)
+
+        sorter = np.argsort(card_ids)
+        slots = np.minimum(np.searchsorted(card_ids, flashcard_ids, sorter=sorter), len(card_ids) - 1)
+        index = sorter[slots]
+        # searchsorted gives the nearest position even for absent ids
+        known = card_ids[index] == flashcard_ids
+
+        BatchScheduler.apply(
+            state,
+            index[known],
+            np.array(is_correct, dtype=bool)[known],
+            np.array(response_times, dtype=np.float64)[known],
+            np.array(answered_at, dtype=DATETIME)[known]
+        )
+        return np.unique(index[known])
+
+    @staticmethod
+    def recompute_all(db: Session, user_id: Optional[int] = None, chunk_size: int = 50000) -> int:
+        """
+        Recompute the schedule of every card with attempts (optionally one
+        user's), committing per chunk of cards. Returns the number of
+        cards updated.
+        """
+        updated = 0
+        after_id = 0
+
+        while True:
+            query = select(FlashcardDB.id).where(FlashcardDB.id > after_id)
+            if user_id is not None:
+                query = query.where(FlashcardDB.user_id == user_id)
+            card_ids = np.array(
+                db.scalars(query.order_by(FlashcardDB.id).limit(chunk_size)).all(), dtype=np.int64
+            )
+            if not len(card_ids):
+                return updated
+
+            # Attempts by id range rather than a huge IN list
+            attempts = select(
+                QuizAttemptDB.flashcard_id,
+                QuizAttemptDB.is_correct,
+                QuizAttemptDB.response_time_seconds,
+                type_coerce(QuizAttemptDB.created_at, String)
+            ).where(
+                QuizAttemptDB.flashcard_id.between(int(card_ids[0]), int(card_ids[-1]))
+            )
+            if user_id is not None:
+                attempts = attempts.join(FlashcardDB, FlashcardDB.id == QuizAttemptDB.flashcard_id).where(
+                    FlashcardDB.user_id == user_id
+                )
+            rows = db.execute(attempts.order_by(QuizAttemptDB.created_at, QuizAttemptDB.id)).all()
+
+            state = ScheduleState.new(len(card_ids))
+            answered = ScheduleReplay._apply_rows(state, card_ids, rows)
+
+            if len(answered):
+                columns = state.columns()
+                now = datetime.utcnow()
+                db.execute(update(FlashcardDB), [
+                    {
+                        "id": card_id,
+                        "updated_at": now,
+                        **{name: values[position] for name, values in columns.items()}
+                    }
+                    for card_id, position in zip(card_ids[answered].tolist(), answered.tolist())
+                ])
+                db.commit()
+                updated += len(answered)
+
+            logger.info(f"Recomputed schedules up to card {int(card_ids[-1])} ({updated} updated)")
+            after_id = int(card_ids[-1])
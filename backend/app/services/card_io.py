@@ -0,0 +1,385 @@
+"""
+Bulk flashcard import and export.
+
+Imports read the upload as a text stream and work through it in batches of
+IMPORT_BATCH_SIZE rows: one duplicate lookup, one embedding call, one
+multi-row INSERT and one commit per batch, so neither the file nor the deck
+is ever held in memory and a 20k-card deck costs a few dozen round trips.
+Exports walk the deck with a server-side cursor (yield_per) and hand the
+rows to the response in chunks as they are read.
+
+Supported formats:
+
+- ``csv``: header row required; ``question`` and ``answer`` columns, with
+  optional ``topic`` and ``difficulty`` (extra columns are ignored)
+- ``jsonl``: one JSON object per line with the same keys
+- ``tsv``: Anki plain-text notes, ``question<TAB>answer[<TAB>tags]``; ``#``
+  header lines are skipped, a tag naming a difficulty sets it and the first
+  other tag becomes the topic (underscores read as spaces)
+"""
+
+import csv
+import io
+import json
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import SessionLocal, FlashcardDB, FlashcardLSHBucketDB
+from app.models.flashcard import DifficultyLevel
+from app.services.analytics import AnalyticsRollup
+from app.services.dedup import DuplicateIndex, resolve_mode
+from app.services.embedding_codec import encode_embedding
+from app.services.embeddings import card_text, get_embedding_provider
+from app.services.vector_index import vector_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl", "tsv")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "tsv": "text/tab-separated-values"
+}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".tsv": "tsv", ".txt": "tsv"}
+
+EXPORT_FIELDS = ("id", "question", "answer", "topic", "difficulty", "created_at")
+DIFFICULTIES = {level.value for level in DifficultyLevel}
+
+MAX_REPORTED_ERRORS = 20
+
+# (line number, parsed fields or None, error message or None)
+ImportRow = Tuple[int, Optional[Dict], Optional[str]]
+
+
+class ImportFormatError(ValueError):
+    """The upload as a whole cannot be read in the requested format"""
+
+
+def resolve_format(file_format: Optional[str], filename: Optional[str] = None) -> str:
+    """Explicit format, or the one implied by the file extension"""
+    if file_format:
+        if file_format not in FORMATS:
+            raise ImportFormatError(f"Unknown format: {file_format} (choose from {', '.join(FORMATS)})")
+        return file_format
+
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in EXTENSIONS:
+        raise ImportFormatError("Cannot tell the format from the file name; pass format=csv|jsonl|tsv")
+    return EXTENSIONS[extension]
+
+
+def _read_csv(stream: TextIO) -> Iterator[ImportRow]:
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise ImportFormatError("CSV file is empty")
+
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = {"question", "answer"} - set(reader.fieldnames)
+    if missing:
+        raise ImportFormatError(f"CSV header is missing: {', '.join(sorted(missing))}")
+
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def _read_jsonl(stream: TextIO) -> Iterator[ImportRow]:
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Expected a JSON object"
+            continue
+        yield line_no, row, None
+
+
+def _read_anki_tsv(stream: TextIO) -> Iterator[ImportRow]:
+    reader = csv.reader(stream, delimiter="\t")
+    in_header = True
+
+    for row in reader:
+        if in_header and row and row[0].startswith("#"):
+            continue
+        in_header = False
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) < 2:
+            yield reader.line_num, None, "Expected question<TAB>answer[<TAB>tags]"
+            continue
+
+        fields = {"question": row[0], "answer": row[1]}
+        tags = row[2].split() if len(row) > 2 else []
+        for tag in tags:
+            if tag.lower() in DIFFICULTIES:
+                fields.setdefault("difficulty", tag.lower())
+            else:
+                fields.setdefault("topic", tag.replace("_", " "))
+        yield reader.line_num, fields, None
+
+
+READERS: Dict[str, Callable[[TextIO], Iterator[ImportRow]]] = {
+    "csv": _read_csv,
+    "jsonl": _read_jsonl,
+    "tsv": _read_anki_tsv,
+}
+
+
+def read_rows(stream: TextIO, file_format: str) -> Iterator[ImportRow]:
+    """Parse an import stream lazily, one row at a time"""
+    return READERS[file_format](stream)
+
+
+def _card_from_fields(fields: Dict, default_topic: str, default_difficulty: str) -> Dict[str, str]:
+    """Validated card fields from one parsed row (ValueError if unusable)"""
+    question = str(fields.get("question") or "").strip()
+    answer = str(fields.get("answer") or "").strip()
+    if not question or not answer:
+        raise ValueError("Question and answer are required")
+
+    topic = str(fields.get("topic") or "").strip() or default_topic
+    difficulty = str(fields.get("difficulty") or "").strip().lower() or default_difficulty
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"Unknown difficulty: {difficulty}")
+
+    return {"question": question, "answer": answer, "topic": topic, "difficulty": difficulty}
+
+
+@dataclass
+class ImportResult:
+    """Outcome of a bulk import"""
+    imported: int = 0
+    flagged: int = 0  # Imported, but marked as near-duplicates
+    merged: int = 0  # Dropped in favour of an existing card
+    skipped: int = 0  # Dropped duplicates (skip mode, or repeats within the file)
+    failed: int = 0  # Rows that could not be parsed or validated
+    errors: List[Dict] = field(default_factory=list)  # First MAX_REPORTED_ERRORS failures
+    truncated: bool = False  # Stopped early (row limit or unreadable input)
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+
+class CardImporter:
+    """Streams parsed rows into the database in batches"""
+
+    def __init__(
+        self,
+        batch_size: int = settings.IMPORT_BATCH_SIZE,
+        max_rows: int = settings.IMPORT_MAX_ROWS
+    ):
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+
+    def run(
+        self,
+        db: Session,
+        user_id: int,
+        rows: Iterable[ImportRow],
+        topic: str = "Imported",
+        difficulty: str = "medium",
+        on_duplicate: Optional[str] = None
+    ) -> ImportResult:
+        """
+        Import parsed rows for a user, committing after every batch.
+
+        Bad rows are counted and reported without stopping the import;
+        input that becomes unreadable part-way (or passing `max_rows`) stops
+        it, keeping the batches already committed.
+        """
+        mode = resolve_mode(on_duplicate)
+        result = ImportResult()
+        batch: List[Dict[str, str]] = []
+        seen = 0
+        line_no = 0
+
+        try:
+            for line_no, fields, error in rows:
+                seen += 1
+                if seen > self.max_rows:
+                    result.truncated = True
+                    result.add_error(line_no, f"Row limit of {self.max_rows} reached; the rest was not imported")
+                    break
+
+                if error is None:
+                    try:
+                        batch.append(_card_from_fields(fields, topic, difficulty))
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    result.add_error(line_no, error)
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    self._save_batch(db, user_id, batch, mode, result)
+                    batch = []
+
+        except (UnicodeDecodeError, csv.Error) as e:
+            result.truncated = True
+            result.add_error(line_no + 1, f"Unreadable input: {e}")
+
+        if batch:
+            self._save_batch(db, user_id, batch, mode, result)
+
+        if result.imported:
+            # Cheaper to reload the user's index lazily than to upsert card by card
+            vector_index.invalidate(user_id)
+
+        logger.info(
+            f"Imported {result.imported} cards for user {user_id} "
+            f"({result.skipped} skipped, {result.merged} merged, {result.failed} failed)"
+        )
+        return result
+
+    @staticmethod
+    def _save_batch(
+        db: Session,
+        user_id: int,
+        batch: List[Dict[str, str]],
+        mode: str,
+        result: ImportResult
+    ) -> None:
+        """Dedup, embed and bulk-insert one batch, then commit it"""
+        matches = DuplicateIndex.classify(db, user_id, [card["question"] for card in batch])
+
+        to_insert = []
+        for batch_index, (card, (signature, existing_id, twin)) in enumerate(zip(batch, matches)):
+            is_duplicate = existing_id is not None or twin is not None
+            if is_duplicate and mode == "skip":
+                result.skipped += 1
+            elif is_duplicate and mode == "merge":
+                if existing_id is not None:
+                    result.merged += 1
+                else:
+                    result.skipped += 1  # Its twin earlier in the file is being imported
+            else:
+                to_insert.append((batch_index, card, signature, existing_id, twin))
+
+        if not to_insert:
+            return
+
+        provider = get_embedding_provider()
+        embeddings = provider.embed_batch([card_text(card["question"], card["answer"]) for _, card, *_ in to_insert])
+
+        card_ids = db.scalars(
+            insert(FlashcardDB).returning(FlashcardDB.id, sort_by_parameter_order=True),
+            [
+                {
+                    "user_id": user_id,
+                    "question": card["question"],
+                    "answer": card["answer"],
+                    "topic": card["topic"],
+                    "difficulty": card["difficulty"],
+                    "embedding": encode_embedding(embedding_vector),
+                    "embedding_model": provider.model_id,
+                    "minhash": signature.tobytes(),
+                    "duplicate_of": existing_id if mode == "flag" else None
+                }
+                for (_, card, signature, existing_id, _), embedding_vector in zip(to_insert, embeddings)
+            ]
+        ).all()
+
+        if mode == "flag":
+            # Batch twins only get ids now
+            batch_ids = {batch_index: card_id for (batch_index, *_), card_id in zip(to_insert, card_ids)}
+            twin_flags = [
+                {"id": card_id, "duplicate_of": batch_ids[twin]}
+                for (_, _, _, existing_id, twin), card_id in zip(to_insert, card_ids)
+                if existing_id is None and twin is not None
+            ]
+            if twin_flags:
+                db.execute(update(FlashcardDB), twin_flags)
+            result.flagged += sum(
+                1 for _, _, _, existing_id, twin in to_insert
+                if existing_id is not None or twin is not None
+            )
+
+        db.execute(insert(FlashcardLSHBucketDB), [
+            row
+            for (_, _, signature, _, _), card_id in zip(to_insert, card_ids)
+            for row in DuplicateIndex.bucket_rows(user_id, card_id, signature)
+        ])
+
+        for card_topic, count in Counter(card["topic"] for _, card, *_ in to_insert).items():
+            AnalyticsRollup.record_cards_created(db, user_id, card_topic, count=count)
+
+        db.commit()
+        result.imported += len(card_ids)
+
+
+def _anki_tags(topic: Optional[str], difficulty: Optional[str]) -> str:
+    tags = []
+    if topic:
+        tags.append("_".join(topic.split()))
+    if difficulty:
+        tags.append(difficulty)
+    return " ".join(tags)
+
+
+def export_cards(
+    user_id: int,
+    file_format: str,
+    topic: Optional[str] = None,
+    session_factory: Callable[[], Session] = SessionLocal
+) -> Iterator[str]:
+    """
+    Yield a user's deck in `file_format`, EXPORT_CHUNK_SIZE cards at a time.
+
+    Uses its own session, since the response body is produced after the
+    request's session has closed.
+    """
+    db = session_factory()
+    try:
+        query = db.query(
+            FlashcardDB.id, FlashcardDB.question, FlashcardDB.answer,
+            FlashcardDB.topic, FlashcardDB.difficulty, FlashcardDB.created_at
+        ).filter(FlashcardDB.user_id == user_id)
+        if topic:
+            query = query.filter(FlashcardDB.topic == topic)
+        rows = query.order_by(FlashcardDB.id).yield_per(settings.EXPORT_CHUNK_SIZE)
+
+        buffer = io.StringIO()
+        if file_format == "csv":
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+        elif file_format == "tsv":
+            writer = csv.writer(buffer, delimiter="\t", lineterminator="\n")
+            buffer.write("#separator:tab\n#html:false\n#tags column:3\n")
+
+        for count, (card_id, question, answer, card_topic, difficulty, created_at) in enumerate(rows, 1):
+            if file_format == "jsonl":
+                buffer.write(json.dumps({
+                    "id": card_id,
+                    "question": question,
+                    "answer": answer,
+                    "topic": card_topic,
+                    "difficulty": difficulty,
+                    "created_at": created_at.isoformat() if created_at else None
+                }) + "\n")
+            elif file_format == "tsv":
+                writer.writerow([question, answer, _anki_tags(card_topic, difficulty)])
+            else:
+                writer.writerow([
+                    card_id, question, answer, card_topic, difficulty,
+                    created_at.isoformat() if created_at else ""
+                ])
+
+            if count % settings.EXPORT_CHUNK_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+    finally:
+        db.close()
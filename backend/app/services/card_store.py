@@ -0,0 +1,127 @@
+"""
+Persistence of LLM-generated flashcards.
+
+Shared by the synchronous, streaming and queued generation paths so every
+generated card gets the same dedup check, embedding, analytics rollup and
+vector index treatment as a hand-written one.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db import FlashcardDB
+from app.services.analytics import AnalyticsRollup
+from app.services.dedup import DuplicateIndex, resolve_mode
+from app.services.embedding_codec import encode_embedding
+from app.services.embeddings import card_text, get_embedding_provider
+from app.services.vector_index import vector_index
+
+
+@dataclass
+class SavedCards:
+    """Outcome of saving a batch of generated cards"""
+    created: List[FlashcardDB] = field(default_factory=list)
+    merged: List[FlashcardDB] = field(default_factory=list)  # Existing cards standing in for duplicates
+    skipped: int = 0
+
+    @property
+    def cards(self) -> List[FlashcardDB]:
+        """Cards to show the user: new ones, then the existing ones they merged into"""
+        return self.created + self.merged
+
+
+async def save_generated_cards(
+    db: AsyncSession,
+    user_id: int,
+    generated_cards: List[Dict[str, str]],
+    topic: str,
+    difficulty: str,
+    on_duplicate: Optional[str] = None
+) -> SavedCards:
+    """
+    Embed and store LLM-generated cards, updating the rollup, vector index
+    and duplicate index.
+
+    Near-duplicates of existing cards (or of earlier cards in the batch) are
+    flagged, skipped or merged according to `on_duplicate` (default
+    DEDUP_MODE).
+    """
+    mode = resolve_mode(on_duplicate)
+    result = SavedCards()
+
+    matches = await db.run_sync(
+        DuplicateIndex.classify, user_id, [card_data["question"] for card_data in generated_cards]
+    )
+
+    # Decide which cards to insert before embedding, so dropped ones cost nothing
+    to_insert = []
+    merged_ids = []
+    for batch_index, (card_data, (signature, existing_id, twin)) in enumerate(zip(generated_cards, matches)):
+        is_duplicate = existing_id is not None or twin is not None
+        if is_duplicate and mode == "skip":
+            result.skipped += 1
+        elif is_duplicate and mode == "merge":
+            if existing_id is not None:
+                merged_ids.append(existing_id)
+            else:
+                result.skipped += 1  # Its batch twin is being created already
+        else:
+            to_insert.append((batch_index, card_data, signature, existing_id if mode == "flag" else None, twin))
+
+    if merged_ids:
+        existing = {
+            card.id: card
+            for card in await db.scalars(select(FlashcardDB).where(FlashcardDB.id.in_(merged_ids)))
+        }
+        result.merged = [existing[card_id] for card_id in dict.fromkeys(merged_ids)]
+
+    if not to_insert:
+        return result
+
+    # Embed all new cards in one batch (off the event loop; the provider
+    # may call out to a model server)
+    provider = get_embedding_provider()
+    embeddings = await run_in_threadpool(
+        provider.embed_batch,
+        [card_text(card_data["question"], card_data["answer"]) for _, card_data, _, _, _ in to_insert]
+    )
+
+    def persist(session: Session) -> None:
+        for (_, card_data, _, duplicate_of, _), embedding_vector in zip(to_insert, embeddings):
+            new_card = FlashcardDB(
+                user_id=user_id,
+                question=card_data["question"],
+                answer=card_data["answer"],
+                topic=topic,
+                difficulty=difficulty,
+                embedding=encode_embedding(embedding_vector),
+                embedding_model=provider.model_id,
+                duplicate_of=duplicate_of
+            )
+
+            session.add(new_card)
+            result.created.append(new_card)
+
+        session.flush()
+
+        # Batch twins only get ids now
+        batch_ids = {batch_index: card.id for (batch_index, *_), card in zip(to_insert, result.created)}
+        for new_card, (_, _, signature, _, twin) in zip(result.created, to_insert):
+            if twin is not None and mode == "flag":
+                new_card.duplicate_of = batch_ids.get(twin)
+            DuplicateIndex.add(session, new_card, signature)
+
+        AnalyticsRollup.record_cards_created(session, user_id, topic, count=len(result.created))
+
+    # The dedup and rollup helpers are synchronous; run_sync drives them on
+    # the async connection without blocking the loop
+    await db.run_sync(persist)
+    await db.commit()
+
+    for card, embedding_vector in zip(result.created, embeddings):
+        vector_index.upsert(user_id, card.id, embedding_vector)
+
+    return result
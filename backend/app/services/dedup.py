@@ -0,0 +1,262 @@
+"""
+Near-duplicate flashcard detection with MinHash and locality-sensitive hashing.
+
+Each card's normalized question is shingled into character 4-grams and
+summarized by a 64-value MinHash signature; the fraction of equal values
+between two signatures estimates the Jaccard similarity of their shingle
+sets. The signature is split into 16 bands of 4 rows and every band is
+hashed to a bucket stored in `flashcard_lsh_buckets`. Cards sharing any
+bucket are candidates, so a lookup reads a handful of index rows instead
+of scanning the deck; candidates are then checked against DEDUP_THRESHOLD
+using their stored signatures.
+
+Shingle overlap says little about meaning: "...country number 3?" and
+"...country number 2?" share almost every 4-gram. So a match is only
+confirmed if the questions' exact word-level Jaccard similarity also
+reaches DEDUP_THRESHOLD and they contain the same numbers.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import FlashcardDB, FlashcardLSHBucketDB
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+DEDUP_MODES = ("off", "flag", "skip", "merge")
+
+_IN_CHUNK = 900  # Bound parameters per IN (...) clause
+
+_PRIME = np.uint64((1 << 31) - 1)
+# Fixed seed: signatures are stored, so the hash family must never change
+_random = np.random.RandomState(20240101)
+_A = _random.randint(1, (1 << 31) - 1, NUM_PERM).astype(np.uint64)
+_B = _random.randint(0, (1 << 31) - 1, NUM_PERM).astype(np.uint64)
+
+_WORD = re.compile(r"\w+")
+
+
+def resolve_mode(mode: Optional[str] = None) -> str:
+    """Validate a per-request dedup mode, falling back to DEDUP_MODE"""
+    mode = mode or settings.DEDUP_MODE
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode} (choose from {', '.join(DEDUP_MODES)})")
+    return mode
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase words only, so punctuation and spacing never matter"""
+    return " ".join(_WORD.findall(question.lower()))
+
+
+def signature(question: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of a question"""
+    text = normalize_question(question)
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # Universal hashing (a*x + b) mod p; products stay below 2**63
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(a == b))
+
+
+def words(question: str) -> FrozenSet[str]:
+    """Distinct normalized word (and number) tokens of a question"""
+    return frozenset(normalize_question(question).split())
+
+
+def _numbers(question_words: FrozenSet[str]) -> FrozenSet[str]:
+    return frozenset(word for word in question_words if any(c.isdigit() for c in word))
+
+
+def confirmed(a: FrozenSet[str], b: FrozenSet[str], threshold: float) -> bool:
+    """Exact check of a MinHash match: word Jaccard at `threshold` or above, and the same numbers"""
+    if _numbers(a) != _numbers(b):
+        return False
+    union = len(a | b)
+    return union == 0 or len(a & b) / union >= threshold
+
+
+def bucket_keys(sig: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket key per LSH band"""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes(),
+            digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def _decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+class DuplicateIndex:
+    """Per-user LSH index over flashcard questions"""
+
+    @staticmethod
+    def _candidates(db: Session, user_id: int, keys: Iterable[int]) -> Dict[int, Set[int]]:
+        """Card ids sharing each of the given bucket keys"""
+        keys = list(set(keys))
+        by_bucket: Dict[int, Set[int]] = defaultdict(set)
+        for start in range(0, len(keys), _IN_CHUNK):
+            for bucket, card_id in db.query(FlashcardLSHBucketDB.bucket, FlashcardLSHBucketDB.flashcard_id).filter(
+                FlashcardLSHBucketDB.user_id == user_id,
+                FlashcardLSHBucketDB.bucket.in_(keys[start:start + _IN_CHUNK])
+            ):
+                by_bucket[bucket].add(card_id)
+        return by_bucket
+
+    @staticmethod
+    def _signatures(db: Session, card_ids: Iterable[int]) -> Dict[int, Tuple[np.ndarray, FrozenSet[str]]]:
+        """Stored signatures and question words of the given cards"""
+        card_ids = list(card_ids)
+        signatures = {}
+        for start in range(0, len(card_ids), _IN_CHUNK):
+            for card_id, blob, question in db.query(FlashcardDB.id, FlashcardDB.minhash, FlashcardDB.question).filter(
+                FlashcardDB.id.in_(card_ids[start:start + _IN_CHUNK])
+            ):
+                if blob is not None:
+                    signatures[card_id] = (_decode(blob), words(question or ""))
+        return signatures
+
+    @staticmethod
+    def _best_match(
+        sig: np.ndarray,
+        question_words: FrozenSet[str],
+        candidate_ids: Iterable[int],
+        signatures: Dict[int, Tuple[np.ndarray, FrozenSet[str]]],
+        threshold: float
+    ) -> Optional[Tuple[int, float]]:
+        best = None
+        for card_id in sorted(candidate_ids):
+            if card_id not in signatures:
+                continue
+            candidate_sig, candidate_words = signatures[card_id]
+            score = similarity(sig, candidate_sig)
+            if score >= threshold and (best is None or score > best[1]) and confirmed(
+                question_words, candidate_words, threshold
+            ):
+                best = (card_id, score)
+        return best
+
+    @staticmethod
+    def find_duplicate(
+        db: Session,
+        user_id: int,
+        question: str,
+        exclude_id: Optional[int] = None,
+        threshold: Optional[float] = None
+    ) -> Optional[Tuple[int, float]]:
+        """Most similar existing card at or above the threshold, as (id, estimated similarity)"""
+        threshold = settings.DEDUP_THRESHOLD if threshold is None else threshold
+        sig = signature(question)
+
+        candidate_ids = set().union(*DuplicateIndex._candidates(db, user_id, bucket_keys(sig)).values())
+        candidate_ids.discard(exclude_id)
+        if not candidate_ids:
+            return None
+
+        return DuplicateIndex._best_match(
+            sig, words(question), candidate_ids, DuplicateIndex._signatures(db, candidate_ids), threshold
+        )
+
+    @staticmethod
+    def classify(
+        db: Session,
+        user_id: int,
+        questions: Sequence[str]
+    ) -> List[Tuple[np.ndarray, Optional[int], Optional[int]]]:
+        """
+        Signature and duplicate match for each question in a batch.
+
+        Returns (signature, existing_card_id, earlier_batch_index) per
+        question; questions repeating an earlier one in the same batch point
+        at it by index, since that card has no id yet. The whole batch is
+        looked up with one bucket query and one signature query.
+        """
+        signatures = [signature(question) for question in questions]
+        question_words = [words(question) for question in questions]
+        keys = [bucket_keys(sig) for sig in signatures]
+
+        by_bucket = DuplicateIndex._candidates(db, user_id, (key for card_keys in keys for key in card_keys))
+        existing = DuplicateIndex._signatures(db, set().union(*by_bucket.values()))
+
+        results = []
+        batch_buckets: Dict[int, List[int]] = defaultdict(list)
+
+        for i, (sig, card_keys) in enumerate(zip(signatures, keys)):
+            candidate_ids = {card_id for key in card_keys for card_id in by_bucket.get(key, ())}
+            match = DuplicateIndex._best_match(
+                sig, question_words[i], candidate_ids, existing, settings.DEDUP_THRESHOLD
+            )
+            existing_id = match[0] if match else None
+
+            twin = None
+            if existing_id is None:
+                for j in sorted({j for key in card_keys for j in batch_buckets.get(key, ())}):
+                    if similarity(sig, signatures[j]) >= settings.DEDUP_THRESHOLD and confirmed(
+                        question_words[i], question_words[j], settings.DEDUP_THRESHOLD
+                    ):
+                        twin = j
+                        break
+
+            for key in card_keys:
+                batch_buckets[key].append(i)
+            results.append((sig, existing_id, twin))
+
+        return results
+
+    @staticmethod
+    def bucket_rows(user_id: int, card_id: int, sig: np.ndarray) -> List[Dict]:
+        """Bucket table rows for a card (for bulk inserts)"""
+        return [
+            {"user_id": user_id, "bucket": key, "flashcard_id": card_id}
+            for key in bucket_keys(sig)
+        ]
+
+    @staticmethod
+    def add(db: Session, card: FlashcardDB, sig: Optional[np.ndarray] = None) -> None:
+        """Store a (flushed) card's signature and buckets"""
+        sig = signature(card.question) if sig is None else sig
+        card.minhash = sig.tobytes()
+        db.add_all([
+            FlashcardLSHBucketDB(**row)
+            for row in DuplicateIndex.bucket_rows(card.user_id, card.id, sig)
+        ])
+
+    @staticmethod
+    def remove(db: Session, card_id: int) -> None:
+        """Drop a card's buckets and any duplicate flags pointing at it"""
+        db.query(FlashcardLSHBucketDB).filter(
+            FlashcardLSHBucketDB.flashcard_id == card_id
+        ).delete(synchronize_session=False)
+        db.query(FlashcardDB).filter(
+            FlashcardDB.duplicate_of == card_id
+        ).update({FlashcardDB.duplicate_of: None}, synchronize_session=False)
+
+    @staticmethod
+    def reindex(db: Session, card: FlashcardDB) -> None:
+        """Recompute buckets after a card's question changed"""
+        db.query(FlashcardLSHBucketDB).filter(
+            FlashcardLSHBucketDB.flashcard_id == card.id
+        ).delete(synchronize_session=False)
+        DuplicateIndex.add(db, card)
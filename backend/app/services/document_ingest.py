@@ -0,0 +1,233 @@
+"""
+Map-reduce flashcard generation for long documents.
+
+A document is split into overlapping chunks that each fit a token budget
+(map inputs), cards are generated for the chunks concurrently, and the
+per-chunk results are merged with near-duplicate questions removed
+(reduce). The requested card count is spread across chunks in proportion
+to their length.
+"""
+
+import asyncio
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.config import settings
+from app.services.llm_service import OllamaBusyError, OllamaService, get_ollama_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for English prose with BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+CHUNK_SEPARATOR = "\n\n"
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of model tokens in `text`"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _packed_tokens(unit: str) -> int:
+    """A unit's share of a chunk's budget, counting the separator that joins it to the next"""
+    return estimate_tokens(unit + CHUNK_SEPARATOR)
+
+
+@dataclass
+class DocumentChunk:
+    """A slice of the source document sent to the model on its own"""
+    index: int
+    text: str
+    tokens: int
+
+
+def _split_units(text: str, max_tokens: int) -> List[str]:
+    """Split text into paragraphs, falling back to sentences and then words for long ones"""
+    units = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+
+        for sentence in _SENTENCE_SPLIT.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+                continue
+
+            # A single run-on "sentence" longer than the budget: hard-wrap by words
+            words = sentence.split()
+            per_piece = max(1, max_tokens * CHARS_PER_TOKEN // 8)  # Assume long-ish words
+            for start in range(0, len(words), per_piece):
+                units.append(" ".join(words[start:start + per_piece]))
+
+    return units
+
+
+def chunk_document(
+    text: str,
+    max_tokens: int = settings.DOCUMENT_CHUNK_TOKENS,
+    overlap_tokens: int = settings.DOCUMENT_CHUNK_OVERLAP_TOKENS
+) -> List[DocumentChunk]:
+    """
+    Pack paragraphs (or sentences) into chunks of at most `max_tokens`.
+
+    Each chunk after the first starts with the trailing units of the previous
+    one, up to `overlap_tokens`, so facts spanning a boundary stay intact.
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    chunks: List[DocumentChunk] = []
+    current: List[str] = []
+    current_tokens = 0
+    fresh = False  # Whether `current` holds anything beyond the carried-over overlap
+
+    def flush():
+        chunk_text = CHUNK_SEPARATOR.join(current)
+        chunks.append(DocumentChunk(index=len(chunks), text=chunk_text, tokens=estimate_tokens(chunk_text)))
+
+    for unit in _split_units(text, max_tokens):
+        unit_tokens = _packed_tokens(unit)
+
+        if current and current_tokens + unit_tokens > max_tokens:
+            if fresh:
+                flush()
+
+            # Carry the tail of this chunk into the next one
+            carried: List[str] = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                previous_tokens = _packed_tokens(previous)
+                if carried_tokens + previous_tokens > overlap_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_tokens
+
+            while carried and carried_tokens + unit_tokens > max_tokens:
+                carried_tokens -= _packed_tokens(carried.pop(0))
+
+            current, current_tokens, fresh = carried, carried_tokens, False
+
+        current.append(unit)
+        current_tokens += unit_tokens
+        fresh = True
+
+    if current and fresh:
+        flush()
+
+    return chunks
+
+
+def allocate_cards(chunks: List[DocumentChunk], num_cards: int) -> List[int]:
+    """
+    Spread `num_cards` across chunks in proportion to their size
+    (largest-remainder rounding, so the counts sum to `num_cards`).
+    """
+    if not chunks or num_cards <= 0:
+        return [0] * len(chunks)
+
+    total_tokens = sum(chunk.tokens for chunk in chunks) or len(chunks)
+    quotas = [num_cards * chunk.tokens / total_tokens for chunk in chunks]
+    counts = [int(quota) for quota in quotas]
+
+    leftover = num_cards - sum(counts)
+    by_remainder = sorted(range(len(chunks)), key=lambda i: quotas[i] - counts[i], reverse=True)
+    for i in by_remainder[:leftover]:
+        counts[i] += 1
+
+    return counts
+
+
+def _question_key(question: str) -> frozenset:
+    return frozenset(word.lower() for word in _WORD.findall(question))
+
+
+def merge_cards(card_lists: List[List[Dict[str, str]]], similarity: float = 0.8) -> List[Dict[str, str]]:
+    """
+    Concatenate per-chunk cards, dropping questions that repeat an earlier one.
+
+    Questions are compared as word sets; a Jaccard similarity of at least
+    `similarity` counts as a duplicate (overlapping chunks often produce the
+    same question twice).
+    """
+    merged = []
+    seen: List[frozenset] = []
+
+    for cards in card_lists:
+        for card in cards:
+            key = _question_key(card["question"])
+            if not key:
+                continue
+            if any(len(key & other) / len(key | other) >= similarity for other in seen):
+                continue
+            seen.append(key)
+            merged.append(card)
+
+    return merged
+
+
+class DocumentIngestor:
+    """Generates a deck from a long document by chunked, concurrent generation"""
+
+    def __init__(
+        self,
+        ollama_service: Optional[OllamaService] = None,
+        max_concurrency: int = settings.DOCUMENT_CHUNK_CONCURRENCY,
+        max_tokens: int = settings.DOCUMENT_CHUNK_TOKENS,
+        overlap_tokens: int = settings.DOCUMENT_CHUNK_OVERLAP_TOKENS
+    ):
+        self.ollama_service = ollama_service or get_ollama_service()
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    async def generate(
+        self,
+        text: str,
+        num_cards: int = 20,
+        difficulty: str = "medium"
+    ) -> Dict:
+        """
+        Generate up to `num_cards` flashcards from `text`.
+
+        Returns the merged cards plus per-chunk statistics. Chunks that fail
+        or cannot get an Ollama slot contribute no cards.
+        """
+        chunks = chunk_document(text, self.max_tokens, self.overlap_tokens)
+        allocation = allocate_cards(chunks, num_cards)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def generate_chunk(chunk: DocumentChunk, count: int) -> List[Dict[str, str]]:
+            if count <= 0:
+                return []
+            async with semaphore:
+                try:
+                    return await self.ollama_service.generate_flashcards(
+                        text=chunk.text,
+                        num_cards=count,
+                        difficulty=difficulty
+                    )
+                except OllamaBusyError as e:
+                    logger.warning(f"Skipping document chunk {chunk.index}: {e}")
+                    return []
+
+        results = await asyncio.gather(*[
+            generate_chunk(chunk, count) for chunk, count in zip(chunks, allocation)
+        ])
+
+        generated = sum(len(result) for result in results)
+        merged = merge_cards(results)
+        return {
+            "cards": merged[:num_cards],
+            "chunks": len(chunks),
+            "failed_chunks": sum(1 for count, result in zip(allocation, results) if count and not result),
+            "generated": generated,
+            "duplicates_removed": generated - len(merged)
+        }
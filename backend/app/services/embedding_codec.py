@@ -0,0 +1,77 @@
+"""
+Compact binary encoding for flashcard embeddings.
+
+Each blob starts with a 4-byte header naming its format, which keeps the
+payload 4-byte aligned for zero-copy `np.frombuffer` reads:
+
+    b"F32\\0" + little-endian float32 values          (4 bytes/dim)
+    b"I8\\0\\0" + float32 scale + int8 values           (1 byte/dim)
+
+int8 blobs use symmetric quantization: value = q * scale.
+"""
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+
+FLOAT32 = "float32"
+INT8 = "int8"
+
+_FLOAT32_HEADER = b"F32\0"
+_INT8_HEADER = b"I8\0\0"
+_HEADER_SIZE = 4
+
+
+def encode_embedding(vector: Sequence[float], storage: Optional[str] = None) -> bytes:
+    """Pack an embedding vector into its binary column format"""
+    storage = storage or settings.EMBEDDING_STORAGE
+    values = np.asarray(vector, dtype="<f4")
+
+    if storage == INT8:
+        peak = float(np.max(np.abs(values))) if values.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return _INT8_HEADER + np.float32(scale).astype("<f4").tobytes() + quantized.tobytes()
+
+    if storage != FLOAT32:
+        raise ValueError(f"Unknown embedding storage format: {storage}")
+
+    return _FLOAT32_HEADER + values.tobytes()
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """Unpack a binary embedding into a float32 vector (zero-copy for float32)"""
+    header = bytes(blob[:_HEADER_SIZE])
+
+    if header == _FLOAT32_HEADER:
+        return np.frombuffer(blob, dtype="<f4", offset=_HEADER_SIZE)
+
+    if header == _INT8_HEADER:
+        scale = np.frombuffer(blob, dtype="<f4", count=1, offset=_HEADER_SIZE)[0]
+        quantized = np.frombuffer(blob, dtype=np.int8, offset=_HEADER_SIZE + 4)
+        return quantized.astype(np.float32) * scale
+
+    raise ValueError("Unrecognized embedding blob header")
+
+
+def decode_embeddings(
+    rows: Iterable[Tuple[int, bytes]],
+    dimension: int
+) -> Tuple[List[int], np.ndarray]:
+    """
+    Decode (id, blob) rows into ids and an (n, dimension) float32 matrix.
+
+    Rows with a different dimension (e.g. from an older model) are skipped.
+    """
+    ids = []
+    vectors = []
+    for row_id, blob in rows:
+        if blob is None:
+            continue
+        vector = decode_embedding(blob)
+        if vector.shape == (dimension,):
+            ids.append(row_id)
+            vectors.append(vector)
+
+    matrix = np.vstack(vectors) if vectors else np.empty((0, dimension), dtype=np.float32)
+    return ids, matrix
@@ -0,0 +1,297 @@
+"""
+Pluggable embedding providers with a content-addressed on-disk cache.
+
+Providers turn a batch of texts into an (n, dimension) float32 array:
+
+- "hash": the built-in hash embedding (VectorEmbeddingService.batch_embed)
+- "ollama": a local Ollama server's /api/embeddings endpoint
+- "sklearn": a stateless scikit-learn HashingVectorizer with TF weighting
+
+Every provider except "hash" (which is cheaper to recompute than to look
+up) is wrapped in an EmbeddingCache keyed on sha256(model id + text), so
+identical card text is never embedded twice, across users or re-imports.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+from app.config import settings
+from app.services.embedding_codec import FLOAT32, decode_embedding, encode_embedding
+from app.services.llm_service import VectorEmbeddingService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def card_text(question: str, answer: str) -> str:
+    """Text that represents a flashcard for embedding"""
+    return question + " " + answer
+
+
+class EmbeddingProviderError(RuntimeError):
+    """An embedding backend failed or returned an unusable response"""
+
+
+class EmbeddingProvider:
+    """Base class for embedding backends"""
+
+    name = "base"
+    cacheable = True
+
+    def __init__(self, dimension: int = settings.EMBEDDING_DIMENSION):
+        self.dimension = dimension
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the model and its output space (used as cache namespace)"""
+        return f"{self.name}:{self.dimension}"
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as an (n, dimension) float32 array"""
+        raise NotImplementedError
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a single text"""
+        return self.embed_batch([text])[0]
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """Deterministic hash embedding (no model, no semantics)"""
+
+    name = "hash"
+    cacheable = False
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        return VectorEmbeddingService.batch_embed(texts, self.dimension).astype(np.float32)
+
+
+class OllamaEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from an Ollama server's /api/embeddings endpoint.
+
+    Connection errors and 5xx responses are retried `retries` times with a
+    doubling backoff; anything else (or running out of retries) raises
+    EmbeddingProviderError, as does a vector of the wrong dimension.
+    """
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        dimension: int = settings.EMBEDDING_DIMENSION,
+        base_url: str = settings.OLLAMA_API_URL,
+        model: str = settings.OLLAMA_EMBEDDING_MODEL,
+        timeout: float = 30.0,
+        transport: Optional[httpx.BaseTransport] = None,
+        retries: int = 2,
+        retry_backoff: float = 0.5
+    ):
+        super().__init__(dimension)
+        self.base_url = base_url
+        self.model = model
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._client = httpx.Client(base_url=base_url, timeout=timeout, transport=transport)
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.name}:{self.model}:{self.dimension}"
+
+    def _request(self, text: str) -> httpx.Response:
+        """POST one text, retrying connection errors and 5xx responses"""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._client.post(
+                    "/api/embeddings",
+                    json={"model": self.model, "prompt": text}
+                )
+            except httpx.HTTPError as e:
+                error = EmbeddingProviderError(f"Ollama embedding request to {self.base_url} failed: {e}")
+            else:
+                if response.is_success:
+                    return response
+                error = EmbeddingProviderError(
+                    f"Ollama embedding request failed with HTTP {response.status_code}: {response.text[:200]}"
+                )
+                if response.status_code < 500:
+                    raise error
+
+            if attempt < self.retries:
+                logger.warning(f"{error}; retrying")
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+        raise error
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        for i, text in enumerate(texts):
+            try:
+                embedding = self._request(text).json().get("embedding") or []
+            except ValueError:
+                raise EmbeddingProviderError(f"Ollama model {self.model} returned invalid JSON")
+
+            if len(embedding) != self.dimension:
+                raise EmbeddingProviderError(
+                    f"Ollama model {self.model} returned {len(embedding)} dimensions, "
+                    f"expected {self.dimension} (set EMBEDDING_DIMENSION)"
+                )
+            vectors[i] = embedding
+
+        return vectors
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class SklearnEmbeddingProvider(EmbeddingProvider):
+    """
+    Stateless bag-of-words embedding with scikit-learn's HashingVectorizer.
+
+    Unigrams and bigrams are hashed into `dimension` buckets with sublinear
+    TF weighting and L2 normalization; no fitting or stored vocabulary is
+    needed, so vectors are stable across processes.
+    """
+
+    name = "sklearn"
+
+    def __init__(self, dimension: int = settings.EMBEDDING_DIMENSION):
+        super().__init__(dimension)
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self._vectorizer = HashingVectorizer(
+            n_features=dimension,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm=None
+        )
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        counts = self._vectorizer.transform(texts)
+        counts.data = 1.0 + np.log(counts.data)  # Sublinear TF
+        vectors = counts.toarray().astype(np.float32)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class EmbeddingCache:
+    """Content-hash keyed embedding store in a local SQLite file"""
+
+    def __init__(self, path: str = settings.EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets processes share the file"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model_id: str, text: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up cached vectors by key"""
+        found = {}
+        conn = self._connection()
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update({key: decode_embedding(blob) for key, blob in rows})
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> None:
+        """Store vectors by key"""
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, encode_embedding(vector, FLOAT32)) for key, vector in vectors.items()]
+            )
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Wraps a provider so each distinct text is embedded at most once"""
+
+    def __init__(self, provider: EmbeddingProvider, cache: EmbeddingCache):
+        super().__init__(provider.dimension)
+        self.provider = provider
+        self.cache = cache
+        self.name = provider.name
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model_id(self) -> str:
+        return self.provider.model_id
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        keys = [EmbeddingCache.key(self.model_id, text) for text in texts]
+        cached = self.cache.get_many(list(set(keys)))
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            computed = self.provider.embed_batch(list(missing.values()))
+            fresh = dict(zip(missing.keys(), computed))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, key in enumerate(keys):
+            vectors[i] = cached[key]
+        return vectors
+
+
+PROVIDERS = {
+    HashEmbeddingProvider.name: HashEmbeddingProvider,
+    OllamaEmbeddingProvider.name: OllamaEmbeddingProvider,
+    SklearnEmbeddingProvider.name: SklearnEmbeddingProvider,
+}
+
+
+def create_embedding_provider(name: str, use_cache: bool = True) -> EmbeddingProvider:
+    """Build a provider by name, wrapped in the on-disk cache when useful"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {name} (choose from {', '.join(PROVIDERS)})")
+
+    provider = PROVIDERS[name]()
+    if use_cache and provider.cacheable:
+        provider = CachedEmbeddingProvider(provider, EmbeddingCache())
+    return provider
+
+
+@lru_cache(maxsize=1)
+def get_embedding_provider() -> EmbeddingProvider:
+    """The configured embedding provider (process-wide singleton)"""
+    return create_embedding_provider(settings.EMBEDDING_PROVIDER, settings.EMBEDDING_CACHE_ENABLED)
@@ -0,0 +1,121 @@
+"""
+Persistent cache of LLM flashcard generations.
+
+Generating cards for the same material with the same settings is
+deterministic enough to reuse, and far cheaper to look up than to rerun.
+Results live in a local SQLite file (WAL mode, shared by all workers) keyed
+on a hash of the normalized prompt inputs and the model, with a TTL and
+least-recently-used eviction beyond a fixed number of entries.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCache:
+    """TTL + LRU bounded store of generated flashcard lists"""
+
+    def __init__(
+        self,
+        path: str = settings.GENERATION_CACHE_PATH,
+        ttl_seconds: float = settings.GENERATION_CACHE_TTL_SECONDS,
+        max_entries: int = settings.GENERATION_CACHE_MAX_ENTRIES
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "key TEXT PRIMARY KEY, cards TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_generations_last_used ON generations (last_used)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets processes share the file"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model: str, text: str, num_cards: int, difficulty: str, prompt_version: int = 1) -> str:
+        """Hash of the generation inputs; whitespace and case of `difficulty` are normalized"""
+        normalized = {
+            "model": model,
+            "prompt_version": prompt_version,
+            "text": " ".join(text.split()),
+            "num_cards": int(num_cards),
+            "difficulty": difficulty.strip().lower()
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """Cached cards for `key`, or None if missing or expired"""
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT cards FROM generations WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE generations SET last_used = ? WHERE key = ?", (now, key))
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, cards: List[Dict[str, str]]) -> None:
+        """Store cards, then drop expired entries and trim to `max_entries` (LRU)"""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generations (key, cards, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(cards), now, now)
+            )
+            conn.execute("DELETE FROM generations WHERE created_at < ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM generations WHERE key IN ("
+                "SELECT key FROM generations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        """Remove every cached generation"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM generations")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process and the shared entry count"""
+        entries = self._connection().execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
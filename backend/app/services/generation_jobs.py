@@ -0,0 +1,263 @@
+"""
+Persistent queue for background flashcard generation.
+
+Submitting a job only inserts a row, so the HTTP request returns at once.
+A pool of asyncio workers in each app process claims queued rows with a
+conditional UPDATE (safe across processes), runs the generation, and
+stores the cards. A claimed job holds a lease; if its process dies, the
+lease expires and another worker picks the job up again. Jobs interrupted
+by a graceful shutdown are put back in the queue at once instead. Failed
+attempts are retried with exponential backoff up to the job's
+`max_attempts`.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db import AsyncSessionLocal, GenerationJobDB
+from app.services.card_store import save_generated_cards
+from app.services.document_ingest import DocumentIngestor
+from app.services.llm_service import get_ollama_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _claimable(now: datetime):
+    """Queued jobs whose backoff has elapsed, or running jobs whose lease expired"""
+    return or_(
+        and_(GenerationJobDB.status == "queued", GenerationJobDB.next_attempt_at <= now),
+        and_(GenerationJobDB.status == "running", GenerationJobDB.lease_expires_at < now)
+    )
+
+
+class GenerationJobQueue:
+    """Submits generation jobs and runs them on a pool of background workers"""
+
+    def __init__(
+        self,
+        workers: int = settings.GENERATION_JOB_WORKERS,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal
+    ):
+        self.workers = workers
+        self.session_factory = session_factory
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    async def submit(
+        db: AsyncSession,
+        user_id: int,
+        text: str,
+        topic: str = "General",
+        num_cards: int = 5,
+        difficulty: str = "medium",
+        kind: str = "text"
+    ) -> GenerationJobDB:
+        """Persist a new job; call notify() afterwards to wake an idle worker"""
+        job = GenerationJobDB(
+            user_id=user_id,
+            kind=kind,
+            text=text,
+            topic=topic,
+            num_cards=num_cards,
+            difficulty=difficulty,
+            max_attempts=settings.GENERATION_JOB_MAX_ATTEMPTS,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.add(job)
+        await db.commit()
+        return job
+
+    def notify(self) -> None:
+        """Wake idle workers (jobs are found by polling otherwise)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @staticmethod
+    async def queue_position(db: AsyncSession, job: GenerationJobDB) -> Optional[int]:
+        """Number of queued jobs ahead of this one (None unless queued)"""
+        if job.status != "queued":
+            return None
+        return await db.scalar(select(func.count(GenerationJobDB.id)).where(
+            GenerationJobDB.status == "queued",
+            GenerationJobDB.id < job.id
+        ))
+
+    @staticmethod
+    def card_ids(job: GenerationJobDB) -> List[int]:
+        """Ids of the flashcards a completed job created"""
+        return json.loads(job.card_ids) if job.card_ids else []
+
+    async def start(self) -> None:
+        """Start the worker pool on the running event loop"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"generation-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} generation workers")
+
+    async def stop(self) -> None:
+        """Cancel the workers; the jobs they were running go back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def stats(self) -> Dict:
+        """Worker count and jobs per status"""
+        async with self.session_factory() as db:
+            rows = await db.execute(select(GenerationJobDB.status, func.count(GenerationJobDB.id)).group_by(
+                GenerationJobDB.status
+            ))
+            counts = dict(rows.all())
+        return {"workers": len(self._tasks), "jobs": counts}
+
+    async def _worker(self) -> None:
+        while True:
+            self._wakeup.clear()
+            job_id = await self._claim()
+
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.GENERATION_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                await self._release(job_id)
+                raise
+            except Exception as e:
+                logger.error(f"Generation worker crashed on job {job_id}: {e}")
+
+    async def _claim(self) -> Optional[int]:
+        """Atomically take the next runnable job, or return None"""
+        async with self.session_factory() as db:
+            now = datetime.utcnow()
+            candidates = await db.scalars(select(GenerationJobDB.id).where(_claimable(now)).order_by(
+                GenerationJobDB.next_attempt_at, GenerationJobDB.id
+            ).limit(self.workers + 1))
+
+            for job_id in candidates.all():
+                # Another worker (or process) may claim the same row first;
+                # the conditional UPDATE lets exactly one of them win
+                claimed = await db.execute(update(GenerationJobDB).where(
+                    GenerationJobDB.id == job_id,
+                    _claimable(now)
+                ).values({
+                    GenerationJobDB.status: "running",
+                    GenerationJobDB.attempts: GenerationJobDB.attempts + 1,
+                    GenerationJobDB.started_at: now,
+                    GenerationJobDB.lease_expires_at: now + timedelta(seconds=settings.GENERATION_JOB_LEASE_SECONDS)
+                }).execution_options(synchronize_session=False))
+                await db.commit()
+
+                if claimed.rowcount:
+                    return job_id
+
+            return None
+
+    async def _release(self, job_id: int) -> None:
+        """Requeue a job interrupted by shutdown, without using up an attempt"""
+        async with self.session_factory() as db:
+            released = await db.execute(update(GenerationJobDB).where(
+                GenerationJobDB.id == job_id,
+                GenerationJobDB.status == "running"
+            ).values({
+                GenerationJobDB.status: "queued",
+                GenerationJobDB.attempts: GenerationJobDB.attempts - 1,
+                GenerationJobDB.lease_expires_at: None,
+                GenerationJobDB.next_attempt_at: datetime.utcnow()
+            }).execution_options(synchronize_session=False))
+            await db.commit()
+
+        if released.rowcount:
+            logger.info(f"Generation job {job_id} interrupted by shutdown, requeued")
+
+    async def _run(self, job_id: int) -> None:
+        """Generate and store the cards for a claimed job"""
+        async with self.session_factory() as db:
+            try:
+                job = await db.get(GenerationJobDB, job_id)
+
+                if job.attempts > job.max_attempts:
+                    # Reclaimed after its worker died on the final attempt
+                    await self._retry_or_fail(db, job, job.error or "Worker stopped before finishing")
+                    return
+
+                try:
+                    cards = await self._generate(job)
+                    error = None if cards else "No flashcards were generated"
+                except Exception as e:
+                    cards, error = [], str(e)
+
+                if error:
+                    await self._retry_or_fail(db, job, error)
+                    return
+
+                # Mark the job done in the same commit that stores its cards, so
+                # a crash can never store them twice
+                job.status = "completed"
+                job.error = None
+                job.lease_expires_at = None
+                job.finished_at = datetime.utcnow()
+                saved = await save_generated_cards(db, job.user_id, cards, job.topic, job.difficulty)
+
+                job.created_count = len(saved.created)
+                job.card_ids = json.dumps([card.id for card in saved.cards])
+                await db.commit()
+                logger.info(f"Generation job {job_id} created {len(saved.created)} cards")
+
+            except Exception as e:
+                await db.rollback()
+                job = await db.get(GenerationJobDB, job_id)
+                if job is not None:
+                    await self._retry_or_fail(db, job, str(e))
+                raise
+
+    @staticmethod
+    async def _generate(job: GenerationJobDB) -> List[Dict[str, str]]:
+        if job.kind == "document":
+            result = await DocumentIngestor().generate(
+                text=job.text,
+                num_cards=job.num_cards,
+                difficulty=job.difficulty
+            )
+            return result["cards"]
+
+        return await get_ollama_service().generate_flashcards(
+            text=job.text,
+            num_cards=job.num_cards,
+            difficulty=job.difficulty
+        )
+
+    @staticmethod
+    async def _retry_or_fail(db: AsyncSession, job: GenerationJobDB, error: str) -> None:
+        """Requeue with exponential backoff, or fail once attempts run out"""
+        job.error = error[:500]
+        job.lease_expires_at = None
+
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            logger.warning(f"Generation job {job.id} failed after {job.attempts} attempts: {error}")
+        else:
+            delay = settings.GENERATION_JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+            job.status = "queued"
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.info(f"Generation job {job.id} attempt {job.attempts} failed, retrying in {delay}s")
+
+        await db.commit()
+
+
+generation_jobs = GenerationJobQueue()
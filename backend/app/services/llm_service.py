@@ -2,22 +2,233 @@
 LLM service for flashcard generation using Ollama.
 """
 
+import asyncio
 import httpx
 import json
-from typing import List, Dict, Optional
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Optional, Sequence
+import numpy as np
 from app.config import settings
+from app.services.generation_cache import GenerationCache
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class OllamaBusyError(Exception):
+    """Raised when a request cannot get an Ollama slot (queue full or wait timed out)"""
+
+
+class OllamaStreamError(Exception):
+    """Raised when a generation stream breaks off (connection error, timeout or malformed output)"""
+
+
+class OllamaLimiter:
+    """
+    Caps concurrent in-flight requests to the Ollama host.
+
+    Requests beyond `max_concurrency` wait in a FIFO queue (asyncio.Semaphore);
+    once `max_queue` requests are waiting, or a wait exceeds `queue_timeout`,
+    new work is rejected with OllamaBusyError instead of piling onto the host.
+    """
+    
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the concurrency slots for the duration of the block"""
+        started = time.monotonic()
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()  # Free slot: returns without suspending
+        else:
+            if self.saturated:
+                self.rejected += 1
+                raise OllamaBusyError("Too many queued generation requests")
+            
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise OllamaBusyError(f"Timed out after {self.queue_timeout:.0f}s waiting for Ollama")
+            finally:
+                self.waiting -= 1
+        
+        waited = time.monotonic() - started
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+    
+    @property
+    def saturated(self) -> bool:
+        """True when a new request would be rejected immediately"""
+        return self._semaphore.locked() and self.waiting >= self.max_queue
+    
+    def stats(self) -> Dict:
+        """Queue depth and wait-time metrics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_seconds": round(self.total_wait / self.completed, 3) if self.completed else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3)
+        }
+
+
+class FlashcardStreamParser:
+    """
+    Incrementally extracts JSON objects from streamed LLM output.
+
+    Tokens are fed as they arrive; every top-level `{...}` object (including
+    objects inside the expected JSON array) is returned as soon as its closing
+    brace is seen. Braces inside strings and escaped quotes are ignored.
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._scanned = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk of text and return any objects it completed"""
+        self._buffer += chunk
+        completed = []
+        
+        while self._scanned < len(self._buffer):
+            char = self._buffer[self._scanned]
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            
+            elif char == '"' and self._depth > 0:
+                self._in_string = True
+            
+            elif char == "{":
+                if self._depth == 0:
+                    # Drop everything before the object (array brackets, commas, prose)
+                    self._buffer = self._buffer[self._scanned:]
+                    self._scanned = 0
+                self._depth += 1
+            
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = self._buffer[:self._scanned + 1]
+                    self._buffer = self._buffer[self._scanned + 1:]
+                    self._scanned = -1
+                    try:
+                        completed.append(json.loads(raw))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Skipping malformed streamed object: {e}")
+            
+            self._scanned += 1
+        
+        if self._depth == 0:
+            self._buffer = ""
+            self._scanned = 0
+        
+        return completed
+
+
 class OllamaService:
     """Service for interacting with Ollama LLM API"""
     
-    def __init__(self):
+    # Part of the generation cache key; bump when _build_prompt changes
+    PROMPT_VERSION = 1
+    
+    def __init__(
+        self,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[GenerationCache] = None
+    ):
+        self.cache = cache
         self.base_url = settings.OLLAMA_API_URL
         self.model = settings.OLLAMA_MODEL
-        self.timeout = 120.0  # 2 minutes timeout
+        self.timeout = settings.OLLAMA_TIMEOUT
+        self.limiter = OllamaLimiter(
+            max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+            max_queue=settings.OLLAMA_MAX_QUEUE,
+            queue_timeout=settings.OLLAMA_QUEUE_TIMEOUT
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled keep-alive client, created on first use and shared by all requests"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.OLLAMA_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OLLAMA_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.OLLAMA_POOL_KEEPALIVE_EXPIRY
+                ),
+                transport=self._transport
+            )
+        return self._client
+    
+    async def close(self) -> None:
+        """Close pooled connections (called on application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _cache_key(self, text: str, num_cards: int, difficulty: str) -> str:
+        return GenerationCache.key(self.model, text, num_cards, difficulty, self.PROMPT_VERSION)
+    
+    async def _cached(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """Cached generation for `key` (a broken cache is treated as a miss)"""
+        if self.cache is None:
+            return None
+        try:
+            return await asyncio.to_thread(self.cache.get, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Generation cache lookup failed: {e}")
+            return None
+    
+    async def _remember(self, key: str, cards: List[Dict[str, str]]) -> None:
+        """Store a successful generation in the cache"""
+        if self.cache is None or not cards:
+            return
+        try:
+            await asyncio.to_thread(self.cache.put, key, cards)
+        except sqlite3.Error as e:
+            logger.warning(f"Generation cache store failed: {e}")
     
     async def generate_flashcards(
         self,
@@ -35,13 +246,21 @@ class OllamaService:
         
         Returns:
             List of {question, answer} dictionaries
+        
+        Raises:
+            OllamaBusyError: If no generation slot frees up in time
         """
+        cache_key = self._cache_key(text, num_cards, difficulty)
+        cached = await self._cached(cache_key)
+        if cached is not None:
+            return cached
+        
         prompt = self._build_prompt(text, num_cards, difficulty)
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
+        async with self.limiter.slot():
+            try:
+                response = await self.client.post(
+                    "/api/generate",
                     json={
                         "model": self.model,
                         "prompt": prompt,
@@ -53,15 +272,88 @@ class OllamaService:
                 result = response.json()
                 
                 # Parse the response
-                flashcards = self._parse_response(result.get("response", ""))
-                return flashcards[:num_cards]
+                flashcards = self._parse_response(result.get("response", ""))[:num_cards]
+                await self._remember(cache_key, flashcards)
+                return flashcards
+            
+            except httpx.HTTPError as e:
+                logger.error(f"Ollama API error: {e}")
+                return []
+            except Exception as e:
+                logger.error(f"Error generating flashcards: {e}")
+                return []
+    
+    async def stream_flashcards(
+        self,
+        text: str,
+        num_cards: int = 5,
+        difficulty: str = "medium"
+    ) -> AsyncIterator[Dict[str, str]]:
+        """
+        Generate flashcards with Ollama's token stream, yielding each card
+        as soon as its JSON object is complete.
         
-        except httpx.HTTPError as e:
-            logger.error(f"Ollama API error: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Error generating flashcards: {e}")
-            return []
+        Cards yielded before an error or timeout are kept by the caller.
+        
+        Raises:
+            OllamaBusyError: If no generation slot frees up in time
+            OllamaStreamError: If the request or the stream fails
+        """
+        cache_key = self._cache_key(text, num_cards, difficulty)
+        cached = await self._cached(cache_key)
+        if cached is not None:
+            for card in cached:
+                yield card
+            return
+        
+        prompt = self._build_prompt(text, num_cards, difficulty)
+        parser = FlashcardStreamParser()
+        cards: List[Dict[str, str]] = []
+        completed = False
+        
+        async with self.limiter.slot():
+            try:
+                async with self.client.stream(
+                    "POST",
+                    "/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "stream": True,
+                        "temperature": 0.7,
+                    }
+                ) as response:
+                    response.raise_for_status()
+                    
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        
+                        for obj in parser.feed(chunk.get("response", "")):
+                            card = self._clean_card(obj)
+                            if card is None:
+                                continue
+                            yield card
+                            cards.append(card)
+                            if len(cards) >= num_cards:
+                                break
+                        
+                        if chunk.get("done") or len(cards) >= num_cards:
+                            completed = True
+                            break
+                
+                # Only complete generations are cached; a stream that ends
+                # without "done" was cut off
+                if completed:
+                    await self._remember(cache_key, cards)
+            
+            except httpx.HTTPError as e:
+                logger.error(f"Ollama API error after {len(cards)} streamed cards: {e}")
+                raise OllamaStreamError(f"Ollama request failed: {e or type(e).__name__}") from e
+            except json.JSONDecodeError as e:
+                logger.error(f"Malformed Ollama stream after {len(cards)} cards: {e}")
+                raise OllamaStreamError("Ollama returned a malformed stream") from e
     
     def _build_prompt(self, text: str, num_cards: int, difficulty: str) -> str:
         """Build prompt for flashcard generation"""
@@ -107,11 +399,9 @@ Flashcards:"""
                 # Validate and clean flashcards
                 validated = []
                 for card in flashcards:
-                    if isinstance(card, dict) and "question" in card and "answer" in card:
-                        validated.append({
-                            "question": str(card["question"]).strip(),
-                            "answer": str(card["answer"]).strip()
-                        })
+                    cleaned = self._clean_card(card)
+                    if cleaned is not None:
+                        validated.append(cleaned)
                 
                 return validated
         
@@ -120,14 +410,21 @@ Flashcards:"""
         
         return []
     
+    @staticmethod
+    def _clean_card(card) -> Optional[Dict[str, str]]:
+        """Validate a parsed flashcard object and normalize its fields"""
+        if isinstance(card, dict) and "question" in card and "answer" in card:
+            return {
+                "question": str(card["question"]).strip(),
+                "answer": str(card["answer"]).strip()
+            }
+        return None
+    
     async def check_health(self) -> bool:
         """Check if Ollama service is available"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/api/tags",
-                )
-                return response.status_code == 200
+            response = await self.client.get("/api/tags", timeout=5.0)
+            return response.status_code == 200
         except Exception as e:
             logger.error(f"Ollama health check failed: {e}")
             return False
@@ -136,6 +433,8 @@ Flashcards:"""
 class VectorEmbeddingService:
     """Service for generating vector embeddings for semantic search"""
     
+    HASH_BITS = 128  # md5
+    
     @staticmethod
     def simple_embedding(text: str, dimension: int = 384) -> List[float]:
         """
@@ -149,19 +448,61 @@ class VectorEmbeddingService:
         Returns:
             List of floats representing the embedding
         """
+        return VectorEmbeddingService.batch_embed([text], dimension)[0].tolist()
+    
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _shift_mod_table(dimension: int) -> np.ndarray:
+        """
+        Table T with T[j, i] = 2**(j - i) % 1000 for j >= i (else 0), so that
+        for a hash with bits b_j, (hash >> i) % 1000 == (b @ T)[i] % 1000.
+        """
+        bits = VectorEmbeddingService.HASH_BITS
+        table = np.zeros((bits, dimension), dtype=np.float64)
+        for i in range(min(bits, dimension)):
+            table[i:, i] = [pow(2, j - i, 1000) for j in range(i, bits)]
+        return table
+    
+    @staticmethod
+    def batch_embed(texts: List[str], dimension: int = 384) -> np.ndarray:
+        """
+        Hash embeddings for many texts at once, as an (n, dimension) array.
+        
+        Produces exactly the values of the original per-text loop, which
+        emitted hash % 1000 / 1000 and then advanced the hash with
+        hash = (hash >> 1) ^ (hash & 1). Unrolled, step i equals
+        (hash0 >> i) with its low bit flipped by the parity of bits 0..i-1
+        of hash0, so every step is computed from the hash bits in one
+        matrix product instead of 384 big-int operations per text.
+        """
         import hashlib
         
-        # Simple hash-based embedding generation
-        # In production, use proper embedding model
-        hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
+        bits_count = VectorEmbeddingService.HASH_BITS
+        if not texts:
+            return np.empty((0, dimension), dtype=np.float64)
+        
+        digests = np.frombuffer(
+            b"".join(hashlib.md5(text.encode()).digest() for text in texts),
+            dtype=np.uint8
+        ).reshape(len(texts), 16)
+        
+        # Column j holds bit j (weight 2**j) of each hash
+        bits = np.unpackbits(digests, axis=1)[:, ::-1].astype(np.int64)
         
-        embedding = []
-        for i in range(dimension):
-            val = hash_val % 1000 / 1000.0
-            embedding.append(val)
-            hash_val = (hash_val >> 1) ^ (hash_val & 1) if hash_val & 1 else hash_val >> 1
+        # (hash0 >> i) % 1000 for every step i. Sums stay below 128 * 1000,
+        # so the float64 (BLAS) product is exact.
+        table = VectorEmbeddingService._shift_mod_table(dimension)
+        shifted = (bits.astype(np.float64) @ table).astype(np.int64) % 1000
         
-        return embedding
+        # Parity of bits 0..i-1; steps past the last bit keep the full parity
+        prefix_parity = np.zeros((len(texts), bits_count + 1), dtype=np.int64)
+        np.cumsum(bits, axis=1, out=prefix_parity[:, 1:])
+        prefix_parity &= 1
+        steps = np.minimum(np.arange(dimension), bits_count)
+        
+        # 1000 is even, so flipping the low bit commutes with % 1000
+        values = shifted ^ prefix_parity[:, steps]
+        return values / 1000.0
     
     @staticmethod
     def cosine_similarity(embedding1: List[float], embedding2: List[float]) -> float:
@@ -176,3 +517,24 @@ class VectorEmbeddingService:
             return 0.0
         
         return dot_product / (norm1 * norm2)
+    
+    @staticmethod
+    def batch_cosine_similarity(query: Sequence[float], matrix: np.ndarray) -> np.ndarray:
+        """Cosine similarity between one query vector and every row of a matrix"""
+        query = np.asarray(query, dtype=np.float64)
+        matrix = np.asarray(matrix, dtype=np.float64)
+        
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        dots = matrix @ query
+        
+        similarities = np.zeros(len(matrix), dtype=np.float64)
+        nonzero = norms > 0
+        similarities[nonzero] = dots[nonzero] / norms[nonzero]
+        return similarities
+
+
+@lru_cache(maxsize=1)
+def get_ollama_service() -> OllamaService:
+    """The app-wide Ollama service (one connection pool, limiter and result cache)"""
+    cache = GenerationCache() if settings.GENERATION_CACHE_ENABLED else None
+    return OllamaService(cache=cache)
@@ -0,0 +1,52 @@
+"""
+In-memory token-bucket rate limiting.
+
+Each key (a client address, an account email, ...) gets a bucket that
+holds up to `burst` tokens and refills at `rate_per_minute`; a request
+spends one token or is refused with the time until the next one. Buckets
+live in this process only and the least recently used are dropped beyond
+`max_keys`, which is enough to shape bursts such as a login storm.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+
+class RateLimiter:
+    """Per-key token buckets"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 100000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def acquire(self, key: str) -> float:
+        """Spend a token for `key`; returns 0, or the seconds to wait if none is left"""
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+                self.limited += 1
+
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def stats(self) -> Dict:
+        return {"tracked_keys": len(self._buckets), "limited": self.limited}
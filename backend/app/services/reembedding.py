@@ -0,0 +1,256 @@
+"""
+Resumable background re-embedding of stored flashcards.
+
+When the embedding provider, model or dimension changes, every stored
+embedding whose `embedding_model` differs from the current provider is
+stale. A re-embedding job walks those cards in primary-key order (keyset
+pagination), embeds each chunk in one batch, bulk-updates the rows and
+commits its cursor with them, so a stopped or crashed job resumes exactly
+where it left off.
+"""
+
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+from app.db import SessionLocal, FlashcardDB, EmbeddingJobDB
+from app.services.embedding_codec import encode_embedding
+from app.services.embeddings import EmbeddingProvider, card_text, get_embedding_provider
+from app.services.vector_index import vector_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = ("pending", "running", "paused", "failed")
+
+
+def _stale_filter(model_id: str):
+    """Cards whose embedding was not produced by `model_id`"""
+    return or_(FlashcardDB.embedding_model.is_(None), FlashcardDB.embedding_model != model_id)
+
+
+class ReembeddingJob:
+    """Runs (or resumes) a re-embedding job in keyset-paginated chunks"""
+
+    def __init__(
+        self,
+        provider: Optional[EmbeddingProvider] = None,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.provider = provider or get_embedding_provider()
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+
+    @staticmethod
+    def find_unfinished(db: Session, model_id: str) -> Optional[EmbeddingJobDB]:
+        """Latest job for this model that has not completed"""
+        return db.query(EmbeddingJobDB).filter(
+            EmbeddingJobDB.model_id == model_id,
+            EmbeddingJobDB.status.in_(UNFINISHED_STATUSES)
+        ).order_by(EmbeddingJobDB.id.desc()).first()
+
+    def create_or_resume(self, db: Session, chunk_size: int = 500, restart: bool = False) -> EmbeddingJobDB:
+        """Return the unfinished job for the current model, or create one"""
+        model_id = self.provider.model_id
+        job = self.find_unfinished(db, model_id)
+
+        if job is not None and restart:
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+            job = None
+
+        if job is None:
+            total = db.query(func.count(FlashcardDB.id)).filter(_stale_filter(model_id)).scalar() or 0
+            job = EmbeddingJobDB(model_id=model_id, chunk_size=chunk_size, total=total, status="pending")
+            db.add(job)
+
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def stop(self) -> None:
+        """Ask a running job to pause after its current chunk"""
+        self._stop.set()
+
+    def run(self, job_id: int) -> None:
+        """Process chunks until the job completes, fails or is stopped"""
+        self._stop.clear()
+        db = self.session_factory()
+        try:
+            job = db.get(EmbeddingJobDB, job_id)
+            if job is None:
+                raise ValueError(f"Re-embedding job {job_id} not found")
+            if job.model_id != self.provider.model_id:
+                raise ValueError(
+                    f"Job {job_id} targets {job.model_id}, but the provider is {self.provider.model_id}"
+                )
+
+            job.status = "running"
+            job.error = None
+            job.run_started_at = datetime.utcnow()
+            job.run_processed = 0
+            db.commit()
+
+            while not self._stop.is_set():
+                if not self._process_chunk(db, job):
+                    job.status = "completed"
+                    job.finished_at = datetime.utcnow()
+                    db.commit()
+                    logger.info(f"Re-embedding job {job.id} completed ({job.processed} cards)")
+                    # Indexes may now hold vectors from the old model
+                    vector_index.invalidate()
+                    return
+
+            job.status = "paused"
+            db.commit()
+            logger.info(f"Re-embedding job {job.id} paused at card {job.last_flashcard_id}")
+
+        except Exception as e:
+            db.rollback()
+            job = db.get(EmbeddingJobDB, job_id)
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)[:500]
+                db.commit()
+            logger.error(f"Re-embedding job {job_id} failed: {e}")
+            raise
+
+        finally:
+            db.close()
+
+    def _process_chunk(self, db: Session, job: EmbeddingJobDB) -> bool:
+        """Embed and store the next chunk; returns False when nothing is left"""
+        rows = db.query(
+            FlashcardDB.id, FlashcardDB.user_id, FlashcardDB.question, FlashcardDB.answer
+        ).filter(
+            FlashcardDB.id > job.last_flashcard_id,
+            _stale_filter(job.model_id)
+        ).order_by(FlashcardDB.id).limit(job.chunk_size).all()
+
+        if not rows:
+            return False
+
+        vectors = self.provider.embed_batch([card_text(q, a) for _, _, q, a in rows])
+
+        # ORM bulk UPDATE by primary key (executemany)
+        db.execute(update(FlashcardDB), [
+            {"id": card_id, "embedding": encode_embedding(vector), "embedding_model": job.model_id}
+            for (card_id, _, _, _), vector in zip(rows, vectors)
+        ])
+
+        # Progress is committed with the data, so a restart never redoes or skips a chunk
+        job.last_flashcard_id = rows[-1][0]
+        job.processed += len(rows)
+        job.run_processed += len(rows)
+        db.commit()
+
+        for user_id in {user_id for _, user_id, _, _ in rows}:
+            vector_index.invalidate(user_id)
+
+        return True
+
+    @staticmethod
+    def progress(job: EmbeddingJobDB) -> Dict:
+        """Progress and throughput summary for a job"""
+        throughput = 0.0
+        if job.run_started_at and job.updated_at and job.run_processed:
+            elapsed = (job.updated_at - job.run_started_at).total_seconds()
+            if elapsed > 0:
+                throughput = job.run_processed / elapsed
+
+        remaining = max(0, (job.total or 0) - (job.processed or 0))
+        return {
+            "id": job.id,
+            "model_id": job.model_id,
+            "status": job.status,
+            "processed": job.processed,
+            "total": job.total,
+            "percent": round(100.0 * job.processed / job.total, 1) if job.total else 100.0,
+            "last_flashcard_id": job.last_flashcard_id,
+            "cards_per_second": round(throughput, 1),
+            "eta_seconds": round(remaining / throughput) if throughput and job.status == "running" else None,
+            "error": job.error,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at,
+            "finished_at": job.finished_at
+        }
+
+
+class ReembeddingRunner:
+    """Runs at most one re-embedding job at a time on a background thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._job: Optional[ReembeddingJob] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, chunk_size: int = 500, restart: bool = False) -> int:
+        """Start or resume the job for the current model; returns its id"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A re-embedding job is already running")
+
+            job = ReembeddingJob()
+            db = SessionLocal()
+            try:
+                job_id = job.create_or_resume(db, chunk_size=chunk_size, restart=restart).id
+            finally:
+                db.close()
+
+            self._job = job
+            self._thread = threading.Thread(
+                target=self._run_quietly, args=(job, job_id), name="reembedding", daemon=True
+            )
+            self._thread.start()
+            return job_id
+
+    @staticmethod
+    def _run_quietly(job: ReembeddingJob, job_id: int) -> None:
+        try:
+            job.run(job_id)
+        except Exception:
+            pass  # Already logged and recorded on the job row
+
+    def stop(self) -> None:
+        """Pause the running job after its current chunk"""
+        if self._job is not None:
+            self._job.stop()
+
+
+reembedding_runner = ReembeddingRunner()
+
+
+def run_reembedding_cli(chunk_size: int = 500, restart: bool = False) -> None:
+    """Run a re-embedding job in the foreground, logging progress"""
+    job = ReembeddingJob()
+    db = SessionLocal()
+    try:
+        job_id = job.create_or_resume(db, chunk_size=chunk_size, restart=restart).id
+    finally:
+        db.close()
+
+    logger.info(f"Re-embedding job {job_id} targeting {job.provider.model_id}")
+
+    worker = threading.Thread(target=ReembeddingRunner._run_quietly, args=(job, job_id), daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(timeout=5.0)
+            db = SessionLocal()
+            try:
+                progress = ReembeddingJob.progress(db.get(EmbeddingJobDB, job_id))
+            finally:
+                db.close()
+            logger.info(
+                f"{progress['status']}: {progress['processed']}/{progress['total']} cards "
+                f"({progress['percent']}%, {progress['cards_per_second']} cards/s)"
+            )
+    except KeyboardInterrupt:
+        logger.info("Stopping after the current chunk; rerun to resume")
+        job.stop()
+        worker.join()
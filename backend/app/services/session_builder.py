@@ -0,0 +1,255 @@
+"""
+Study session card selection.
+
+SessionBuilder streams due cards from the (user_id, next_review) index and
+keeps only the best `limit` of them in a bounded heap, scored by how
+overdue each card is relative to its interval, by its difficulty score and
+by the preferred difficulty. New cards fill the remaining slots, capped by
+a daily quota (NEW_CARDS_PER_DAY) counted in the daily analytics rollup.
+The chosen cards are then interleaved so that, where the deck allows, the
+same topic never comes up twice in a row. Memory stays O(limit) whatever
+the deck size; time is bounded by SESSION_MAX_CANDIDATES, the number of
+most overdue cards scored, so past that many due cards the selection is an
+approximation (0 scores every due card).
+"""
+
+import heapq
+import math
+from collections import deque
+from datetime import date, datetime
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import FlashcardDB, UserDailyAnalyticsDB
+
+# (card id, topic)
+Candidate = Tuple[int, Optional[str]]
+
+
+def difficulty_tiers(preferred_difficulty: Optional[str]) -> List:
+    """Filters picking new cards in turn: preferred difficulty, then medium, then the rest"""
+    if not preferred_difficulty:
+        return [None]
+
+    tiers = [preferred_difficulty] + (["medium"] if preferred_difficulty != "medium" else [])
+    return [FlashcardDB.difficulty == difficulty for difficulty in tiers] + [
+        FlashcardDB.difficulty.not_in(tiers) | FlashcardDB.difficulty.is_(None)
+    ]
+
+
+class SessionBuilder:
+    """Chooses and orders the cards for a study session"""
+
+    OVERDUE_WEIGHT = 1.0  # Per log(1 + overdue time / interval)
+    DIFFICULTY_WEIGHT = 0.5  # Per point of difficulty_score (0-1)
+    PREFERRED_BONUS = 0.5  # Card matches the requested difficulty
+    STREAM_BATCH = 500  # Due cards fetched per round trip
+
+    def __init__(
+        self,
+        new_cards_per_day: int = settings.NEW_CARDS_PER_DAY,
+        max_candidates: int = settings.SESSION_MAX_CANDIDATES
+    ):
+        self.new_cards_per_day = new_cards_per_day
+        self.max_candidates = max_candidates
+
+    @staticmethod
+    def score(
+        next_review: datetime,
+        interval: Optional[int],
+        difficulty_score: Optional[float],
+        difficulty: Optional[str],
+        now: datetime,
+        preferred_difficulty: Optional[str] = None
+    ) -> float:
+        """Priority of a due card; higher is studied first"""
+        overdue_days = max((now - next_review).total_seconds(), 0.0) / 86400
+        score = SessionBuilder.OVERDUE_WEIGHT * math.log1p(overdue_days / max(interval or 0, 1))
+        score += SessionBuilder.DIFFICULTY_WEIGHT * (0.5 if difficulty_score is None else difficulty_score)
+        if preferred_difficulty and difficulty == preferred_difficulty:
+            score += SessionBuilder.PREFERRED_BONUS
+        return score
+
+    def new_cards_remaining(
+        self,
+        db: Session,
+        user_id: int,
+        today: Optional[date] = None,
+        reserved: int = 0
+    ) -> int:
+        """New cards the user may still start today, less `reserved` ones already handed out"""
+        today = today or datetime.utcnow().date()
+        row = db.get(UserDailyAnalyticsDB, {"user_id": user_id, "date": today})
+        studied = (row.new_cards or 0) if row else 0
+        return max(self.new_cards_per_day - studied - reserved, 0)
+
+    def top_due(
+        self,
+        db: Session,
+        user_id: int,
+        limit: int,
+        topic: Optional[str] = None,
+        preferred_difficulty: Optional[str] = None,
+        now: Optional[datetime] = None,
+        exclude: Optional[Select] = None
+    ) -> List[Candidate]:
+        """
+        The `limit` highest-scoring due cards, best first (skipping ids selected by `exclude`).
+
+        Only the `max_candidates` most overdue cards are scored (all of them
+        when it is 0): a less overdue card that would score higher, say a
+        difficult one on a short interval, waits until the cards ahead of it
+        are reviewed.
+        """
+        if limit <= 0:
+            return []
+        now = now or datetime.utcnow()
+
+        query = select(
+            FlashcardDB.id,
+            FlashcardDB.topic,
+            FlashcardDB.difficulty,
+            FlashcardDB.difficulty_score,
+            FlashcardDB.interval,
+            FlashcardDB.next_review
+        ).where(
+            FlashcardDB.user_id == user_id,
+            FlashcardDB.next_review <= now
+        )
+        if topic:
+            query = query.where(FlashcardDB.topic == topic)
+        if exclude is not None:
+            query = query.where(FlashcardDB.id.not_in(exclude))
+
+        # Most overdue (in absolute terms) first, so a capped scan still sees
+        # the cards most likely to win
+        query = query.order_by(FlashcardDB.next_review)
+        if self.max_candidates:
+            query = query.limit(self.max_candidates)
+
+        heap: List[Tuple[float, int, Optional[str]]] = []
+        rows = db.execute(query.execution_options(yield_per=self.STREAM_BATCH))
+        for card_id, card_topic, difficulty, difficulty_score, interval, next_review in rows:
+            entry = (
+                SessionBuilder.score(next_review, interval, difficulty_score, difficulty, now, preferred_difficulty),
+                -card_id,  # Ties go to the older card
+                card_topic
+            )
+            if len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        return [(-negative_id, card_topic) for _, negative_id, card_topic in sorted(heap, reverse=True)]
+
+    @staticmethod
+    def new_cards(
+        db: Session,
+        user_id: int,
+        limit: int,
+        topic: Optional[str] = None,
+        preferred_difficulty: Optional[str] = None,
+        exclude: Optional[Select] = None
+    ) -> List[Candidate]:
+        """
+        Up to `limit` never-reviewed cards, oldest first (preferred difficulty
+        before others).
+
+        One query per difficulty tier rather than a CASE sort key, so each is
+        an ordered walk of the (user_id, next_review) index that stops at its
+        LIMIT instead of sorting every new card.
+        """
+        query = select(FlashcardDB.id, FlashcardDB.topic).where(
+            FlashcardDB.user_id == user_id,
+            FlashcardDB.next_review.is_(None)
+        )
+        if topic:
+            query = query.where(FlashcardDB.topic == topic)
+        if exclude is not None:
+            query = query.where(FlashcardDB.id.not_in(exclude))
+
+        cards: List[Candidate] = []
+        for tier in difficulty_tiers(preferred_difficulty):
+            if len(cards) >= limit:
+                break
+            tier_query = query if tier is None else query.where(tier)
+            cards += [tuple(row) for row in db.execute(tier_query.order_by(FlashcardDB.id).limit(limit - len(cards)))]
+        return cards
+
+    @staticmethod
+    def interleave(candidates: Sequence[Candidate]) -> List[int]:
+        """
+        Card ids in the given (priority) order, except that the next card
+        never shares the previous card's topic while another topic still has
+        cards.
+        """
+        queues = {}
+        for rank, (card_id, topic) in enumerate(candidates):
+            queues.setdefault(topic, deque()).append((rank, card_id))
+
+        # Heap of (rank of the topic's best remaining card, tiebreak, topic)
+        heads = [(queue[0][0], index, topic) for index, (topic, queue) in enumerate(queues.items())]
+        heapq.heapify(heads)
+
+        ordered = []
+        held = None  # The topic just studied sits out one turn
+        while heads:
+            _, index, topic = heapq.heappop(heads)
+            queue = queues[topic]
+            ordered.append(queue.popleft()[1])
+
+            if held is not None:
+                heapq.heappush(heads, held)
+                held = None
+            if queue:
+                held = (queue[0][0], index, topic)
+                if not heads:
+                    heapq.heappush(heads, held)
+                    held = None
+
+        return ordered
+
+    def plan(
+        self,
+        db: Session,
+        user_id: int,
+        topic: Optional[str] = None,
+        limit: int = 10,
+        preferred_difficulty: Optional[str] = None,
+        now: Optional[datetime] = None,
+        exclude: Optional[Select] = None,
+        reserved_new: int = 0
+    ) -> List[int]:
+        """
+        Ids of the cards for the next stretch of a session, in study order.
+
+        `exclude` selects card ids to leave out (e.g. already queued) and
+        `reserved_new` counts new cards handed out but not yet answered.
+        """
+        now = now or datetime.utcnow()
+
+        due = self.top_due(db, user_id, limit, topic, preferred_difficulty, now, exclude)
+
+        new_slots = min(limit - len(due), self.new_cards_remaining(db, user_id, now.date(), reserved_new))
+        new = SessionBuilder.new_cards(db, user_id, new_slots, topic, preferred_difficulty, exclude)
+
+        # Due cards keep precedence over new ones
+        return SessionBuilder.interleave(due + new)
+
+    def build(
+        self,
+        db: Session,
+        user_id: int,
+        topic: Optional[str] = None,
+        limit: int = 10,
+        preferred_difficulty: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> List[FlashcardDB]:
+        """Cards for the next stretch of a session, in study order"""
+        order = self.plan(db, user_id, topic, limit, preferred_difficulty, now)
+        if not order:
+            return []
+
+        cards = {card.id: card for card in db.scalars(select(FlashcardDB).where(FlashcardDB.id.in_(order)))}
+        return [cards[card_id] for card_id in order if card_id in cards]
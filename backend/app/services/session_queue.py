@@ -0,0 +1,142 @@
+"""
+Server-side card queue for study sessions.
+
+A session's queue is materialized when it starts (`target_count` cards
+chosen by SessionBuilder) and stored in study_session_queue by position.
+Clients consume it through the session's cursor: handing out the next
+cards is a compare-and-swap on the cursor plus a primary-key range read,
+so consecutive (or concurrent) fetches never overlap. When fewer than
+SESSION_QUEUE_LOW_WATER cards remain, a background task appends another
+`target_count`, skipping every card the session has already queued.
+"""
+
+import logging
+from typing import List, Set
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.config import settings
+from app.db import AsyncSessionLocal, FlashcardDB, StudySessionDB, StudySessionQueueDB
+from app.services.session_builder import SessionBuilder
+
+logger = logging.getLogger(__name__)
+
+# Sessions with a refill in flight in this process
+_refilling: Set[int] = set()
+
+
+class SessionQueue:
+    """Materialize, consume and top up per-session card queues"""
+
+    @staticmethod
+    def _plan(db: Session, session: StudySessionDB, count: int) -> List[int]:
+        queued = select(StudySessionQueueDB.flashcard_id).where(StudySessionQueueDB.session_id == session.id)
+
+        # Queued cards that are still new already use up part of today's quota
+        # (once answered they are counted in the daily rollup instead)
+        reserved_new = db.scalar(
+            select(func.count()).select_from(StudySessionQueueDB).join(
+                FlashcardDB, FlashcardDB.id == StudySessionQueueDB.flashcard_id
+            ).where(
+                StudySessionQueueDB.session_id == session.id,
+                FlashcardDB.next_review.is_(None)
+            )
+        )
+
+        return SessionBuilder().plan(
+            db,
+            session.user_id,
+            topic=session.topic,
+            limit=count,
+            preferred_difficulty=session.preferred_difficulty,
+            exclude=queued,
+            reserved_new=reserved_new
+        )
+
+    @staticmethod
+    async def fill(db: AsyncSession, session: StudySessionDB, count: int) -> int:
+        """
+        Append up to `count` cards to the queue; returns how many (the caller
+        commits). A concurrent fill of the same session fails the commit
+        with IntegrityError, since both claim the same positions.
+        """
+        card_ids = await db.run_sync(SessionQueue._plan, session, count)
+        if not card_ids:
+            return 0
+
+        start = session.queue_length or 0
+        await db.execute(insert(StudySessionQueueDB), [
+            {"session_id": session.id, "position": start + offset, "flashcard_id": card_id}
+            for offset, card_id in enumerate(card_ids)
+        ])
+        session.queue_length = start + len(card_ids)
+        return len(card_ids)
+
+    @staticmethod
+    async def pop(db: AsyncSession, session: StudySessionDB, limit: int) -> List[FlashcardDB]:
+        """Hand out the next `limit` queued cards and advance the cursor (committed at once)"""
+        while True:
+            start = session.queue_cursor or 0
+            end = min(start + limit, session.queue_length or 0)
+            if end <= start:
+                return []
+
+            # Only the request that moves the cursor from `start` gets these cards
+            claimed = await db.execute(update(StudySessionDB).where(
+                StudySessionDB.id == session.id,
+                StudySessionDB.queue_cursor == start
+            ).values(queue_cursor=end).execution_options(synchronize_session=False))
+            await db.commit()
+
+            if claimed.rowcount:
+                set_committed_value(session, "queue_cursor", end)
+                break
+
+            await db.refresh(session)
+
+        # Cards deleted since they were queued simply drop out
+        cards = await db.scalars(select(FlashcardDB).join(
+            StudySessionQueueDB, StudySessionQueueDB.flashcard_id == FlashcardDB.id
+        ).where(
+            StudySessionQueueDB.session_id == session.id,
+            StudySessionQueueDB.position >= start,
+            StudySessionQueueDB.position < end
+        ).order_by(StudySessionQueueDB.position))
+        return list(cards)
+
+    @staticmethod
+    def runs_low(session: StudySessionDB) -> bool:
+        return session.status != "completed" and session.queue_remaining < settings.SESSION_QUEUE_LOW_WATER
+
+    @staticmethod
+    async def refill(session_id: int) -> None:
+        """Top up a session's queue (run as a background task after a fetch)"""
+        if session_id in _refilling:
+            return
+        _refilling.add(session_id)
+
+        try:
+            async with AsyncSessionLocal() as db:
+                session = await db.get(StudySessionDB, session_id)
+                if session is None or not SessionQueue.runs_low(session):
+                    return
+
+                added = await SessionQueue.fill(db, session, session.target_count or settings.SESSION_QUEUE_LOW_WATER)
+                await db.commit()
+                logger.debug(f"Queued {added} more cards for study session {session_id}")
+
+        except IntegrityError:
+            # Another process topped the queue up at the same time
+            pass
+
+        finally:
+            _refilling.discard(session_id)
+
+    @staticmethod
+    async def clear(db: AsyncSession, session: StudySessionDB) -> None:
+        """Drop a finished session's queue (the caller commits)"""
+        await db.execute(delete(StudySessionQueueDB).where(StudySessionQueueDB.session_id == session.id))
+        # Nothing is left to hand out
+        session.queue_length = session.queue_cursor
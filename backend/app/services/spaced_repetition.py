@@ -27,7 +27,8 @@ class SpacedRepetitionScheduler:
         quality: int,  # 0-5, where 5 is perfect recall
         review_count: int,
         easiness_factor: float = 2.5,
-        interval: int = 0
+        interval: int = 0,
+        now: Optional[datetime] = None
     ) -> Tuple[datetime, float, int]:
         """
         Calculate next review date and update parameters.
@@ -37,6 +38,8 @@ class SpacedRepetitionScheduler:
             review_count: Number of times reviewed
             easiness_factor: Current easiness factor
             interval: Current interval in days
+            now: Time of the review (default: current time; synced
+                offline answers pass their own timestamp)
             
         Returns:
             Tuple of (next_review_date, new_easiness_factor, new_interval)
@@ -64,10 +67,44 @@ class SpacedRepetitionScheduler:
         # Add some randomization to avoid clustering
         randomized_interval = int(new_interval * (0.9 + 0.2 * (quality / 5)))
         
-        next_review = datetime.utcnow() + timedelta(days=randomized_interval)
+        next_review = (now or datetime.utcnow()) + timedelta(days=randomized_interval)
         
         return next_review, new_easiness, randomized_interval
     
+    @staticmethod
+    def apply_review(
+        flashcard,
+        is_correct: bool,
+        response_time_seconds: int,
+        reviewed_at: Optional[datetime] = None
+    ) -> None:
+        """Update a card's SM-2 state and difficulty score for one answer"""
+        reviewed_at = reviewed_at or datetime.utcnow()
+        quality = 5 if is_correct else 1  # 0-5 scale
+        
+        next_review, easiness, interval = SpacedRepetitionScheduler.calculate_next_review(
+            quality=quality,
+            review_count=flashcard.review_count,
+            easiness_factor=flashcard.easiness,
+            interval=flashcard.interval,
+            now=reviewed_at
+        )
+        
+        flashcard.last_reviewed = reviewed_at
+        flashcard.review_count += 1
+        flashcard.next_review = next_review
+        flashcard.easiness = easiness
+        flashcard.interval = interval
+        
+        # Update difficulty score based on performance
+        avg_response = response_time_seconds
+        flashcard.difficulty_score = SpacedRepetitionScheduler.update_difficulty_score(
+            flashcard.difficulty_score,
+            is_correct,
+            response_time_seconds,
+            avg_response
+        )
+    
     @staticmethod
     def get_difficulty_level(difficulty_score: float) -> str:
         """Get difficulty level from score"""
@@ -114,15 +151,15 @@ class SpacedRepetitionScheduler:
         """
         now = datetime.utcnow()
         
-        # Cards due for review (last_reviewed is None or past next_review)
+        # Cards due for review (next_review reached); new cards have no next_review yet
         due_cards = []
         new_cards = []
         review_cards = []
         
         for card in user_cards:
-            if card.last_reviewed is None:
+            if card.next_review is None:
                 new_cards.append(card)
-            elif card.last_reviewed < now:
+            elif card.next_review <= now:
                 due_cards.append(card)
             else:
                 review_cards.append(card)
@@ -0,0 +1,266 @@
+"""
+Offline study sync.
+
+A client downloads a snapshot of its due deck together with a watermark,
+studies without a connection while logging attempts locally, and later
+uploads the log. Each logged attempt carries a client-generated UUID, so
+an upload can be retried safely: attempts the server already has are
+ignored. New attempts are replayed through SM-2 in the order they were
+answered. If an attempt is older than a card's last server-side review
+(for example, the same card was studied on another device meanwhile),
+that card's schedule is recomputed from its full attempt history.
+Passing the watermark back returns only cards changed since then, plus
+the ids of cards that were deleted.
+"""
+
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Sequence
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import FlashcardDB, FlashcardTombstoneDB, QuizAttemptDB, StudySessionDB
+from app.services.analytics import AnalyticsRollup
+from app.services.batch_scheduler import BatchScheduler, ScheduleReplay, ScheduleState
+
+# Changes committed while a snapshot is being read may carry a slightly
+# older updated_at; handing out an earlier watermark re-sends them instead
+# of missing them
+WATERMARK_MARGIN = timedelta(seconds=5)
+
+SNAPSHOT_FIELDS = (
+    "id", "question", "answer", "topic", "difficulty",
+    "next_review", "easiness", "interval", "review_count", "difficulty_score"
+)
+
+
+class InvalidWatermarkError(ValueError):
+    """A watermark that this server did not issue"""
+
+
+def encode_watermark(moment: datetime) -> str:
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode().rstrip("=")
+
+
+def decode_watermark(watermark: str) -> datetime:
+    try:
+        padded = watermark + "=" * (-len(watermark) % 4)
+        return datetime.fromisoformat(base64.urlsafe_b64decode(padded).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidWatermarkError("Invalid watermark")
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    """Client timestamps may carry an offset; the database stores naive UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _snapshot_card(card) -> Dict:
+    return {field: getattr(card, field) for field in SNAPSHOT_FIELDS}
+
+
+class StudySync:
+    """Snapshot download and attempt-log upload for offline study"""
+
+    @staticmethod
+    def snapshot(
+        db: Session,
+        user_id: int,
+        since: Optional[str] = None,
+        topic: Optional[str] = None,
+        horizon_days: int = settings.SYNC_HORIZON_DAYS,
+        limit: int = settings.SYNC_SNAPSHOT_MAX_CARDS
+    ) -> Dict:
+        """
+        Cards to study offline and a watermark for the next sync.
+
+        Without `since`, returns cards due within `horizon_days` (soonest
+        first) and then new cards, up to `limit`. With `since`, returns every
+        card changed after that watermark plus the ids of deleted cards.
+        """
+        watermark = encode_watermark(datetime.utcnow() - WATERMARK_MARGIN)
+        columns = [getattr(FlashcardDB, field) for field in SNAPSHOT_FIELDS]
+
+        query = db.query(*columns).filter(FlashcardDB.user_id == user_id)
+        if topic:
+            query = query.filter(FlashcardDB.topic == topic)
+
+        if since:
+            changed_after = decode_watermark(since)
+            cards = query.filter(FlashcardDB.updated_at >= changed_after).order_by(FlashcardDB.id).all()
+            deleted_ids = [
+                flashcard_id for (flashcard_id,) in db.query(FlashcardTombstoneDB.flashcard_id).filter(
+                    FlashcardTombstoneDB.user_id == user_id,
+                    FlashcardTombstoneDB.deleted_at >= changed_after
+                )
+            ]
+            return {
+                "watermark": watermark,
+                "full": False,
+                "cards": [_snapshot_card(card) for card in cards],
+                "deleted_ids": deleted_ids
+            }
+
+        due = query.filter(
+            FlashcardDB.next_review <= datetime.utcnow() + timedelta(days=horizon_days)
+        ).order_by(FlashcardDB.next_review).limit(limit).all()
+
+        remaining = limit - len(due)
+        new = []
+        if remaining > 0:
+            new = query.filter(FlashcardDB.next_review.is_(None)).order_by(FlashcardDB.id).limit(remaining).all()
+
+        return {
+            "watermark": watermark,
+            "full": True,
+            "cards": [_snapshot_card(card) for card in due + new],
+            "deleted_ids": []
+        }
+
+    @staticmethod
+    def upload(
+        db: Session,
+        user_id: int,
+        attempts: Sequence,
+        session: Optional[StudySessionDB] = None
+    ) -> Dict:
+        """
+        Merge an uploaded attempt log; the caller commits.
+
+        `attempts` are objects with client_attempt_id, flashcard_id,
+        is_correct, response_time_seconds and answered_at. Attempts already
+        recorded are skipped, as are those for cards that no longer exist.
+        New ones go into `session`, or into a new completed session spanning
+        them.
+        """
+        now = datetime.utcnow()
+
+        # Idempotency: drop attempts this server (or this upload) has already seen
+        client_ids = [str(attempt.client_attempt_id) for attempt in attempts]
+        known = {
+            client_id for (client_id,) in db.query(QuizAttemptDB.client_attempt_id).filter(
+                QuizAttemptDB.client_attempt_id.in_(client_ids)
+            )
+        }
+
+        fresh = []
+        for attempt in attempts:
+            client_id = str(attempt.client_attempt_id)
+            if client_id in known:
+                continue
+            known.add(client_id)
+            # Clamp clock skew: nothing can have been answered in the future
+            fresh.append((min(_naive_utc(attempt.answered_at), now), client_id, attempt))
+
+        fresh.sort(key=lambda entry: entry[0])
+        duplicates = len(attempts) - len(fresh)
+
+        card_ids = {attempt.flashcard_id for _, _, attempt in fresh}
+        flashcards = {
+            card.id: card
+            for card in db.query(FlashcardDB).filter(
+                FlashcardDB.id.in_(card_ids),
+                FlashcardDB.user_id == user_id
+            )
+        } if card_ids else {}
+
+        rejected = [
+            {"client_attempt_id": client_id, "error": "Flashcard not found"}
+            for _, client_id, attempt in fresh
+            if attempt.flashcard_id not in flashcards
+        ]
+        fresh = [entry for entry in fresh if entry[2].flashcard_id in flashcards]
+
+        if not fresh:
+            return {
+                "session_id": session.id if session else None,
+                "applied": 0,
+                "duplicates": duplicates,
+                "rejected": rejected,
+                "cards": []
+            }
+
+        new_session = session is None
+        if new_session:
+            started, finished = fresh[0][0], fresh[-1][0]
+            session = StudySessionDB(
+                user_id=user_id,
+                status="completed",
+                created_at=started,
+                completed_at=finished,
+                duration_minutes=round((finished - started).total_seconds() / 60, 2)
+            )
+            db.add(session)
+            db.flush()
+
+        for answered_at, client_id, attempt in fresh:
+            flashcard = flashcards[attempt.flashcard_id]
+            db.add(QuizAttemptDB(
+                study_session_id=session.id,
+                flashcard_id=flashcard.id,
+                is_correct=attempt.is_correct,
+                response_time_seconds=attempt.response_time_seconds,
+                created_at=answered_at,
+                client_attempt_id=client_id
+            ))
+
+            session.cards_studied += 1
+            if attempt.is_correct:
+                session.cards_correct += 1
+
+        # Attempts are oldest first, so a card's first new attempt tells
+        # whether it is out of order with reviews the server already has
+        replay = set()
+        for answered_at, _, attempt in fresh:
+            flashcard = flashcards[attempt.flashcard_id]
+            if flashcard.last_reviewed is not None and answered_at < flashcard.last_reviewed:
+                replay.add(flashcard.id)
+
+        in_order = [entry for entry in fresh if entry[2].flashcard_id not in replay]
+
+        # Cards never reviewed before start on the day of their first attempt
+        first_reviews = {}
+        for answered_at, _, attempt in in_order:
+            if not flashcards[attempt.flashcard_id].review_count:
+                first_reviews.setdefault(attempt.flashcard_id, answered_at)
+
+        if in_order:
+            cards = list({attempt.flashcard_id: flashcards[attempt.flashcard_id] for _, _, attempt in in_order}.values())
+            position = {card.id: index for index, card in enumerate(cards)}
+            state = ScheduleState.from_cards(cards)
+            BatchScheduler.apply(
+                state,
+                [position[attempt.flashcard_id] for _, _, attempt in in_order],
+                [attempt.is_correct for _, _, attempt in in_order],
+                [attempt.response_time_seconds for _, _, attempt in in_order],
+                [answered_at for answered_at, _, _ in in_order]
+            )
+            state.write_to(cards)
+
+        if replay:
+            db.flush()
+            StudySync.replay_cards(db, [flashcards[card_id] for card_id in sorted(replay)])
+
+        AnalyticsRollup.record_attempts(db, user_id, [
+            (flashcards[attempt.flashcard_id].topic, attempt.is_correct, answered_at)
+            for answered_at, _, attempt in fresh
+        ])
+        AnalyticsRollup.record_new_cards_studied(db, user_id, first_reviews.values())
+        if new_session:
+            AnalyticsRollup.record_session_completed(db, session)
+
+        touched = {attempt.flashcard_id for _, _, attempt in fresh}
+        return {
+            "session_id": session.id,
+            "applied": len(fresh),
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "cards": [_snapshot_card(flashcards[card_id]) for card_id in sorted(touched)]
+        }
+
+    @staticmethod
+    def replay_cards(db: Session, flashcards: Sequence[FlashcardDB]) -> None:
+        """Recompute the cards' SM-2 state from all of their attempts, oldest first"""
+        state = ScheduleReplay.replay(db, [flashcard.id for flashcard in flashcards])
+        state.write_to(flashcards)
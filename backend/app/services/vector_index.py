@@ -0,0 +1,295 @@
+"""
+In-process vector index for semantic search over flashcard embeddings.
+
+Each user gets an exact index: a row-normalized float32 matrix searched with
+a single matrix-vector product. Large decks can optionally use an IVF
+(inverted file) approximation that clusters the vectors with k-means and
+only scores the clusters closest to the query.
+
+Indexes are loaded lazily from the database on first search, from the
+embeddings of the configured provider's model only, and kept up to date
+incrementally as cards are created, updated and deleted.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import FlashcardDB
+from app.services.embedding_codec import decode_embeddings
+from app.services.embeddings import get_embedding_provider
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so that dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class UserVectorIndex:
+    """Vector index over one user's flashcards"""
+
+    KMEANS_ITERATIONS = 10
+    KMEANS_SAMPLE_SIZE = 20000
+
+    def __init__(
+        self,
+        dimension: int,
+        mode: str = "exact",
+        ivf_min_size: int = 5000,
+        nprobe: int = 8
+    ):
+        self.dimension = dimension
+        self.mode = mode
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+
+        self._lock = threading.RLock()
+        self._size = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, dimension), dtype=np.float32)
+        self._positions: Dict[int, int] = {}
+
+        # IVF state (only used in "ivf" mode once the index is big enough)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the backing arrays geometrically so appends are amortized O(d)"""
+        if capacity <= len(self._ids):
+            return
+        new_capacity = max(capacity, 2 * len(self._ids), 64)
+
+        ids = np.empty(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        matrix = np.empty((new_capacity, self.dimension), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        assignments = np.full(new_capacity, -1, dtype=np.int32)
+        assignments[:self._size] = self._assignments[:self._size]
+
+        self._ids, self._matrix, self._assignments = ids, matrix, assignments
+
+    def bulk_load(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        """Replace the index contents with the given vectors"""
+        with self._lock:
+            self._size = 0
+            self._positions = {}
+            self._centroids = None
+            self._trained_size = 0
+            self._reserve(len(ids))
+
+            if len(ids):
+                self._ids[:len(ids)] = ids
+                self._matrix[:len(ids)] = _normalize(np.asarray(vectors, dtype=np.float32))
+                self._positions = {int(card_id): pos for pos, card_id in enumerate(ids)}
+                self._size = len(ids)
+
+            self._maybe_train()
+
+    def upsert(self, card_id: int, vector: Sequence[float]) -> None:
+        """Insert or replace a card's vector"""
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dimension,):
+            logger.warning(f"Skipping card {card_id}: embedding dimension {vector.shape} != {self.dimension}")
+            return
+        vector = _normalize(vector)
+
+        with self._lock:
+            pos = self._positions.get(card_id)
+            if pos is None:
+                self._reserve(self._size + 1)
+                pos = self._size
+                self._size += 1
+                self._ids[pos] = card_id
+                self._positions[card_id] = pos
+
+            self._matrix[pos] = vector
+            if self._centroids is not None:
+                self._assignments[pos] = int(np.argmax(self._centroids @ vector))
+
+            self._maybe_train()
+
+    def remove(self, card_id: int) -> None:
+        """Remove a card by moving the last row into its slot"""
+        with self._lock:
+            pos = self._positions.pop(card_id, None)
+            if pos is None:
+                return
+
+            last = self._size - 1
+            if pos != last:
+                moved_id = int(self._ids[last])
+                self._ids[pos] = moved_id
+                self._matrix[pos] = self._matrix[last]
+                self._assignments[pos] = self._assignments[last]
+                self._positions[moved_id] = pos
+            self._size = last
+
+    def _maybe_train(self) -> None:
+        """(Re)train IVF centroids when the index has grown enough"""
+        if self.mode != "ivf" or self._size < self.ivf_min_size:
+            self._centroids = None
+            return
+        if self._centroids is not None and self._size < 2 * self._trained_size:
+            return
+
+        matrix = self._matrix[:self._size]
+        nlist = max(1, int(np.sqrt(self._size)))
+
+        rng = np.random.default_rng(0)
+        sample_size = min(self._size, self.KMEANS_SAMPLE_SIZE)
+        sample = matrix[rng.choice(self._size, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        # Spherical k-means: assign by cosine similarity, renormalize means
+        for _ in range(self.KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+
+        self._centroids = centroids
+        self._assignments[:self._size] = np.argmax(matrix @ centroids.T, axis=1)
+        self._trained_size = self._size
+
+    def search(self, query: Sequence[float], k: int = 10) -> List[Tuple[int, float]]:
+        """Return up to k (card_id, cosine similarity) pairs, best first"""
+        query = np.asarray(query, dtype=np.float32)
+        if query.shape != (self.dimension,):
+            return []
+        query = _normalize(query)
+
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return []
+
+            if self._centroids is not None:
+                nprobe = min(self.nprobe, len(self._centroids))
+                probe = np.zeros(len(self._centroids), dtype=bool)
+                probe[np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]] = True
+                candidates = np.flatnonzero(probe[self._assignments[:self._size]])
+            else:
+                candidates = None
+
+            if candidates is None:
+                scores = self._matrix[:self._size] @ query
+                ids = self._ids[:self._size]
+            else:
+                scores = self._matrix[candidates] @ query
+                ids = self._ids[candidates]
+
+            if len(scores) == 0:
+                return []
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+class VectorIndexManager:
+    """Lazily loaded, LRU-bounded registry of per-user vector indexes"""
+
+    def __init__(
+        self,
+        dimension: int = settings.EMBEDDING_DIMENSION,
+        mode: str = settings.VECTOR_INDEX_MODE,
+        ivf_min_size: int = settings.VECTOR_INDEX_IVF_MIN_CARDS,
+        nprobe: int = settings.VECTOR_INDEX_NPROBE,
+        max_users: int = settings.VECTOR_INDEX_MAX_USERS
+    ):
+        self.dimension = dimension
+        self.mode = mode
+        self.ivf_min_size = ivf_min_size
+        self.nprobe = nprobe
+        self.max_users = max_users
+
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[int, UserVectorIndex]" = OrderedDict()
+
+    def _new_index(self) -> UserVectorIndex:
+        return UserVectorIndex(
+            self.dimension,
+            mode=self.mode,
+            ivf_min_size=self.ivf_min_size,
+            nprobe=self.nprobe
+        )
+
+    def _load(self, db: Session, user_id: int) -> UserVectorIndex:
+        """Build a user's index from the embeddings stored in the database"""
+        # Vectors from another model live in a different space even at the
+        # same dimension (e.g. mid re-embed), so they are left out until
+        # re-embedded
+        rows = db.query(FlashcardDB.id, FlashcardDB.embedding).filter(
+            FlashcardDB.user_id == user_id,
+            FlashcardDB.embedding.isnot(None),
+            FlashcardDB.embedding_model == get_embedding_provider().model_id
+        ).all()
+
+        ids, matrix = decode_embeddings(rows, self.dimension)
+
+        index = self._new_index()
+        index.bulk_load(ids, matrix)
+        return index
+
+    def get(self, db: Session, user_id: int) -> UserVectorIndex:
+        """Return a user's index, loading it on first use"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self._load(db, user_id)
+
+        with self._lock:
+            # Another request may have loaded it concurrently; keep the first
+            index = self._indexes.setdefault(user_id, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _loaded(self, user_id: int) -> Optional[UserVectorIndex]:
+        with self._lock:
+            return self._indexes.get(user_id)
+
+    def upsert(self, user_id: int, card_id: int, vector: Sequence[float]) -> None:
+        """Reflect a created or re-embedded card (no-op if the index is not loaded)"""
+        index = self._loaded(user_id)
+        if index is not None:
+            index.upsert(card_id, vector)
+
+    def remove(self, user_id: int, card_id: int) -> None:
+        """Reflect a deleted card (no-op if the index is not loaded)"""
+        index = self._loaded(user_id)
+        if index is not None:
+            index.remove(card_id)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Drop one user's index, or all of them, so they reload on next use"""
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(user_id, None)
+
+    def search(self, db: Session, user_id: int, query: Sequence[float], k: int = 10) -> List[Tuple[int, float]]:
+        """Top-k (card_id, score) pairs for a user's query vector"""
+        return self.get(db, user_id).search(query, k)
+
+
+vector_index = VectorIndexManager()
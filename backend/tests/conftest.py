@@ -0,0 +1,95 @@
+"""
+Shared test fixtures.
+
+The app runs against a shared-cache in-memory SQLite database that the
+sync and async engines both open; tables are recreated for every test
+that uses the `client` or `db` fixture.
+"""
+
+import os
+
+TEST_DATABASE_URL = "sqlite:///file:flashcards_test?mode=memory&cache=shared&uri=true"
+
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["AUTH_CACHE_TTL_SECONDS"] = "0"
+os.environ["LOGIN_IP_BURST"] = "1000"
+os.environ["LOGIN_EMAIL_BURST"] = "1000"
+os.environ["EMBEDDING_PROVIDER"] = "hash"
+os.environ["GENERATION_CACHE_ENABLED"] = "false"
+os.environ["GENERATION_JOB_WORKERS"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool, QueuePool
+import app.db
+from app.db import AsyncSessionLocal, Base, SessionLocal, async_database_url
+from app.main import app as fastapi_app
+from app.services.vector_index import vector_index
+
+# SQLAlchemy gives in-memory databases a per-thread pool that closes the
+# connections of older threads; a plain pool keeps every connection valid
+engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=QueuePool)
+app.db.engine = engine
+SessionLocal.configure(bind=engine)
+
+# Every TestClient runs its own event loop, so async connections must not
+# outlive a session
+AsyncSessionLocal.configure(bind=create_async_engine(async_database_url(TEST_DATABASE_URL), poolclass=NullPool))
+
+# The in-memory database lives as long as one connection to it is open
+_keepalive = engine.connect()
+
+
+@pytest.fixture
+def db():
+    """A sync session on a freshly created, empty database"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    vector_index.invalidate()
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def query_plans(db):
+    """SQLite's plan for every SELECT the sync engine runs while in use, as (statement, plan lines)"""
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            rows = conn.connection.driver_connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append((statement, [row[-1] for row in rows]))
+
+    event.listen(engine, "before_cursor_execute", explain)
+    yield plans
+    event.remove(engine, "before_cursor_execute", explain)
+
+
+@pytest.fixture
+def client(db):
+    """TestClient with the app started (and stopped) around the test"""
+    with TestClient(fastapi_app) as test_client:
+        yield test_client
+
+
+def _login(client: TestClient, name: str) -> dict:
+    email = f"{name}@example.com"
+    client.post("/api/auth/register", json={"email": email, "username": name, "password": "password123"})
+    response = client.post("/api/auth/login", json={"email": email, "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def login(client):
+    """Register and log in a user by name; returns their Authorization header"""
+    return lambda name="alice": _login(client, name)
+
+
+@pytest.fixture
+def auth_headers(login):
+    return login()
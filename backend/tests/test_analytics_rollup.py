@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta
+from app.db import FlashcardDB, StudySessionDB, UserAnalyticsDB, UserDailyAnalyticsDB, UserTopicAnalyticsDB
+from app.db.migrations import upgrade_schema
+from app.services.analytics import AnalyticsEngine, AnalyticsRollup
+
+ROLLUP = (UserAnalyticsDB, UserDailyAnalyticsDB, UserTopicAnalyticsDB)
+DASHBOARD = (
+    "total_cards", "total_sessions", "total_study_minutes", "average_accuracy", "longest_streak",
+    "current_streak", "cards_due_for_review", "topics", "daily_study_minutes", "accuracy_by_topic"
+)
+
+
+def rollup_rows(db, user_id=1):
+    """Every rollup row of a user, without bookkeeping columns"""
+    db.expire_all()
+    return {
+        model.__tablename__: sorted(
+            tuple(
+                getattr(row, column.name) for column in model.__table__.columns
+                if column.name != "last_updated"
+            )
+            for row in db.query(model).filter(model.user_id == user_id)
+        )
+        for model in ROLLUP
+    }
+
+
+def create_card(client, headers, question, topic):
+    response = client.post("/api/flashcards/", json={"question": question, "answer": "a", "topic": topic}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def answer(client, headers, session_id, flashcard_id, is_correct):
+    response = client.post(
+        "/api/study/quiz/answer",
+        params={"session_id": session_id},
+        json={"flashcard_id": flashcard_id, "is_correct": is_correct, "response_time_seconds": 3.0},
+        headers=headers
+    )
+    assert response.status_code == 200
+
+
+def test_incremental_rollup_matches_full_history(client, auth_headers, db):
+    bio = [create_card(client, auth_headers, f"Which organelle is number {i}?", "bio") for i in range(3)]
+    geo = create_card(client, auth_headers, "What is the capital of Peru?", "geo")
+    untitled = create_card(client, auth_headers, "What is seven times six?", "")
+
+    session_id = client.post("/api/study/session/start", headers=auth_headers).json()["id"]
+    for flashcard_id, is_correct in [(bio[0], True), (bio[1], False), (geo, True), (bio[0], False), (untitled, True)]:
+        answer(client, auth_headers, session_id, flashcard_id, is_correct)
+    assert client.post(f"/api/study/session/{session_id}/complete", headers=auth_headers).status_code == 200
+
+    # Moving and deleting cards carries their attempts along
+    assert client.put(f"/api/flashcards/{bio[1]}", json={"topic": "geo"}, headers=auth_headers).status_code == 200
+    assert client.delete(f"/api/flashcards/{bio[0]}", headers=auth_headers).status_code == 200
+
+    dashboard = AnalyticsRollup.dashboard(db, 1)
+    expected = AnalyticsEngine.dashboard(db, 1)
+    expected["cards_due_for_review"] = AnalyticsEngine.cards_due(db, 1)
+    assert {key: dashboard[key] for key in DASHBOARD} == {key: expected[key] for key in DASHBOARD}
+    assert (dashboard["total_cards"], dashboard["topics"]) == (4, ["bio", "geo"])
+
+    incremental = rollup_rows(db)
+    AnalyticsRollup.rebuild_user(db, 1)
+    db.commit()
+    assert rollup_rows(db) == incremental
+
+
+def add_session(db, completed_at, minutes=10.0):
+    session = StudySessionDB(
+        user_id=1, status="completed", duration_minutes=minutes,
+        created_at=completed_at - timedelta(minutes=minutes), completed_at=completed_at
+    )
+    db.add(session)
+    db.flush()
+    AnalyticsRollup.record_session_completed(db, session)
+    db.commit()
+
+
+def streak(db):
+    db.expire_all()
+    row = db.get(UserAnalyticsDB, 1)
+    return row.streak_days, row.streak_sessions, row.longest_streak, row.last_study_date
+
+
+def test_streak_rolls_over_across_days(db):
+    first = datetime(2024, 3, 1, 9)
+
+    add_session(db, first)
+    add_session(db, first + timedelta(hours=5))
+    add_session(db, first + timedelta(days=1))
+    assert streak(db) == (2, 3, 3, date(2024, 3, 2))
+
+    # A missed day starts a new run but keeps the longest one
+    add_session(db, first + timedelta(days=3))
+    assert streak(db) == (1, 1, 3, date(2024, 3, 4))
+
+    assert AnalyticsRollup.dashboard(db, 1, today=date(2024, 3, 4))["current_streak"] == 1
+    assert AnalyticsRollup.dashboard(db, 1, today=date(2024, 3, 5))["current_streak"] == 0
+
+    incremental = rollup_rows(db)
+    AnalyticsRollup.rebuild_user(db, 1)
+    db.commit()
+    assert rollup_rows(db) == incremental
+
+
+def test_history_from_before_the_rollup_is_backfilled_on_upgrade(client, auth_headers, db):
+    db.add_all([FlashcardDB(user_id=1, question=f"q{i}", answer="a", topic="old") for i in range(5)])
+    db.commit()
+    # A database from before the rollup: the user's history but no rollup tables
+    for model in ROLLUP:
+        model.__table__.drop(db.get_bind())
+
+    upgrade_schema(db.get_bind())
+    create_card(client, auth_headers, "What is the capital of Chile?", "new")
+
+    dashboard = client.get("/api/analytics/dashboard", headers=auth_headers).json()
+    assert (dashboard["total_cards"], dashboard["cards_due_for_review"]) == (6, 6)
+    assert dashboard["topics"] == ["new", "old"]
+
+
+def test_creating_a_rollup_row_twice_does_not_conflict(db):
+    AnalyticsRollup._create_row(db, UserAnalyticsDB, {"user_id": 1})
+    AnalyticsRollup._create_row(db, UserAnalyticsDB, {"user_id": 1})
+    AnalyticsRollup.record_cards_created(db, 1, "t", count=2)
+    db.commit()
+
+    assert db.get(UserAnalyticsDB, 1).total_cards == 2
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import pytest
+from passlib.context import CryptContext
+from app.db import UserDB
+from app.db.auth import PasswordHasher, PasswordHasherBusyError
+from app.services import rate_limit
+from app.services.rate_limit import RateLimiter
+
+CREDENTIALS = {"email": "alice@example.com", "password": "password123"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for the rate limiter"""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hasher_rejects_work_beyond_its_queue():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def saturate():
+        running = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(PasswordHasherBusyError):
+                await hasher._run(release.wait)
+        finally:
+            release.set()
+        return await asyncio.gather(*running)
+
+    assert asyncio.run(saturate()) == [True, True]
+    assert hasher.stats() == {"workers": 1, "pending": 0, "max_queue": 1, "completed": 2, "rejected": 1}
+
+
+def test_busy_hasher_answers_503(client, auth_headers, monkeypatch):
+    full = PasswordHasher(workers=1, max_queue=0)
+    full.pending = 1
+    monkeypatch.setattr("app.routes.auth.password_hasher", full)
+
+    response = client.post("/api/auth/login", json=CREDENTIALS)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
+
+
+def test_login_upgrades_an_outdated_hash(client, auth_headers, db):
+    user = db.query(UserDB).one()
+    user.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(CREDENTIALS["password"])
+    db.commit()
+
+    assert client.post("/api/auth/login", json=CREDENTIALS).status_code == 200
+
+    db.expire_all()
+    upgraded = db.query(UserDB).one().hashed_password
+    assert upgraded.startswith("$2b$04$")
+    assert client.post("/api/auth/login", json=CREDENTIALS).status_code == 200
+    db.expire_all()
+    assert db.query(UserDB).one().hashed_password == upgraded
+
+
+def test_token_bucket_allows_a_burst_then_refills(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=2)
+
+    assert [limiter.acquire("a") for _ in range(2)] == [0.0, 0.0]
+    assert limiter.acquire("a") == pytest.approx(1.0)
+    # Other keys have buckets of their own
+    assert limiter.acquire("b") == 0.0
+
+    clock[0] += 0.5
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert limiter.acquire("a") == 0.0
+    assert limiter.stats() == {"tracked_keys": 2, "limited": 2}
+
+
+def test_least_recently_used_buckets_are_dropped(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+
+    # "a" was dropped, so it starts again with a full bucket
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("c") > 0
+
+
+def test_zero_rate_disables_limiting():
+    limiter = RateLimiter(rate_per_minute=0, burst=0)
+
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_login_is_rate_limited_per_email(client, auth_headers, monkeypatch):
+    monkeypatch.setattr("app.routes.auth.email_login_limiter", RateLimiter(rate_per_minute=6, burst=1))
+
+    assert client.post("/api/auth/login", json=CREDENTIALS).status_code == 200
+    response = client.post("/api/auth/login", json={**CREDENTIALS, "email": "ALICE@example.com"})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "10"
@@ -0,0 +1,99 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app.db import FlashcardDB, QuizAttemptDB
+from app.services.batch_scheduler import BatchScheduler, ScheduleReplay, ScheduleState
+from app.services.spaced_repetition import SpacedRepetitionScheduler
+
+FIELDS = ("review_count", "easiness", "interval", "difficulty_score", "next_review", "last_reviewed")
+
+
+def random_card(rng):
+    if rng.random() < 0.4:
+        return SimpleNamespace(
+            review_count=0, easiness=2.5, interval=0, difficulty_score=0.5, next_review=None, last_reviewed=None
+        )
+    last_reviewed = datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 30), seconds=rng.randint(0, 86399))
+    interval = rng.randint(0, 60)
+    return SimpleNamespace(
+        review_count=rng.randint(1, 20),
+        easiness=round(rng.uniform(1.3, 2.5), 3),
+        interval=interval,
+        difficulty_score=round(rng.random(), 3),
+        next_review=last_reviewed + timedelta(days=interval),
+        last_reviewed=last_reviewed
+    )
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_batch_apply_matches_scalar_apply_review(seed):
+    rng = random.Random(seed)
+    cards = [random_card(rng) for _ in range(rng.randint(1, 8))]
+    state = ScheduleState.from_cards(cards)
+
+    start = datetime(2024, 3, 1)
+    log = [
+        (
+            index,
+            rng.random() < 0.7,
+            round(rng.uniform(0.5, 60), 2),
+            # Coarse timestamps, so some answers to a card tie and keep log order
+            start + timedelta(hours=rng.randint(0, 200))
+        )
+        # Up to 10 answers per card keeps long correct streaks within datetime range
+        for index in range(len(cards))
+        for _ in range(rng.randint(0, 10))
+    ]
+    rng.shuffle(log)
+    if not log:
+        return
+
+    card_index, is_correct, response_times, answered_at = zip(*log)
+    after = BatchScheduler.apply(state, card_index, is_correct, response_times, answered_at)
+
+    # Reference: the scalar scheduler, one answer at a time, oldest first
+    expected_after = [None] * len(log)
+    for position in sorted(range(len(log)), key=lambda i: (answered_at[i], i)):
+        card = cards[card_index[position]]
+        SpacedRepetitionScheduler.apply_review(card, is_correct[position], response_times[position], answered_at[position])
+        expected_after[position] = {field: getattr(card, field) for field in FIELDS}
+
+    assert state.records() == [{field: getattr(card, field) for field in FIELDS} for card in cards]
+    assert after.records() == expected_after
+
+
+def test_recompute_ignores_attempts_on_missing_cards(db):
+    db.add_all([FlashcardDB(id=card_id, user_id=1, question=f"q{card_id}", answer="a") for card_id in (1, 2, 4)])
+    answered_at = datetime(2024, 3, 1)
+    db.add_all([
+        QuizAttemptDB(flashcard_id=flashcard_id, is_correct=True, response_time_seconds=5, created_at=answered_at)
+        # Card 3 is gone but its attempt is still inside the 1..4 id range
+        for flashcard_id in (1, 3, 3)
+    ])
+    db.commit()
+
+    assert ScheduleReplay.recompute_all(db) == 1
+
+    db.expire_all()
+    assert [db.get(FlashcardDB, card_id).review_count for card_id in (1, 2, 4)] == [1, 0, 0]
+
+
+def test_replay_rebuilds_state_from_attempts(db):
+    db.add_all([FlashcardDB(id=card_id, user_id=1, question=f"q{card_id}", answer="a") for card_id in (1, 2)])
+    times = [datetime(2024, 3, 1) + timedelta(days=day) for day in range(3)]
+    db.add_all([
+        QuizAttemptDB(flashcard_id=1, is_correct=correct, response_time_seconds=5, created_at=answered_at)
+        for correct, answered_at in zip((True, False, True), times)
+    ])
+    db.commit()
+
+    state = ScheduleReplay.replay(db, [1, 2])
+
+    card = SimpleNamespace(review_count=0, easiness=2.5, interval=0, difficulty_score=0.5, next_review=None, last_reviewed=None)
+    for correct, answered_at in zip((True, False, True), times):
+        SpacedRepetitionScheduler.apply_review(card, correct, 5, answered_at)
+    assert state.records()[0] == {field: getattr(card, field) for field in FIELDS}
+    assert state.records()[1]["review_count"] == 0
+    assert np.isnat(state.next_review[1])
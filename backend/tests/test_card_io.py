@@ -0,0 +1,33 @@
+import csv
+import io
+import json
+
+
+def test_jsonl_import_then_export_round_trip(client, auth_headers):
+    rows = [
+        {"question": "What is one?", "answer": "1", "topic": "math", "difficulty": "easy"},
+        {"question": "Who wrote Hamlet?", "answer": "Shakespeare", "topic": "lit"},
+        {"question": "", "answer": "missing question"},
+    ]
+    upload = "\n".join(json.dumps(row) for row in rows).encode()
+
+    summary = client.post(
+        "/api/flashcards/import",
+        params={"format": "jsonl"},
+        files={"file": ("deck.jsonl", upload)},
+        headers=auth_headers
+    ).json()
+    assert (summary["imported"], summary["failed"]) == (2, 1)
+
+    response = client.get("/api/flashcards/export", params={"format": "csv"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="flashcards.csv"'
+
+    exported = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["question"], row["answer"], row["topic"], row["difficulty"]) for row in exported] == [
+        ("What is one?", "1", "math", "easy"),
+        ("Who wrote Hamlet?", "Shakespeare", "lit", "medium"),
+    ]
+
+    only_lit = client.get("/api/flashcards/export", params={"format": "jsonl", "topic": "lit"}, headers=auth_headers)
+    assert [json.loads(line)["question"] for line in only_lit.text.splitlines()] == ["Who wrote Hamlet?"]
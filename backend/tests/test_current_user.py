@@ -0,0 +1,93 @@
+from datetime import timedelta
+import pytest
+from sqlalchemy import event
+from app.db import AsyncSessionLocal, UserDB
+from app.db.auth import create_access_token
+from app.routes import dependencies
+from app.routes.dependencies import TTLCache, forget_user
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for the auth caches"""
+    now = [1000.0]
+    monkeypatch.setattr(dependencies.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    """Enable the auth caches (the test settings turn them off)"""
+    monkeypatch.setattr(dependencies, "_token_cache", TTLCache(60, 100))
+    monkeypatch.setattr(dependencies, "_user_cache", TTLCache(60, 100))
+
+
+def test_ttl_cache_expires_and_evicts(clock):
+    cache = TTLCache(ttl_seconds=10, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl_seconds=3)  # Never longer than the cache's own TTL
+
+    clock[0] += 5
+    assert (cache.get("a"), cache.get("b")) == (1, None)
+
+    cache.put("c", 3)
+    cache.put("d", 4)
+    assert (cache.get("a"), cache.get("c"), cache.get("d")) == (None, 3, 4)
+
+    clock[0] += 10
+    assert cache.get("c") is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = TTLCache(ttl_seconds=0, max_entries=10)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+
+
+def test_known_user_is_served_from_cache_until_forgotten(client, auth_headers, db, caches):
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+    db.query(UserDB).delete()
+    db.commit()
+
+    # Still vouched for by the cache, without a database round trip
+    assert client.get("/api/flashcards/topics/list", headers=auth_headers).status_code == 200
+
+    forget_user(1)
+    assert client.get("/api/flashcards/topics/list", headers=auth_headers).status_code == 404
+
+
+def test_cached_user_expires(client, auth_headers, db, caches, clock):
+    assert client.get("/api/flashcards/topics/list", headers=auth_headers).status_code == 200
+    db.query(UserDB).delete()
+    db.commit()
+
+    clock[0] += 61
+    assert client.get("/api/flashcards/topics/list", headers=auth_headers).status_code == 404
+
+
+def test_token_is_not_cached_past_its_expiry(client, auth_headers, caches, clock):
+    token = create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=30))
+
+    assert client.get("/api/flashcards/topics/list", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    clock[0] += 28
+    assert dependencies._token_cache.get(token) == 1
+    clock[0] += 3
+    assert dependencies._token_cache.get(token) is None
+
+
+def test_sync_routes_authenticate_on_their_own_session(client, auth_headers):
+    connections = []
+    async_engine = AsyncSessionLocal.kw["bind"].sync_engine
+    listener = lambda *args: connections.append(args)
+    event.listen(async_engine, "connect", listener)
+    try:
+        response = client.post(
+            "/api/flashcards/", json={"question": "What is one?", "answer": "1", "topic": "t"}, headers=auth_headers
+        )
+    finally:
+        event.remove(async_engine, "connect", listener)
+
+    assert response.status_code == 200
+    assert connections == []
@@ -0,0 +1,59 @@
+import pytest
+from app.services.dedup import DuplicateIndex, confirmed, words
+
+NEAR_DUPLICATES = (
+    "Explain the role of mitochondria in cellular respiration.",
+    "Explain the role of the mitochondria in cellular respiration?"
+)
+ONE_TOKEN_APART = [
+    ("What is the capital of country number 3?", "What is the capital of country number 2?"),
+    ("What is the capital of France?", "What is the capital of Spain?"),
+]
+
+
+def create(client, headers, question, on_duplicate):
+    return client.post(
+        "/api/flashcards/",
+        params={"on_duplicate": on_duplicate},
+        json={"question": question, "answer": "answer", "topic": "t"},
+        headers=headers
+    )
+
+
+def test_confirmation_requires_same_numbers_and_word_overlap():
+    assert confirmed(words(NEAR_DUPLICATES[0]), words(NEAR_DUPLICATES[1]), 0.8)
+    for first, second in ONE_TOKEN_APART:
+        assert not confirmed(words(first), words(second), 0.8)
+
+
+@pytest.mark.parametrize("mode", ["flag", "skip", "merge"])
+def test_near_duplicate_is_detected(client, auth_headers, mode):
+    original = create(client, auth_headers, NEAR_DUPLICATES[0], mode).json()
+
+    response = create(client, auth_headers, NEAR_DUPLICATES[1], mode)
+
+    if mode == "flag":
+        assert response.json()["duplicate_of"] == original["id"]
+    elif mode == "skip":
+        assert response.status_code == 409
+    else:
+        assert response.json()["id"] == original["id"]
+
+
+@pytest.mark.parametrize("first, second", ONE_TOKEN_APART)
+def test_questions_one_token_apart_are_kept(client, auth_headers, first, second):
+    original = create(client, auth_headers, first, "skip").json()
+
+    response = create(client, auth_headers, second, "skip")
+
+    assert response.status_code == 200
+    assert response.json()["id"] != original["id"]
+    assert response.json()["duplicate_of"] is None
+
+
+def test_batch_repeats_point_at_the_earlier_question(db):
+    questions = [NEAR_DUPLICATES[0], ONE_TOKEN_APART[0][0], NEAR_DUPLICATES[1], ONE_TOKEN_APART[0][1]]
+
+    matches = DuplicateIndex.classify(db, user_id=1, questions=questions)
+
+    assert [(existing, twin) for _, existing, twin in matches] == [(None, None), (None, None), (None, 0), (None, None)]
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.services.document_ingest import DocumentIngestor, allocate_cards, chunk_document
+
+PARAGRAPHS = [f"Paragraph {i} explains how process number {i} works in the cell." for i in range(30)]
+
+
+class StubOllama:
+    """Returns one more card than asked for, with questions unique across calls"""
+
+    def __init__(self):
+        self.requests = []
+
+    async def generate_flashcards(self, text, num_cards, difficulty):
+        self.requests.append((text, num_cards))
+        call = len(self.requests)
+        return [
+            {"question": f"Question {call} {i} {'x' * call} {'y' * i}?", "answer": "a"}
+            for i in range(num_cards + 1)
+        ]
+
+
+def generate(text, num_cards, max_tokens=40, overlap_tokens=10):
+    ollama = StubOllama()
+    ingestor = DocumentIngestor(ollama, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    return asyncio.run(ingestor.generate(text, num_cards=num_cards)), ollama.requests
+
+
+@pytest.mark.parametrize("text", ["", "  \n\n \t\n"])
+def test_empty_document_has_no_chunks_or_cards(text):
+    assert chunk_document(text, 40, 10) == []
+    assert allocate_cards([], 5) == []
+
+    result, requests = generate(text, 5)
+
+    assert (result["cards"], result["chunks"], requests) == ([], 0, [])
+
+
+def test_short_document_is_one_normalized_chunk():
+    chunks = chunk_document("Cells  divide\nby mitosis.\n\n\nThen they grow.", 40, 10)
+
+    assert [chunk.text for chunk in chunks] == ["Cells divide by mitosis.\n\nThen they grow."]
+    assert allocate_cards(chunks, 7) == [7]
+
+
+def test_document_exactly_filling_one_chunk():
+    # Three 14-character paragraphs cost 4 tokens each with their separator
+    exact = "\n\n".join(["a" * 14, "b" * 14, "c" * 14])
+
+    assert [chunk.tokens for chunk in chunk_document(exact, 12, 4)] == [12]
+    assert len(chunk_document(exact + "\n\nd", 12, 4)) == 2
+    # Paragraphs that fit only without their separators do not share a chunk
+    near = "\n\n".join(["a" * 16, "b" * 16, "c" * 8])
+    assert all(chunk.tokens <= 10 for chunk in chunk_document(near, 10, 4))
+
+
+def test_long_document_chunks_fit_the_budget_and_overlap():
+    chunks = chunk_document("\n\n".join(PARAGRAPHS), 40, 20)
+    units = [chunk.text.split("\n\n") for chunk in chunks]
+
+    assert len(chunks) > 5
+    assert all(chunk.tokens <= 40 for chunk in chunks)
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    # Each chunk starts with the tail of the previous one and adds something new
+    for previous, current in zip(units, units[1:]):
+        assert current[0] in previous
+        assert current[-1] not in previous
+    # Nothing is lost, and the order is kept
+    assert list(dict.fromkeys(unit for chunk in units for unit in chunk)) == PARAGRAPHS
+
+
+@pytest.mark.parametrize("num_cards", [0, 1, 5, 13, 100])
+def test_allocation_sums_to_the_requested_count(num_cards):
+    chunks = chunk_document("\n\n".join(PARAGRAPHS), 40, 10)
+
+    counts = allocate_cards(chunks, num_cards)
+
+    assert len(counts) == len(chunks)
+    assert sum(counts) == num_cards
+    assert all(count >= 0 for count in counts)
+    # Proportional: no chunk gets more than one card above its exact share
+    total_tokens = sum(chunk.tokens for chunk in chunks)
+    assert all(count < num_cards * chunk.tokens / total_tokens + 1 for count, chunk in zip(counts, chunks))
+
+
+@pytest.mark.parametrize("num_cards", [1, 4, 25])
+def test_generation_asks_each_chunk_for_its_share_and_caps_the_total(num_cards):
+    text = "\n\n".join(PARAGRAPHS)
+    chunks = chunk_document(text, 40, 10)
+
+    result, requests = generate(text, num_cards)
+
+    expected = [(chunk.text, count) for chunk, count in zip(chunks, allocate_cards(chunks, num_cards)) if count]
+    assert sorted(requests) == sorted(expected)
+    assert len(result["cards"]) == num_cards
+    assert result["chunks"] == len(chunks)
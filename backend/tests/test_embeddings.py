@@ -0,0 +1,76 @@
+import json
+import httpx
+import numpy as np
+import pytest
+from app.services.embeddings import EmbeddingProviderError, OllamaEmbeddingProvider
+
+
+def ollama_stub(handler):
+    """Provider whose requests go to `handler(request) -> httpx.Response`"""
+    return OllamaEmbeddingProvider(
+        dimension=3,
+        base_url="http://ollama.test",
+        model="stub-embed",
+        transport=httpx.MockTransport(handler),
+        retry_backoff=0
+    )
+
+
+def test_ollama_embeds_each_text_through_api():
+    requests = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append((request.url.path, body))
+        return httpx.Response(200, json={"embedding": [len(body["prompt"]), 1.0, 0.5]})
+
+    vectors = ollama_stub(handler).embed_batch(["one", "three"])
+
+    assert requests == [
+        ("/api/embeddings", {"model": "stub-embed", "prompt": "one"}),
+        ("/api/embeddings", {"model": "stub-embed", "prompt": "three"})
+    ]
+    assert vectors.dtype == np.float32
+    assert vectors.tolist() == [[3.0, 1.0, 0.5], [5.0, 1.0, 0.5]]
+
+
+def test_ollama_client_error_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404, text="model not found")
+
+    with pytest.raises(EmbeddingProviderError, match="HTTP 404: model not found"):
+        ollama_stub(handler).embed_batch(["text"])
+    assert len(calls) == 1
+
+
+def test_ollama_server_errors_are_retried():
+    responses = iter([
+        httpx.Response(503, text="loading"),
+        httpx.Response(200, json={"embedding": [1.0, 2.0, 3.0]})
+    ])
+
+    vectors = ollama_stub(lambda request: next(responses)).embed_batch(["text"])
+
+    assert vectors.tolist() == [[1.0, 2.0, 3.0]]
+
+
+def test_ollama_unreachable_raises_after_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused", request=request)
+
+    with pytest.raises(EmbeddingProviderError, match="connection refused"):
+        ollama_stub(handler).embed_batch(["text"])
+    assert len(calls) == 3
+
+
+def test_ollama_wrong_dimension_raises():
+    provider = ollama_stub(lambda request: httpx.Response(200, json={"embedding": [1.0, 2.0]}))
+
+    with pytest.raises(EmbeddingProviderError, match="returned 2 dimensions, expected 3"):
+        provider.embed_batch(["text"])
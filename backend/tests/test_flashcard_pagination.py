@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from app.db import FlashcardDB
+
+
+def add_cards(db, user_id, count, created_at, topic="t"):
+    cards = [
+        FlashcardDB(user_id=user_id, question=f"q{i}", answer="a", topic=topic, created_at=created_at)
+        for i in range(count)
+    ]
+    db.add_all(cards)
+    db.commit()
+    return [card.id for card in cards]
+
+
+def all_pages(client, headers, **params):
+    pages = []
+    while True:
+        response = client.get("/api/flashcards/", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append([item["id"] for item in page["items"]])
+        if page["next_cursor"] is None:
+            return pages
+        params = {**params, "cursor": page["next_cursor"]}
+
+
+def test_pages_are_disjoint_complete_and_ordered(client, auth_headers, login, db):
+    other_headers = login("bob")
+    start = datetime(2024, 1, 1)
+    # Cards sharing a created_at are ordered by id
+    older = add_cards(db, 1, 10, start)
+    add_cards(db, 2, 5, start)
+    newer = add_cards(db, 1, 13, start + timedelta(seconds=1))
+
+    pages = all_pages(client, auth_headers, limit=7)
+
+    assert [len(page) for page in pages] == [7, 7, 7, 2]
+    assert [card_id for page in pages for card_id in page] == older + newer
+    assert [len(page) for page in all_pages(client, other_headers, limit=7)] == [5]
+
+
+def test_cards_added_during_paging_are_neither_skipped_nor_repeated(client, auth_headers, db):
+    first = add_cards(db, 1, 5, datetime(2024, 1, 1))
+    page = client.get("/api/flashcards/", params={"limit": 3}, headers=auth_headers).json()
+
+    added = add_cards(db, 1, 2, datetime(2024, 1, 2))
+    rest = client.get("/api/flashcards/", params={"limit": 10, "cursor": page["next_cursor"]}, headers=auth_headers).json()
+
+    assert [item["id"] for item in page["items"] + rest["items"]] == first + added
+    assert rest["next_cursor"] is None
+
+
+def test_filters_and_field_projection(client, auth_headers, db):
+    add_cards(db, 1, 3, datetime(2024, 1, 1), topic="bio")
+    geo = add_cards(db, 1, 2, datetime(2024, 1, 1), topic="geo")
+
+    page = client.get("/api/flashcards/", params={"topic": "geo", "fields": "question"}, headers=auth_headers).json()
+
+    assert page["items"] == [{"id": geo[0], "question": "q0"}, {"id": geo[1], "question": "q1"}]
+
+
+def test_bad_cursor_and_unknown_fields_are_rejected(client, auth_headers):
+    assert client.get("/api/flashcards/", params={"cursor": "not-a-cursor"}, headers=auth_headers).status_code == 400
+    assert client.get("/api/flashcards/", params={"fields": "question,secret"}, headers=auth_headers).status_code == 400
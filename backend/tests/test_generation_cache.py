@@ -0,0 +1,121 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.services import generation_cache
+from app.services.generation_cache import GenerationCache
+from app.services.llm_service import OllamaService
+
+CARDS = [{"question": "What is one?", "answer": "1"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(generation_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_key_normalizes_whitespace_and_difficulty():
+    key = GenerationCache.key("mistral", "Cells  divide\nby mitosis.", 5, "Medium ")
+
+    assert key == GenerationCache.key("mistral", "Cells divide by mitosis.", 5, "medium")
+    assert key != GenerationCache.key("mistral", "Cells divide by mitosis.", 6, "medium")
+    assert key != GenerationCache.key("llama3", "Cells divide by mitosis.", 5, "medium")
+    assert key != GenerationCache.key("mistral", "Cells divide by mitosis.", 5, "medium", prompt_version=2)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = GenerationCache(str(tmp_path / "cache.db"), ttl_seconds=60, max_entries=10)
+    cache.put("k", CARDS)
+
+    clock[0] += 59
+    assert cache.get("k") == CARDS
+
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = GenerationCache(str(tmp_path / "cache.db"), ttl_seconds=3600, max_entries=2)
+    cache.put("a", CARDS)
+    clock[0] += 1
+    cache.put("b", CARDS)
+    clock[0] += 1
+    cache.get("a")
+    clock[0] += 1
+    cache.put("c", CARDS)
+
+    assert cache.get("a") == CARDS
+    assert cache.get("b") is None
+    assert cache.get("c") == CARDS
+
+
+def test_cache_is_shared_between_instances(tmp_path):
+    GenerationCache(str(tmp_path / "cache.db")).put("k", CARDS)
+
+    assert GenerationCache(str(tmp_path / "cache.db")).get("k") == CARDS
+
+
+def ollama_with_cache(tmp_path, handler):
+    return OllamaService(
+        transport=httpx.MockTransport(handler),
+        cache=GenerationCache(str(tmp_path / "cache.db"))
+    )
+
+
+def test_repeated_generation_is_served_from_cache(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"response": json.dumps(CARDS)})
+
+    service = ollama_with_cache(tmp_path, handler)
+
+    async def generate_twice():
+        first = await service.generate_flashcards("Some text", num_cards=1)
+        second = await service.generate_flashcards("Some  text", num_cards=1)
+        return first, second
+
+    assert asyncio.run(generate_twice()) == (CARDS, CARDS)
+    assert len(calls) == 1
+
+
+def test_failed_generation_is_not_cached(tmp_path):
+    responses = iter([
+        httpx.Response(500, text="out of memory"),
+        httpx.Response(200, json={"response": json.dumps(CARDS)})
+    ])
+    service = ollama_with_cache(tmp_path, lambda request: next(responses))
+
+    async def generate_twice():
+        return [await service.generate_flashcards("Some text", num_cards=1) for _ in range(2)]
+
+    assert asyncio.run(generate_twice()) == [[], CARDS]
+
+
+def test_only_completed_streams_are_cached(tmp_path):
+    calls = []
+    card = json.dumps(CARDS[0])
+
+    def handler(request):
+        calls.append(request)
+        # Ollama stops without "done" the first time, as when cut off
+        lines = [{"response": "[" + card, "done": False}]
+        if len(calls) > 1:
+            lines.append({"response": "]", "done": True})
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines).encode())
+
+    service = ollama_with_cache(tmp_path, handler)
+
+    async def stream_three_times():
+        return [
+            [card async for card in service.stream_flashcards("Some text", num_cards=2)]
+            for _ in range(3)
+        ]
+
+    assert asyncio.run(stream_three_times()) == [CARDS, CARDS, CARDS]
+    assert len(calls) == 2
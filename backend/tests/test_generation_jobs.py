@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.config import settings
+from app.db import GenerationJobDB
+from app.services.generation_jobs import GenerationJobQueue
+
+CARDS = [{"question": "What is one?", "answer": "1"}, {"question": "What is two?", "answer": "2"}]
+
+
+@pytest.fixture
+def submit(client, auth_headers):
+    """Submit a job through the API; returns its id"""
+    def submit_job(text="Some text"):
+        response = client.post("/api/flashcards/jobs", json={"text": text, "num_cards": 2}, headers=auth_headers)
+        assert response.status_code == 202
+        return response.json()["id"]
+    return submit_job
+
+
+def job(db, job_id) -> GenerationJobDB:
+    db.expire_all()
+    return db.get(GenerationJobDB, job_id)
+
+
+def fail_generation(monkeypatch):
+    async def generate(job):
+        raise RuntimeError("Ollama is down")
+    monkeypatch.setattr(GenerationJobQueue, "_generate", staticmethod(generate))
+
+
+def run_once(queue: GenerationJobQueue):
+    """Claim and run the next runnable job, as one worker iteration does"""
+    async def step():
+        job_id = await queue._claim()
+        if job_id is not None:
+            await queue._run(job_id)
+        return job_id
+    return asyncio.run(step())
+
+
+def test_submitted_jobs_report_queue_position(client, auth_headers, submit):
+    first, second = submit(), submit()
+
+    response = client.get(f"/api/flashcards/jobs/{second}", headers=auth_headers).json()
+
+    assert response["status"] == "queued"
+    assert response["queue_position"] == 1
+    assert [j["id"] for j in client.get("/api/flashcards/jobs", headers=auth_headers).json()] == [second, first]
+
+
+def test_completed_job_stores_its_cards(client, auth_headers, submit, db, monkeypatch):
+    async def generate(job):
+        return CARDS
+    monkeypatch.setattr(GenerationJobQueue, "_generate", staticmethod(generate))
+    job_id = submit()
+
+    assert run_once(GenerationJobQueue(workers=1)) == job_id
+
+    response = client.get(f"/api/flashcards/jobs/{job_id}", headers=auth_headers).json()
+    assert response["status"] == "completed"
+    assert response["created_count"] == 2
+    assert [card["question"] for card in response["cards"]] == [card["question"] for card in CARDS]
+
+
+def test_failed_job_retries_with_backoff_then_fails(submit, db, monkeypatch):
+    fail_generation(monkeypatch)
+    queue = GenerationJobQueue(workers=1)
+    job_id = submit()
+
+    delays = []
+    for attempt in range(1, 3):
+        started = datetime.utcnow()
+        assert run_once(queue) == job_id
+
+        retried = job(db, job_id)
+        assert (retried.status, retried.attempts, retried.error) == ("queued", attempt, "Ollama is down")
+        delays.append(round((retried.next_attempt_at - started).total_seconds()))
+
+        # Not runnable again until its backoff has elapsed
+        assert run_once(queue) is None
+        retried.next_attempt_at = datetime.utcnow()
+        db.commit()
+
+    assert delays == [settings.GENERATION_JOB_RETRY_SECONDS, 2 * settings.GENERATION_JOB_RETRY_SECONDS]
+
+    assert run_once(queue) == job_id
+    failed = job(db, job_id)
+    assert (failed.status, failed.attempts) == ("failed", 3)
+    assert failed.finished_at is not None
+
+
+def test_expired_lease_is_reclaimed(submit, db):
+    job_id = submit()
+    stuck = job(db, job_id)
+    stuck.status = "running"
+    stuck.attempts = 1
+    stuck.lease_expires_at = datetime.utcnow() + timedelta(minutes=5)
+    db.commit()
+
+    queue = GenerationJobQueue(workers=1)
+    assert asyncio.run(queue._claim()) is None
+
+    stuck.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert asyncio.run(queue._claim()) == job_id
+    assert job(db, job_id).attempts == 2
+
+
+def test_claimed_job_is_not_claimed_again(submit):
+    job_id = submit()
+    first, second = GenerationJobQueue(workers=1), GenerationJobQueue(workers=1)
+
+    assert asyncio.run(first._claim()) == job_id
+    assert asyncio.run(second._claim()) is None
+
+
+def test_shutdown_requeues_running_jobs(submit, db, monkeypatch):
+    running = asyncio.Event()
+
+    async def generate(job):
+        running.set()
+        await asyncio.Event().wait()
+    monkeypatch.setattr(GenerationJobQueue, "_generate", staticmethod(generate))
+    job_id = submit()
+
+    async def start_and_stop():
+        queue = GenerationJobQueue(workers=1)
+        await queue.start()
+        await asyncio.wait_for(running.wait(), timeout=10)
+        await queue.stop()
+
+    asyncio.run(start_and_stop())
+
+    requeued = job(db, job_id)
+    assert (requeued.status, requeued.attempts, requeued.lease_expires_at) == ("queued", 0, None)
+    assert requeued.next_attempt_at <= datetime.utcnow()
@@ -0,0 +1,106 @@
+import json
+import httpx
+import pytest
+from app.services import card_store
+from app.services.embeddings import EmbeddingProviderError
+from app.services.llm_service import OllamaService
+
+
+def ollama_chunks(*pieces):
+    """NDJSON lines of Ollama's /api/generate stream carrying `pieces` of response text"""
+    lines = [json.dumps({"response": piece, "done": False}) for piece in pieces]
+    return [line.encode() + b"\n" for line in lines]
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """Sends its chunks, then fails the way a read timeout does"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        raise httpx.ReadTimeout("timed out")
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """Point the stream route at an OllamaService backed by `ollama.handler`"""
+    stub = OllamaService(transport=httpx.MockTransport(lambda request: stub.handler(request)))
+    monkeypatch.setattr("app.routes.flashcards.get_ollama_service", lambda: stub)
+    return stub
+
+
+def stream(client, auth_headers, **params):
+    response = client.post(
+        "/api/flashcards/generate-from-text/stream",
+        params={"text": "Some text", "num_cards": 2, **params},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+CARD_1 = '[{"question": "What is one?", "answer": "1"},'
+CARD_2 = ' {"question": "What is two?", "answer": "2"}]'
+
+
+def test_stream_saves_cards_then_reports_done(client, auth_headers, ollama):
+    ollama.handler = lambda request: httpx.Response(200, content=b"".join(ollama_chunks(CARD_1, CARD_2)))
+
+    events = stream(client, auth_headers)
+
+    assert [event["type"] for event in events] == ["card", "card", "done"]
+    assert events[-1]["created"] == 2
+    assert len(client.get("/api/flashcards/", headers=auth_headers).json()["items"]) == 2
+
+
+def test_stream_reports_error_when_ollama_is_unreachable(client, auth_headers, ollama):
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+    ollama.handler = handler
+
+    events = stream(client, auth_headers)
+
+    assert len(events) == 1
+    assert events[0]["type"] == "error"
+    assert events[0]["created"] == 0
+    assert "connection refused" in events[0]["detail"]
+
+
+def test_stream_reports_error_after_partial_output(client, auth_headers, ollama):
+    ollama.handler = lambda request: httpx.Response(200, stream=BrokenStream(ollama_chunks(CARD_1, ' {"question"')))
+
+    events = stream(client, auth_headers)
+
+    assert [event["type"] for event in events] == ["card", "error"]
+    assert events[-1]["created"] == 1
+    # The card streamed before the timeout stays saved
+    assert len(client.get("/api/flashcards/", headers=auth_headers).json()["items"]) == 1
+
+
+def test_stream_reports_error_on_malformed_output(client, auth_headers, ollama):
+    ollama.handler = lambda request: httpx.Response(200, content=b"not json\n")
+
+    events = stream(client, auth_headers)
+
+    assert events == [{"type": "error", "detail": "Ollama returned a malformed stream", "created": 0}]
+
+
+def test_stream_reports_error_when_a_card_cannot_be_saved(client, auth_headers, ollama, monkeypatch):
+    ollama.handler = lambda request: httpx.Response(200, content=b"".join(ollama_chunks(CARD_1, CARD_2)))
+    calls = []
+
+    async def save_then_fail(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > 1:
+            raise EmbeddingProviderError("Embedding server returned 500")
+        return await card_store.save_generated_cards(*args, **kwargs)
+    monkeypatch.setattr("app.routes.flashcards.save_generated_cards", save_then_fail)
+
+    events = stream(client, auth_headers)
+
+    assert [event["type"] for event in events] == ["card", "error"]
+    assert events[-1] == {"type": "error", "detail": "Generated cards could not be saved", "created": 1}
+    assert len(client.get("/api/flashcards/", headers=auth_headers).json()["items"]) == 1
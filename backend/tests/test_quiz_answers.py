@@ -0,0 +1,72 @@
+import pytest
+from app.config import settings
+from app.db import FlashcardDB, QuizAttemptDB
+
+SCHEDULE = ("review_count", "easiness", "interval", "difficulty_score")
+
+
+@pytest.fixture
+def session_id(client, auth_headers, db):
+    db.add_all([FlashcardDB(user_id=1, question=f"q{i}", answer="a", topic="t") for i in range(3)])
+    db.commit()
+    return client.post("/api/study/session/start", headers=auth_headers).json()["id"]
+
+
+def answer(flashcard_id, is_correct, response_time_seconds=4.0):
+    return {"flashcard_id": flashcard_id, "is_correct": is_correct, "response_time_seconds": response_time_seconds}
+
+
+def submit_batch(client, headers, session_id, attempts):
+    return client.post("/api/study/quiz/answers", params={"session_id": session_id}, json={"attempts": attempts}, headers=headers)
+
+
+def schedules(db):
+    db.expire_all()
+    return {card.id: tuple(getattr(card, field) for field in SCHEDULE) for card in db.query(FlashcardDB)}
+
+
+def test_batch_matches_answering_one_at_a_time(client, auth_headers, db, session_id):
+    attempts = [answer(1, True, 3), answer(2, False, 9), answer(1, True, 5), answer(3, True), answer(1, False, 2)]
+
+    for attempt in attempts:
+        response = client.post("/api/study/quiz/answer", params={"session_id": session_id}, json=attempt, headers=auth_headers)
+        assert response.status_code == 200
+    one_at_a_time = schedules(db)
+
+    for card in db.query(FlashcardDB):
+        card.review_count, card.easiness, card.interval, card.difficulty_score = 0, 2.5, 0, 0.5
+        card.next_review = card.last_reviewed = None
+    db.commit()
+
+    response = submit_batch(client, auth_headers, session_id, attempts)
+    assert response.status_code == 200
+    assert schedules(db) == one_at_a_time
+
+
+def test_repeated_answers_report_each_step(client, auth_headers, session_id):
+    response = submit_batch(client, auth_headers, session_id, [answer(1, True), answer(2, False), answer(1, True)])
+
+    body = response.json()
+    assert [(result["flashcard_id"], result["review_count"]) for result in body["results"]] == [(1, 1), (2, 1), (1, 2)]
+    assert [result["interval"] for result in body["results"]] == [1, 0, 3]
+    assert (body["cards_studied"], body["cards_correct"]) == (3, 2)
+
+
+def test_unknown_card_rejects_the_whole_batch(client, auth_headers, login, db, session_id):
+    login("bob")
+    db.add(FlashcardDB(user_id=2, question="bob's", answer="a"))
+    db.commit()
+
+    response = submit_batch(client, auth_headers, session_id, [answer(1, True), answer(4, True), answer(99, True)])
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Flashcards not found: 4, 99"
+    assert db.query(QuizAttemptDB).count() == 0
+    assert client.get(f"/api/study/session/{session_id}", headers=auth_headers).json()["cards_studied"] == 0
+
+
+def test_empty_and_oversized_batches_are_rejected(client, auth_headers, session_id, monkeypatch):
+    monkeypatch.setattr(settings, "QUIZ_BATCH_MAX_ATTEMPTS", 2)
+
+    assert submit_batch(client, auth_headers, session_id, []).status_code == 400
+    assert submit_batch(client, auth_headers, session_id, [answer(1, True)] * 3).status_code == 400
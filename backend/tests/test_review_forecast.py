@@ -0,0 +1,79 @@
+from datetime import date, datetime, timedelta
+from app.db import FlashcardDB
+from app.services.analytics import AnalyticsEngine
+
+TODAY = date(2024, 3, 10)
+MIDNIGHT = datetime(2024, 3, 10)
+
+
+def add(db, *reviews, topic="t", user_id=1):
+    db.add_all([
+        FlashcardDB(user_id=user_id, question=f"q{i}", answer="a", topic=topic, next_review=review)
+        for i, review in enumerate(reviews)
+    ])
+    db.commit()
+
+
+def reviews(result):
+    return {entry["date"]: entry["reviews"] for entry in result["forecast"] if entry["reviews"]}
+
+
+def test_forecast_buckets_new_overdue_and_scheduled_cards(db):
+    add(
+        db,
+        None, None,
+        MIDNIGHT - timedelta(days=3), MIDNIGHT - timedelta(seconds=1),  # Overdue, however recently
+        MIDNIGHT, MIDNIGHT + timedelta(hours=23, minutes=59),
+        MIDNIGHT + timedelta(days=1),  # 00:00 tomorrow is tomorrow's
+        MIDNIGHT + timedelta(days=6, hours=12),
+        MIDNIGHT + timedelta(days=7)  # Past the window
+    )
+    add(db, None, MIDNIGHT, user_id=2)
+
+    result = AnalyticsEngine.review_forecast(db, 1, days=7, today=TODAY)
+
+    assert (result["days"], result["new_cards"], result["overdue"]) == (7, 2, 2)
+    assert [entry["date"] for entry in result["forecast"]] == [TODAY + timedelta(days=i) for i in range(7)]
+    assert reviews(result) == {TODAY: 2, date(2024, 3, 11): 1, date(2024, 3, 16): 1}
+    assert result["total_reviews"] == result["overdue"] + sum(reviews(result).values()) == 6
+
+
+def test_forecast_for_one_topic(db):
+    add(db, None, MIDNIGHT - timedelta(days=1), MIDNIGHT + timedelta(hours=5), topic="bio")
+    add(db, None, None, MIDNIGHT + timedelta(hours=5), topic="geo")
+
+    result = AnalyticsEngine.review_forecast(db, 1, days=3, topic="bio", today=TODAY)
+
+    assert (result["new_cards"], result["overdue"], result["total_reviews"]) == (1, 1, 2)
+    assert reviews(result) == {TODAY: 1}
+
+
+def test_forecast_reads_a_range_of_the_next_review_index(db, query_plans):
+    add(db, None, MIDNIGHT + timedelta(days=1))
+    query_plans.clear()
+
+    AnalyticsEngine.review_forecast(db, 1, days=7, today=TODAY)
+
+    assert len(query_plans) == 2
+    for statement, plan in query_plans:
+        assert any("ix_flashcards_user_next_review (user_id=? AND next_review" in line for line in plan), plan
+
+    # With a topic, SQLite may prefer the topic index instead; either way no table scan
+    query_plans.clear()
+    AnalyticsEngine.review_forecast(db, 1, days=7, topic="t", today=TODAY)
+
+    assert len(query_plans) == 2
+    for statement, plan in query_plans:
+        assert plan[0].startswith("SEARCH flashcards USING"), plan
+
+
+def test_forecast_route(client, auth_headers, db):
+    add(db, None, datetime.utcnow() + timedelta(days=1))
+
+    response = client.get("/api/study/forecast", params={"days": 3}, headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["days"], body["new_cards"], body["overdue"], body["total_reviews"]) == (3, 1, 0, 1)
+    assert [entry["reviews"] for entry in body["forecast"]] == [0, 1, 0]
+    assert client.get("/api/study/forecast", params={"days": 0}, headers=auth_headers).status_code == 422
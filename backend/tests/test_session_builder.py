@@ -0,0 +1,155 @@
+import random
+from datetime import datetime, timedelta
+from app.db import FlashcardDB, QuizAttemptDB, StudySessionDB, UserDailyAnalyticsDB
+from app.services.analytics import AnalyticsRollup
+from app.services.session_builder import SessionBuilder
+
+NOW = datetime(2024, 3, 1, 12)
+
+
+def due_card(overdue_days, interval, difficulty_score=0.5, topic="t", difficulty="medium"):
+    return FlashcardDB(
+        user_id=1,
+        question="q",
+        answer="a",
+        topic=topic,
+        difficulty=difficulty,
+        review_count=1,
+        interval=interval,
+        difficulty_score=difficulty_score,
+        next_review=NOW - timedelta(days=overdue_days)
+    )
+
+
+def new_card(topic="t", difficulty="medium"):
+    return FlashcardDB(user_id=1, question="q", answer="a", topic=topic, difficulty=difficulty)
+
+
+def add(db, cards):
+    db.add_all(cards)
+    db.commit()
+    return [card.id for card in cards]
+
+
+def test_interleave_keeps_priority_but_splits_topics():
+    candidates = [(1, "a"), (2, "a"), (3, "a"), (4, "b"), (5, "b")]
+
+    assert SessionBuilder.interleave(candidates) == [1, 4, 2, 5, 3]
+    # Once only one topic is left its cards run back to back
+    assert SessionBuilder.interleave([(1, "a"), (2, "a"), (3, "b"), (4, "a")]) == [1, 3, 2, 4]
+
+
+def test_interleave_repeats_a_topic_only_when_unavoidable():
+    rng = random.Random(7)
+    for _ in range(200):
+        candidates = [(card_id, rng.choice("abc")) for card_id in range(rng.randint(1, 15))]
+        topics = dict(candidates)
+
+        ordered = SessionBuilder.interleave(candidates)
+
+        assert sorted(ordered) == [card_id for card_id, _ in candidates]
+        for position in range(1, len(ordered)):
+            if topics[ordered[position]] == topics[ordered[position - 1]]:
+                assert {topics[card_id] for card_id in ordered[position:]} == {topics[ordered[position]]}
+
+
+def test_overdue_is_scored_relative_to_interval():
+    # Two days late on a one-day interval beats two days late on a month
+    short = SessionBuilder.score(NOW - timedelta(days=2), 1, 0.5, "medium", NOW)
+    long = SessionBuilder.score(NOW - timedelta(days=2), 30, 0.5, "medium", NOW)
+    # Harder cards and the preferred difficulty break ties
+    harder = SessionBuilder.score(NOW - timedelta(days=2), 30, 0.9, "medium", NOW)
+    preferred = SessionBuilder.score(NOW - timedelta(days=2), 30, 0.5, "hard", NOW, "hard")
+
+    assert short > long
+    assert harder > long
+    assert preferred > long
+    assert SessionBuilder.score(NOW + timedelta(days=1), 1, 0.5, "medium", NOW) == SessionBuilder.score(NOW, 1, 0.5, "medium", NOW)
+
+
+def test_top_due_returns_the_best_limit_cards_in_order(db):
+    rng = random.Random(3)
+    cards = [due_card(rng.uniform(0, 20), rng.randint(1, 30), round(rng.random(), 2)) for _ in range(40)]
+    add(db, cards + [due_card(-1, 1)])  # Not due yet
+
+    top = SessionBuilder().top_due(db, 1, 5, now=NOW)
+
+    ranked = sorted(
+        cards,
+        key=lambda card: (-SessionBuilder.score(card.next_review, card.interval, card.difficulty_score, card.difficulty, NOW), card.id)
+    )
+    assert [card_id for card_id, _ in top] == [card.id for card in ranked[:5]]
+
+
+def test_top_due_scans_at_most_max_candidates(db):
+    # The most overdue cards are scanned first, even if a later one scores higher
+    oldest = add(db, [due_card(10, 30), due_card(9, 30)])
+    add(db, [due_card(1, 1, difficulty_score=1.0)])
+
+    top = SessionBuilder(max_candidates=2).top_due(db, 1, 5, now=NOW)
+
+    assert [card_id for card_id, _ in top] == oldest
+
+
+def test_uncapped_scan_finds_the_best_card_past_the_cap(db):
+    add(db, [due_card(10, 30) for _ in range(6)])
+    best = add(db, [due_card(1, 1, difficulty_score=1.0)])
+
+    assert best[0] not in [card_id for card_id, _ in SessionBuilder(max_candidates=6).top_due(db, 1, 1, now=NOW)]
+    assert SessionBuilder(max_candidates=7).top_due(db, 1, 1, now=NOW)[0][0] == best[0]
+    assert SessionBuilder(max_candidates=0).top_due(db, 1, 1, now=NOW)[0][0] == best[0]
+
+
+def test_new_cards_respect_the_daily_quota(db):
+    due = add(db, [due_card(1, 1)])
+    new = add(db, [new_card() for _ in range(5)])
+    db.add(UserDailyAnalyticsDB(user_id=1, date=NOW.date(), new_cards=1))
+    db.commit()
+    builder = SessionBuilder(new_cards_per_day=4)
+
+    assert builder.plan(db, 1, limit=10, now=NOW) == due + new[:3]
+    assert builder.plan(db, 1, limit=10, now=NOW, reserved_new=2) == due + new[:1]
+    assert builder.plan(db, 1, limit=10, now=NOW, reserved_new=5) == due
+    # Due cards take the slots first
+    assert builder.plan(db, 1, limit=2, now=NOW) == due + new[:1]
+
+
+def test_rebuilt_quota_still_counts_deleted_cards(db):
+    studied = add(db, [new_card(), new_card()])
+    session = StudySessionDB(user_id=1)
+    db.add(session)
+    db.flush()
+    db.add_all([
+        QuizAttemptDB(study_session_id=session.id, flashcard_id=card_id, is_correct=True, created_at=NOW)
+        for card_id in studied
+    ])
+    db.delete(db.get(FlashcardDB, studied[0]))
+    db.commit()
+
+    AnalyticsRollup.rebuild_user(db, 1)
+
+    assert SessionBuilder(new_cards_per_day=4).new_cards_remaining(db, 1, NOW.date()) == 2
+
+
+def test_new_cards_prefer_the_requested_difficulty(db):
+    easy, medium, hard, hard_too = add(db, [
+        new_card(difficulty="easy"), new_card(difficulty="medium"), new_card(difficulty="hard"), new_card(difficulty="hard")
+    ])
+
+    assert [card_id for card_id, _ in SessionBuilder.new_cards(db, 1, 4, preferred_difficulty="hard")] == [hard, hard_too, medium, easy]
+    assert [card_id for card_id, _ in SessionBuilder.new_cards(db, 1, 3, preferred_difficulty="easy")] == [easy, medium, hard]
+    assert [card_id for card_id, _ in SessionBuilder.new_cards(db, 1, 1, preferred_difficulty="medium")] == [medium]
+    assert [card_id for card_id, _ in SessionBuilder.new_cards(db, 1, 3)] == [easy, medium, hard]
+
+
+def test_card_selection_is_served_by_the_due_index(db, query_plans):
+    add(db, [due_card(1, 1), new_card(difficulty="hard"), new_card()])
+    query_plans.clear()
+
+    SessionBuilder().plan(db, 1, limit=5, preferred_difficulty="hard", now=NOW)
+
+    selections = [plan for statement, plan in query_plans if "FROM flashcards" in statement]
+    assert len(selections) == 4  # Due cards, then one query per new-card difficulty tier
+    for plan in selections:
+        assert any("ix_flashcards_user_next_review" in line for line in plan)
+        assert not any("TEMP B-TREE" in line for line in plan)
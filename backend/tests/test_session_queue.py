@@ -0,0 +1,104 @@
+from datetime import datetime
+from app.config import settings
+from app.db import FlashcardDB, StudySessionQueueDB, UserDailyAnalyticsDB
+
+
+def add_cards(db, count):
+    cards = [FlashcardDB(user_id=1, question=f"q{i}", answer="a", topic=f"t{i % 3}") for i in range(count)]
+    db.add_all(cards)
+    db.commit()
+    return [card.id for card in cards]
+
+
+def start(client, headers, target_count):
+    response = client.post("/api/study/session/start", params={"target_count": target_count}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def next_cards(client, headers, session_id, limit):
+    response = client.get(f"/api/study/cards-for-session/{session_id}", params={"limit": limit}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    return [card["id"] for card in body["cards"]], body["remaining"]
+
+
+def queued(db, session_id):
+    return db.query(StudySessionQueueDB).filter_by(session_id=session_id).count()
+
+
+def test_start_queues_target_count_cards(client, auth_headers, db):
+    add_cards(db, 10)
+
+    session = start(client, auth_headers, 4)
+
+    assert session["queue_remaining"] == 4
+    assert queued(db, session["id"]) == 4
+
+
+def test_consecutive_fetches_never_overlap_and_refill_in_the_background(client, auth_headers, db):
+    card_ids = add_cards(db, 12)
+    session_id = start(client, auth_headers, 4)["id"]
+
+    first, remaining = next_cards(client, auth_headers, session_id, 2)
+    # Two left is below the low-water mark, so another four were queued
+    assert (len(first), remaining) == (2, 2)
+    assert queued(db, session_id) == 8
+
+    seen = list(first)
+    while True:
+        cards, remaining = next_cards(client, auth_headers, session_id, 3)
+        if not cards:
+            break
+        seen += cards
+
+    assert sorted(seen) == card_ids
+    assert remaining == 0
+
+
+def test_empty_queue_is_filled_inline(client, auth_headers, db):
+    # A session started with nothing to study, like one from before queues
+    session_id = start(client, auth_headers, 5)["id"]
+    card_ids = add_cards(db, 3)
+
+    cards, remaining = next_cards(client, auth_headers, session_id, 2)
+
+    assert len(cards) == 2
+    assert set(cards) <= set(card_ids)
+    assert remaining == 1
+
+
+def test_completing_clears_the_queue(client, auth_headers, db):
+    add_cards(db, 6)
+    session_id = start(client, auth_headers, 6)["id"]
+    next_cards(client, auth_headers, session_id, 2)
+
+    completed = client.post(f"/api/study/session/{session_id}/complete", headers=auth_headers).json()
+
+    assert completed["queue_remaining"] == 0
+    assert queued(db, session_id) == 0
+    assert client.get(f"/api/study/session/{session_id}", headers=auth_headers).json()["queue_remaining"] == 0
+    assert next_cards(client, auth_headers, session_id, 5) == ([], 0)
+
+
+def test_deleted_cards_drop_out_of_the_queue(client, auth_headers, db):
+    first, second, third = add_cards(db, 3)
+    session_id = start(client, auth_headers, 3)["id"]
+    assert client.delete(f"/api/flashcards/{second}", headers=auth_headers).status_code == 200
+
+    cards, _ = next_cards(client, auth_headers, session_id, 3)
+
+    assert sorted(cards) == [first, third]
+
+
+def test_new_card_quota_holds_across_refills(client, auth_headers, db):
+    add_cards(db, 10)
+    db.add(UserDailyAnalyticsDB(user_id=1, date=datetime.utcnow().date(), new_cards=settings.NEW_CARDS_PER_DAY - 3))
+    db.commit()
+    session_id = start(client, auth_headers, 2)["id"]
+
+    seen = []
+    for _ in range(4):
+        seen += next_cards(client, auth_headers, session_id, 2)[0]
+
+    assert len(seen) == len(set(seen)) == 3
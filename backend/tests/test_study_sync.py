@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from app.db import FlashcardDB, QuizAttemptDB
+
+SCHEDULE = ("review_count", "easiness", "interval", "difficulty_score", "next_review")
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+
+@pytest.fixture
+def cards(client, auth_headers, db):
+    db.add_all([FlashcardDB(user_id=1, question=f"q{i}", answer="a", topic="t") for i in range(3)])
+    db.commit()
+    return [1, 2, 3]
+
+
+def attempt(flashcard_id, is_correct, answered_at, client_attempt_id=None):
+    return {
+        "client_attempt_id": str(client_attempt_id or uuid.uuid4()),
+        "flashcard_id": flashcard_id,
+        "is_correct": is_correct,
+        "response_time_seconds": 4.0,
+        "answered_at": answered_at.isoformat()
+    }
+
+
+def upload(client, headers, attempts):
+    response = client.post("/api/study/sync/upload", json={"attempts": attempts}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def schedule(db, card_id):
+    db.expire_all()
+    card = db.get(FlashcardDB, card_id)
+    return tuple(getattr(card, field) for field in SCHEDULE)
+
+
+def test_retried_upload_is_a_no_op(client, auth_headers, db, cards):
+    log = [attempt(1, True, NOW - timedelta(hours=2)), attempt(2, False, NOW - timedelta(hours=1))]
+
+    first = upload(client, auth_headers, log)
+    after_first = [schedule(db, 1), schedule(db, 2)]
+    retry = upload(client, auth_headers, log + log[:1])
+
+    assert (first["applied"], first["duplicates"]) == (2, 0)
+    assert (retry["applied"], retry["duplicates"]) == (0, 3)
+    assert [schedule(db, 1), schedule(db, 2)] == after_first
+    assert db.query(QuizAttemptDB).count() == 2
+
+
+def test_repeats_within_one_upload_count_once(client, auth_headers, db, cards):
+    same = uuid.uuid4()
+
+    result = upload(client, auth_headers, [attempt(1, True, NOW, same), attempt(1, True, NOW, same)])
+
+    assert (result["applied"], result["duplicates"]) == (1, 1)
+    assert schedule(db, 1)[0] == 1
+
+
+def test_late_attempt_is_replayed_in_answer_order(client, auth_headers, db, cards):
+    earlier, later = NOW - timedelta(days=2), NOW - timedelta(days=1)
+
+    # Card 1 hears about its later answer first (e.g. from another device)
+    upload(client, auth_headers, [attempt(1, True, later)])
+    upload(client, auth_headers, [attempt(1, False, earlier)])
+    # Card 2 gets the same answers in one upload
+    upload(client, auth_headers, [attempt(2, True, later), attempt(2, False, earlier)])
+
+    assert schedule(db, 1) == schedule(db, 2)
+    assert schedule(db, 1)[0] == 2
+
+
+def test_attempts_for_deleted_cards_are_rejected(client, auth_headers, cards):
+    assert client.delete("/api/flashcards/3", headers=auth_headers).status_code == 200
+    gone = attempt(3, True, NOW)
+
+    result = upload(client, auth_headers, [attempt(1, True, NOW), gone])
+
+    assert result["applied"] == 1
+    assert result["rejected"] == [{"client_attempt_id": gone["client_attempt_id"], "error": "Flashcard not found"}]
+
+
+def test_snapshot_then_delta_since_watermark(client, auth_headers, db, cards):
+    db.get(FlashcardDB, 1).next_review = NOW - timedelta(days=1)
+    db.get(FlashcardDB, 2).next_review = NOW + timedelta(days=30)
+    db.commit()
+
+    full = client.get("/api/study/sync/snapshot", headers=auth_headers).json()
+    assert full["full"] is True
+    assert [card["id"] for card in full["cards"]] == [1, 3]
+
+    # Age every card past the watermark, whose safety margin would re-send them
+    for card in db.query(FlashcardDB):
+        card.updated_at = NOW - timedelta(hours=1)
+    db.commit()
+
+    upload(client, auth_headers, [attempt(2, True, NOW)])
+    assert client.delete("/api/flashcards/3", headers=auth_headers).status_code == 200
+
+    delta = client.get("/api/study/sync/snapshot", params={"since": full["watermark"]}, headers=auth_headers).json()
+    assert delta["full"] is False
+    assert [card["id"] for card in delta["cards"]] == [2]
+    assert delta["deleted_ids"] == [3]
+
+
+def test_invalid_watermark_is_rejected(client, auth_headers):
+    response = client.get("/api/study/sync/snapshot", params={"since": "%%%"}, headers=auth_headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,35 @@
+from app.db import FlashcardDB
+from app.services.embedding_codec import encode_embedding
+from app.services.embeddings import get_embedding_provider
+from app.services.vector_index import vector_index
+
+QUERY = "How do plants turn light into sugar?"
+
+
+def search(client, headers, q=QUERY):
+    response = client.get("/api/flashcards/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200
+    return [result["card"]["id"] for result in response.json()["results"]]
+
+
+def test_search_ignores_vectors_from_another_model(client, auth_headers, db):
+    created = client.post(
+        "/api/flashcards/", json={"question": "What is photosynthesis?", "answer": "a", "topic": "bio"}, headers=auth_headers
+    ).json()["id"]
+    # Same dimension, different model: a perfect match only by accident of the vector space
+    stale = FlashcardDB(
+        user_id=1, question="q", answer="a", topic="bio",
+        embedding=encode_embedding(get_embedding_provider().embed(QUERY)), embedding_model="another-model"
+    )
+    db.add(stale)
+    db.commit()
+    vector_index.invalidate()
+
+    assert search(client, auth_headers) == [created]
+
+    # Once re-embedded with the current model it is searchable again
+    stale.embedding_model = get_embedding_provider().model_id
+    db.commit()
+    vector_index.invalidate(1)
+
+    assert search(client, auth_headers)[0] == stale.id
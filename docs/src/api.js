@@ -63,10 +63,15 @@ class APIService {
   }
 
   // Flashcard endpoints
-  async getFlashcards(topic = null, difficulty = null) {
+  // Returns one page: { items, next_cursor }. Pass next_cursor back as
+  // `cursor` for the following page; `fields` limits the returned columns.
+  async getFlashcards(topic = null, difficulty = null, { cursor = null, limit = null, fields = null } = {}) {
     let url = '/flashcards/?token=' + this.token;
-    if (topic) url += `&topic=${topic}`;
+    if (topic) url += `&topic=${encodeURIComponent(topic)}`;
     if (difficulty) url += `&difficulty=${difficulty}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    if (limit) url += `&limit=${limit}`;
+    if (fields) url += `&fields=${encodeURIComponent([].concat(fields).join(','))}`;
     return this.request('GET', url);
   }
 
@@ -130,6 +135,28 @@ class APIService {
     });
   }
 
+  // attempts: [{ flashcard_id, is_correct, response_time_seconds }], applied in order
+  async submitQuizAnswers(sessionId, attempts) {
+    return this.request('POST', `/study/quiz/answers?session_id=${sessionId}&token=${this.token}`, { attempts });
+  }
+
+  // Upcoming reviews per day: { overdue, new_cards, total_reviews, forecast: [{ date, reviews }] }
+  async getReviewForecast(days = 30) {
+    return this.request('GET', `/study/forecast?token=${this.token}&days=${days}`);
+  }
+
+  // Offline study: pass the previous watermark to get only what changed
+  async getSyncSnapshot(since = null) {
+    const params = new URLSearchParams({ token: this.token });
+    if (since) params.append('since', since);
+    return this.request('GET', `/study/sync/snapshot?${params}`);
+  }
+
+  // attempts: [{ client_attempt_id, flashcard_id, is_correct, response_time_seconds, answered_at }]
+  async uploadSyncLog(attempts, sessionId = null) {
+    return this.request('POST', `/study/sync/upload?token=${this.token}`, { attempts, session_id: sessionId });
+  }
+
   async getAdaptiveDifficulty(sessionId) {
     return this.request('GET', `/study/adaptive-difficulty/${sessionId}?token=${this.token}`);
   }